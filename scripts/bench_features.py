@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import tempfile
+import platform
+import subprocess
+import typer
+from rich.console import Console
+from rich.table import Table
+
+app = typer.Typer()
+
+SCRIPTS = tuple(f"feature_{index}.py" for index in range(6))
+DEFAULT_SIZES = "100000,1000000,10000000"
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(SCRIPTS_DIR, "benchmarks", "baseline.json")
+
+
+def synthetic_input(data_dir: str, rows: int, seed: int):
+    """
+    Returns the path of the synthetic input of `rows` lines, generating it once.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic-{rows}-seed{seed}.csv")
+    if not os.path.exists(path):
+        typer.echo(f"Generating {rows} synthetic update lines: {path}")
+        partial = f"{path}.partial"
+        # In a child process: Linux keeps the peak RSS of a process across exec, so the
+        # extractors started later would report at least the size this process grew to
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "synthetic_updates.py"), "--output", partial,
+                        "--rows", str(rows), "--seed", str(seed)], stdout=subprocess.DEVNULL, check=True)
+        os.replace(partial, path)
+    return path
+
+def run_script(script: str, input_file: str, output_dir: str, window: int, options):
+    """
+    Runs an extractor in a child process and returns (wall seconds, peak RSS bytes).
+    """
+    output = os.path.join(output_dir, script.replace(".py", ".csv"))
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, script),
+               "--input", input_file, "--output", output, "--window", str(window)] + list(options)
+    with tempfile.TemporaryFile() as errors:
+        started = time.perf_counter()
+        child = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=errors)
+        # wait4 gives the peak RSS of this child alone, unlike RUSAGE_CHILDREN
+        _, status, usage = os.wait4(child.pid, 0)
+        wall = time.perf_counter() - started
+        child.returncode = os.waitstatus_to_exitcode(status)
+        if child.returncode != 0:
+            errors.seek(0)
+            raise RuntimeError(f"{' '.join(command)} failed:\n{errors.read().decode()}")
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return wall, peak
+
+
+def result_key(script: str, engine: str, rows: int):
+    return f"{script}|{engine}|{rows}"
+
+def environment():
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "processor": platform.processor(), "system": platform.system(), "cpus": os.cpu_count()}
+
+def load_baseline(path: str):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except (OSError, ValueError):
+        return None
+
+
+@app.command()
+def bench_features(
+    sizes: str = typer.Option(DEFAULT_SIZES, "--sizes", help="Comma-separated input sizes in rows"),
+    scripts: str = typer.Option(",".join(SCRIPTS), "--scripts", help="Comma-separated extractor scripts to time"),
+    engine: str = typer.Option("petl", "--engine", help="Processing engine passed to the scripts"),
+    window: int = typer.Option(300, "--window", help="Window size passed to the scripts"),
+    seed: int = typer.Option(1, "--seed", help="Seed of the synthetic inputs"),
+    data_dir: str = typer.Option("../data/synthetic", "--data-dir", help="Directory for the generated inputs (reused across runs)"),
+    repeat: int = typer.Option(1, "--repeat", help="Runs per script and size; the fastest one counts"),
+    baseline: str = typer.Option(DEFAULT_BASELINE, "--baseline", help="Baseline JSON to compare against"),
+    save_baseline: bool = typer.Option(False, "--save-baseline", help="Store these results as the new baseline"),
+    tolerance: float = typer.Option(0.10, "--tolerance", help="Slowdown or memory growth reported as a regression"),
+    output: str = typer.Option(None, "--output", help="Also write the results as JSON to this file")
+):
+    """
+    Time the feature extractors on seeded synthetic inputs and compare with a baseline.
+
+    Reports rows/s and peak memory per script and input size. Exits with status 1 when
+    a result is slower or uses more memory than the baseline by more than --tolerance.
+    """
+    rows_list = [int(float(size)) for size in sizes.split(",")]
+    script_list = [script.strip() for script in scripts.split(",")]
+    reference = load_baseline(baseline)
+    if reference is None and not save_baseline:
+        typer.echo(f"No baseline at {baseline}; run with --save-baseline to store one.")
+
+    results = {}
+    output_dir = os.path.join(data_dir, "bench-output")
+    os.makedirs(output_dir, exist_ok=True)
+    for rows in rows_list:
+        input_file = synthetic_input(data_dir, rows, seed)
+        for script in script_list:
+            typer.echo(f"Timing {script} ({engine}) on {rows} rows...")
+            runs = [run_script(script, input_file, output_dir, window, ["--engine", engine]) for _ in range(repeat)]
+            wall = min(wall for wall, _ in runs)
+            peak = max(peak for _, peak in runs)
+            results[result_key(script, engine, rows)] = {
+                "script": script, "engine": engine, "rows": rows, "wall_seconds": round(wall, 3),
+                "rows_per_second": round(rows / wall, 1), "peak_rss_bytes": peak}
+
+    regressions = show_results(results, reference["results"] if reference else {}, tolerance)
+    report = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "environment": environment(), "seed": seed,
+              "window": window, "results": results}
+    if output:
+        with open(output, 'w') as out:
+            json.dump(report, out, indent=2)
+    if save_baseline:
+        if reference:
+            # Keeps the baseline entries that this run did not measure
+            report["results"] = {**reference["results"], **results}
+        os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+        with open(baseline, 'w') as out:
+            json.dump(report, out, indent=2)
+        typer.echo(f"Saved baseline to {baseline}")
+    elif regressions:
+        typer.echo(f"{regressions} result(s) regressed by more than {tolerance:.0%}")
+        raise typer.Exit(1)
+
+
+def show_results(results, reference, tolerance: float):
+    """
+    Prints the results next to the baseline and returns the number of regressions.
+    """
+    table = Table(title="Feature extractor benchmark")
+    for column in ("script", "engine", "rows", "wall s", "rows/s", "peak MB", "baseline rows/s", "speed", "memory"):
+        table.add_column(column, justify="left" if column in ("script", "engine") else "right")
+    regressions = 0
+    for key, result in results.items():
+        base = reference.get(key)
+        speed = memory = ""
+        if base:
+            speed_change = result["rows_per_second"] / base["rows_per_second"] - 1
+            memory_change = result["peak_rss_bytes"] / base["peak_rss_bytes"] - 1
+            slower, bigger = speed_change < -tolerance, memory_change > tolerance
+            regressions += slower or bigger
+            speed = f"[{'red' if slower else 'green'}]{speed_change:+.1%}[/]"
+            memory = f"[{'red' if bigger else 'green'}]{memory_change:+.1%}[/]"
+        table.add_row(result["script"], result["engine"], f"{result['rows']:,}", f"{result['wall_seconds']:.2f}",
+                      f"{result['rows_per_second']:,.0f}", f"{result['peak_rss_bytes'] / 1e6:.0f}",
+                      f"{base['rows_per_second']:,.0f}" if base else "", speed, memory)
+    Console().print(table)
+    return regressions
+
+
+if __name__ == "__main__":
+    app()
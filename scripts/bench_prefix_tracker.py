@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import random
+import time
+import tracemalloc
+import typer
+from rich.console import Console
+from rich.table import Table
+from prefix_tracker import PrefixTracker
+
+app = typer.Typer()
+
+
+class DictTracker:
+    """
+    The original feature_5 state: prefix -> (as_path, origin_as) strings.
+    """
+    def __init__(self):
+        self.prefixes = {}
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def observe(self, prefix, as_path, origin_as):
+        last = self.prefixes.get(prefix)
+        self.prefixes[prefix] = (as_path, origin_as)
+        return last is not None and as_path != last[0] and origin_as == last[1]
+
+
+def synthetic_table(prefixes: int, seed: int, ipv6_share: float = 0.1):
+    """
+    Returns (prefix, origin) pairs: IPv4 /16-/24 and IPv6 /32-/48 networks.
+    """
+    rng = random.Random(seed)
+    table = set()
+    while len(table) < prefixes:
+        if rng.random() < ipv6_share:
+            length = rng.choice((32, 40, 44, 48))
+            network = rng.getrandbits(length) << (128 - length)
+            groups = [(network >> shift) & 0xFFFF for shift in range(112, -16, -16)]
+            table.add(("2" + ":".join(f"{group:x}" for group in groups)[1:] + f"/{length}", length))
+        else:
+            length = rng.choice((16, 20, 22, 23, 24, 24, 24, 24))
+            network = rng.getrandbits(length) << (32 - length)
+            table.add((".".join(str((network >> shift) & 0xFF) for shift in (24, 16, 8, 0)) + f"/{length}", length))
+    return [(prefix, str(rng.randint(1, 400000))) for prefix, _ in sorted(table)]
+
+
+def announcements(table, updates: int, seed: int):
+    """
+    Yields fresh (prefix, as_path, origin_as) strings: one announcement per prefix,
+    then `updates` re-announcements of random prefixes with a new path.
+    """
+    rng = random.Random(seed + 1)
+    peers = [str(rng.randint(1, 65000)) for _ in range(20)]
+    def path(origin):
+        return " ".join([rng.choice(peers)] + [str(rng.randint(1, 65000)) for _ in range(rng.randint(1, 4))] + [origin])
+    for prefix, origin in table:
+        yield prefix, path(origin), origin
+    for _ in range(updates):
+        prefix, origin = table[rng.randrange(len(table))]
+        yield prefix, path(origin), origin
+
+
+def run(tracker, table, updates: int, seed: int):
+    tracemalloc.start()
+    began = time.perf_counter()
+    changes = sum(tracker.observe(*row) for row in announcements(table, updates, seed))
+    elapsed = time.perf_counter() - began
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return changes, elapsed, memory
+
+
+@app.command()
+def bench_prefix_tracker(
+    prefixes: int = typer.Option(1000000, "--prefixes", help="Number of distinct prefixes in the synthetic table"),
+    updates: int = typer.Option(1000000, "--updates", help="Re-announcements after the initial table load"),
+    seed: int = typer.Option(42, "--seed", help="Random seed")
+):
+    """
+    Compare the memory and speed of the compact prefix tracker against the original dict.
+    """
+    typer.echo(f"Generating {prefixes} synthetic prefixes...")
+    table = synthetic_table(prefixes, seed)
+
+    results = Table(title=f"feature_5 prefix tracker, {prefixes} prefixes + {updates} updates")
+    for column in ("tracker", "prefixes", "changes", "bytes/prefix", "total MB", "updates/s"):
+        results.add_column(column, justify="right")
+    for name, tracker in (("dict", DictTracker()), ("compact", PrefixTracker())):
+        typer.echo(f"Running {name} tracker...")
+        changes, elapsed, memory = run(tracker, table, updates, seed)
+        results.add_row(name, str(len(tracker)), str(changes), f"{memory / len(tracker):.1f}",
+                        f"{memory / 2 ** 20:.1f}", f"{(prefixes + updates) / elapsed:,.0f}")
+    Console().print(results)
+
+
+if __name__ == "__main__":
+    app()
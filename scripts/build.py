@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import tomllib
+import subprocess
+import modulefinder
+from hashlib import blake2b
+from importlib import metadata
+from concurrent.futures import ThreadPoolExecutor
+import typer
+from rich.console import Console
+from rich.table import Table
+from common import ENGINES
+from feature_all import LAYOUTS, window_dir, output_files
+from feature_store import store_dir, INDEX_FILE
+
+app = typer.Typer()
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTRACTOR = os.path.join(SCRIPTS_DIR, "feature_all.py")
+DEFAULT_CATALOG = os.path.join(SCRIPTS_DIR, "incidents.toml")
+# Settings of an incident, with their values when neither [defaults] nor the incident has them
+DEFAULTS = {"windows": [300], "head": 0, "start_time": None, "layout": "per-feature", "engine": "petl",
+            "workers": 1, "cache": False, "store": False, "memory": 2 * 10 ** 9, "options": []}
+# Incident keys that are not extraction settings
+INCIDENT_KEYS = ("name", "output_dir", "dumps", "anomaly_intervals")
+LIBRARIES = ("petl", "numpy")
+HASH_BYTES = 16 * 1024 * 1024
+STAMP_DIR = ".build"
+
+
+class Job:
+    """
+    One feature_all.py run: every window size of one incident dump, in a single pass.
+    """
+    def __init__(self, incident: str, collector: str, input_file: str, output_dir: str, settings,
+                 anomaly_intervals=()):
+        self.incident = incident
+        self.collector = collector
+        self.input_file = input_file
+        self.output_dir = output_dir
+        self.settings = settings
+        self.anomaly_intervals = [tuple(interval) for interval in anomaly_intervals]
+        self.memory = settings["memory"]
+        self.input = None
+        self.key = None
+
+    @property
+    def name(self):
+        return f"{self.incident}/{self.collector}"
+
+    @property
+    def stamp_file(self):
+        return os.path.join(self.output_dir, STAMP_DIR, f"{self.collector}.json")
+
+    @property
+    def log_file(self):
+        return os.path.join(self.output_dir, STAMP_DIR, f"{self.collector}.log")
+
+    def command(self):
+        settings = self.settings
+        command = [sys.executable, EXTRACTOR, "--input", self.input_file, "--output-dir", self.output_dir,
+                   "--collector", self.collector, "--window", ",".join(str(size) for size in settings["windows"]),
+                   "--window-dirs", "--layout", settings["layout"], "--engine", settings["engine"],
+                   "--workers", str(settings["workers"])]
+        if settings["head"]:
+            command += ["--head", str(settings["head"])]
+        if settings["start_time"]:
+            command += ["--start-time", settings["start_time"]]
+        if settings["cache"]:
+            command.append("--cache")
+        if settings["store"]:
+            command.append("--store")
+        return command + list(settings["options"])
+
+    def outputs(self):
+        outputs = [path for size in self.settings["windows"]
+                   for _, path in output_files(window_dir(self.output_dir, size), self.collector, self.settings["layout"])]
+        if self.settings["store"]:
+            outputs += [os.path.join(store_dir(window_dir(self.output_dir, size), self.collector), INDEX_FILE)
+                        for size in self.settings["windows"]]
+        return outputs
+
+
+def load_catalog(catalog: str):
+    """
+    Returns the jobs of an incident catalog (see incidents.toml), with paths made
+    relative to the catalog's directory.
+    """
+    try:
+        with open(catalog, 'rb') as catalog_file:
+            document = tomllib.load(catalog_file)
+    except (OSError, tomllib.TOMLDecodeError) as error:
+        raise typer.BadParameter(f"cannot read {catalog}: {error}", param_hint="--catalog")
+    base_dir = os.path.dirname(os.path.abspath(catalog))
+    defaults = {**DEFAULTS, **document.get("defaults", {})}
+
+    jobs = []
+    for incident in document.get("incidents", []):
+        name = incident.get("name")
+        settings = {**defaults, **{key: value for key, value in incident.items()
+                                   if key not in INCIDENT_KEYS}}
+        unknown = set(settings) - set(DEFAULTS)
+        if not name or "output_dir" not in incident or not incident.get("dumps") or unknown:
+            raise typer.BadParameter(f"incident {name or '?'} needs a name, output_dir and dumps"
+                                     + (f" and has unknown settings {', '.join(sorted(unknown))}" if unknown else ""),
+                                     param_hint="--catalog")
+        if settings["layout"] not in LAYOUTS or settings["engine"] not in ENGINES:
+            raise typer.BadParameter(f"incident {name}: layout must be one of {', '.join(LAYOUTS)} and engine "
+                                     f"one of {', '.join(ENGINES)}", param_hint="--catalog")
+        output_dir = os.path.join(base_dir, incident["output_dir"])
+        for collector, input_file in incident["dumps"].items():
+            jobs.append(Job(name, collector, os.path.join(base_dir, input_file), output_dir, settings,
+                            incident.get("anomaly_intervals", ())))
+    return jobs
+
+def select_jobs(jobs, only: str = None):
+    """
+    Keeps the jobs whose incident or incident/collector matches one of the
+    comma-separated glob patterns of `only`.
+    """
+    if not only:
+        return jobs
+    patterns = [pattern.strip() for pattern in only.split(",")]
+    return [job for job in jobs
+            if any(fnmatch.fnmatch(job.incident, pattern) or fnmatch.fnmatch(job.name, pattern) for pattern in patterns)]
+
+
+def code_version():
+    """
+    Hash of the sources of the modules feature_all.py imports from this directory and of
+    the versions of the libraries that shape the output, so that a change to any of
+    them makes every output stale.
+    """
+    finder = modulefinder.ModuleFinder(path=[SCRIPTS_DIR])
+    finder.run_script(EXTRACTOR)
+    sources = sorted(module.__file__ for module in finder.modules.values()
+                     if module.__file__ and os.path.dirname(os.path.abspath(module.__file__)) == SCRIPTS_DIR)
+    digest = blake2b(digest_size=16)
+    for source in sources:
+        digest.update(os.path.basename(source).encode())
+        with open(source, 'rb') as source_file:
+            digest.update(source_file.read())
+    for library in LIBRARIES:
+        digest.update(f"{library}=={metadata.version(library)}".encode())
+    return digest.hexdigest()
+
+def file_digest(input_file: str, previous=None):
+    """
+    Returns {size, mtime_ns, digest} for the content of a file. The digest of `previous`
+    is reused when the size and modification time have not changed, so unchanged
+    dumps are not read again.
+    """
+    stat = os.stat(input_file)
+    if previous and (previous.get("size"), previous.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+        return previous
+    digest = blake2b(digest_size=16)
+    with open(input_file, 'rb') as source:
+        while chunk := source.read(HASH_BYTES):
+            digest.update(chunk)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest.hexdigest()}
+
+def read_stamp(job: Job):
+    try:
+        with open(job.stamp_file) as stamp_file:
+            return json.load(stamp_file)
+    except (OSError, ValueError):
+        return {}
+
+def job_status(job: Job, code: str, force: bool = False):
+    """
+    Sets the job's key (hash of the input content, the code version and the command)
+    and returns "no input", "current" or "stale".
+    """
+    if not os.path.exists(job.input_file):
+        return "no input"
+    stamp = read_stamp(job)
+    job.input = file_digest(job.input_file, stamp.get("input"))
+    job.key = blake2b(json.dumps([code, job.input["digest"], job.command()[1:]]).encode(),
+                      digest_size=16).hexdigest()
+    outputs = stamp.get("outputs", {})
+    current = (stamp.get("key") == job.key and set(outputs) == set(job.outputs())
+               and all(os.path.exists(path) and os.path.getsize(path) == size for path, size in outputs.items()))
+    if current and stamp["input"] != job.input:
+        # Same content with a new modification time: saves hashing it again next time
+        write_stamp(job, stamp, outputs)
+    return "current" if current and not force else "stale"
+
+def write_stamp(job: Job, stamp, outputs):
+    stamp = {**stamp, "key": job.key, "input": job.input, "outputs": outputs}
+    partial = f"{job.stamp_file}.partial"
+    with open(partial, 'w') as out:
+        json.dump(stamp, out, indent=2)
+    os.replace(partial, job.stamp_file)
+
+
+def run_jobs(jobs, max_jobs: int, memory_budget: int):
+    """
+    Runs the jobs as child processes, at most `max_jobs` at a time and only while the
+    memory they reserve fits in `memory_budget` (a job larger than the budget runs
+    alone). Larger inputs start first. Returns {job name: (status, seconds, peak RSS)}.
+    """
+    pending = sorted(jobs, key=lambda job: os.path.getsize(job.input_file), reverse=True)
+    running = {}
+    results = {}
+    try:
+        while pending or running:
+            reserved = sum(job.memory for job, _, _, _ in running.values())
+            for job in list(pending):
+                if len(running) >= max_jobs:
+                    break
+                if running and reserved + job.memory > memory_budget:
+                    continue
+                pending.remove(job)
+                reserved += job.memory
+                os.makedirs(os.path.dirname(job.stamp_file), exist_ok=True)
+                if os.path.exists(job.stamp_file):
+                    # Outputs of an interrupted run must not look current
+                    os.remove(job.stamp_file)
+                log = open(job.log_file, 'w')
+                typer.echo(f"Building {job.name} (log: {job.log_file})")
+                child = subprocess.Popen(job.command(), stdout=log, stderr=subprocess.STDOUT)
+                running[child.pid] = (job, child, log, time.perf_counter())
+
+            # wait4 gives the peak RSS of the child that ended
+            pid, status, usage = os.wait4(-1, 0)
+            if pid not in running:
+                continue
+            job, child, log, started = running.pop(pid)
+            child.returncode = os.waitstatus_to_exitcode(status)
+            log.close()
+            seconds = time.perf_counter() - started
+            peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+            if child.returncode == 0:
+                write_stamp(job, {"built": time.strftime("%Y-%m-%d %H:%M:%S"), "seconds": round(seconds, 1),
+                                  "peak_rss_bytes": peak},
+                            {path: os.path.getsize(path) for path in job.outputs()})
+                results[job.name] = ("built", seconds, peak)
+            else:
+                typer.echo(f"{job.name} failed with status {child.returncode}; see {job.log_file}")
+                results[job.name] = ("failed", seconds, peak)
+    except KeyboardInterrupt:
+        for _, child, log, _ in running.values():
+            child.terminate()
+            child.wait()
+            log.close()
+        raise
+    return results
+
+
+@app.command()
+def build_features(
+    catalog: str = typer.Option(DEFAULT_CATALOG, "--catalog", help="Incident catalog (TOML)"),
+    only: str = typer.Option(None, "--only", help="Comma-separated incidents or incident/collector jobs to build (glob patterns)"),
+    jobs: int = typer.Option(os.cpu_count(), "--jobs", help="Extraction jobs running at the same time"),
+    memory_budget: int = typer.Option(None, "--memory-budget", help="Bytes of memory the running jobs may reserve (default: 3/4 of RAM)"),
+    force: bool = typer.Option(False, "--force", help="Rebuild the selected jobs even when their outputs are current"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only show which jobs are current and which would be built")
+):
+    """
+    Build the feature files of the incidents in a catalog, running stale jobs in parallel.
+
+    A job's outputs are current when the content of its dump, the extraction code and
+    its settings hash to the key recorded in <output_dir>/.build/<collector>.json at
+    its last successful run. Exits with status 1 when a job fails.
+    """
+    selected = select_jobs(load_catalog(catalog), only)
+    if not selected:
+        raise typer.BadParameter(f"no job in {catalog} matches {only}", param_hint="--only")
+    if memory_budget is None:
+        memory_budget = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 3 // 4
+
+    typer.echo(f"Hashing the inputs of {len(selected)} jobs...")
+    code = code_version()
+    with ThreadPoolExecutor(max(jobs, 1)) as pool:
+        statuses = dict(zip((job.name for job in selected), pool.map(lambda job: job_status(job, code, force), selected)))
+    stale = [job for job in selected if statuses[job.name] == "stale"]
+    results = {name: (status, None, None) for name, status in statuses.items() if status != "stale"}
+    if dry_run:
+        results.update({job.name: ("would build", None, None) for job in stale})
+    elif stale:
+        results.update(run_jobs(stale, max(jobs, 1), memory_budget))
+
+    show_results(selected, results)
+    if any(status == "failed" for status, _, _ in results.values()):
+        raise typer.Exit(1)
+
+
+def show_results(jobs, results):
+    table = Table(title="Feature build")
+    for column in ("job", "status", "seconds", "peak MB"):
+        table.add_column(column, justify="left" if column in ("job", "status") else "right")
+    colors = {"built": "green", "current": "dim", "failed": "red", "no input": "yellow", "would build": "cyan"}
+    for job in jobs:
+        status, seconds, peak = results[job.name]
+        table.add_row(job.name, f"[{colors[status]}]{status}[/]", f"{seconds:.1f}" if seconds is not None else "",
+                      f"{peak / 1e6:.0f}" if peak is not None else "")
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    app()
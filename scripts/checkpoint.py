@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import os
+import pickle
+from hashlib import blake2b
+
+import typer
+
+# Bump when the pickled state changes
+CHECKPOINT_VERSION = 2
+SAMPLE_BYTES = 1024 * 1024
+
+
+class Checkpoint:
+    """
+    State of a numpy-engine extraction after the first `offset` bytes (`lines` lines)
+    of its input: the window start and the WindowArrays holding every window so far,
+    including the open one and the feature_5 prefix tracker.
+    """
+    def __init__(self, input_file: str, base: int, floor: int, precision: int, features, aggregates):
+        self.version = CHECKPOINT_VERSION
+        self.input_file = os.path.abspath(input_file)
+        self.base = base
+        self.floor = floor
+        self.precision = precision
+        self.features = features
+        self.start = floor
+        self.offset = 0
+        self.lines = 0
+        self.partial_line = False
+        self.consumed = None
+        self.aggregates = aggregates
+
+    def matches(self, input_file: str, base: int, floor: int, precision: int, features=None):
+        """
+        Tells whether this state can be continued for the given input and settings:
+        same file, window base, start time, sketch precision and selected features, and
+        the bytes read so far unchanged.
+        """
+        if (self.version, self.input_file, self.base, self.floor, self.precision, self.features) != \
+                (CHECKPOINT_VERSION, os.path.abspath(input_file), base, floor, precision, features):
+            return False
+        size = os.path.getsize(input_file)
+        if size < self.offset or (self.partial_line and size != self.offset):
+            return False
+        return consumed_digest(input_file, self.offset) == self.consumed
+
+
+def consumed_digest(input_file: str, offset: int):
+    """
+    Hash of the first and last SAMPLE_BYTES before `offset`, to detect a rewritten input.
+    """
+    digest = blake2b(str(offset).encode(), digest_size=16)
+    with open(input_file, 'rb') as source:
+        digest.update(source.read(min(SAMPLE_BYTES, offset)))
+        source.seek(max(offset - SAMPLE_BYTES, 0))
+        digest.update(source.read(min(SAMPLE_BYTES, offset)))
+    return digest.hexdigest()
+
+def save_checkpoint(path: str, checkpoint: Checkpoint):
+    """
+    Writes the checkpoint atomically, so a crash while saving keeps the previous one.
+    """
+    checkpoint.consumed = consumed_digest(checkpoint.input_file, checkpoint.offset)
+    checkpoint.aggregates.compact()
+    partial = f"{path}.partial"
+    with open(partial, 'wb') as out:
+        pickle.dump(checkpoint, out, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(partial, path)
+
+def load_checkpoint(path: str, input_file: str, base: int, floor: int, precision: int = None, features=None):
+    """
+    Returns the checkpoint at `path` if it can be continued, otherwise None.
+    """
+    try:
+        with open(path, 'rb') as source:
+            checkpoint = pickle.load(source)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        typer.echo(f"No usable checkpoint at {path}; starting from the beginning.")
+        return None
+    if not isinstance(checkpoint, Checkpoint) or not checkpoint.matches(input_file, base, floor, precision, features):
+        typer.echo(f"Checkpoint {path} is for another input, window, start time, distinct count error or "
+                   "feature selection; starting from the beginning.")
+        return None
+    return checkpoint
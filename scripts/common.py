@@ -1,23 +1,136 @@
 #!/usr/bin/env python3
 
+import io
+import os
+import sys
+import csv
+import json
+import math
+import time
+import signal
+import resource
+from collections import deque, Counter
+from itertools import islice
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
 import typer
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
 from rich.progress import Progress
 import petl as etl
+from petl.io.sources import read_source_from_arg
+
+from reorder import reorder, ReorderError
+from prefix_tracker import PrefixTracker
+from mrt import is_mrt, read_mrt
+from compression import compression, DecompressedSource, DECOMPRESSORS
+from sketches import DistinctCounter, DEFAULT_ERROR, precision_for
+
+# Column positions in bgpreader's pipe-delimited update output:
+# type|elem|timestamp|project|collector|router|router-ip|peer-asn|peer-ip|prefix|next-hop|as-path|origin-as|...
+TYPE_COL = 1
+TIMESTAMP_COL = 2
+PEER_ASN_COL = 7
+PEER_IP_COL = 8
+PREFIX_COL = 9
+AS_PATH_COL = 11
+ORIGIN_AS_COL = 12
+
+# (column prefix, feature_name) for feature_0 .. feature_13
+FEATURES = (
+    ("f0", "update_count"),
+    ("f1", "announcement_count"),
+    ("f2", "withdrawal_count"),
+    ("f3", "avg_as_path_length"),
+    ("f4", "median_as_path_length"),
+    ("f5", "as_path_change_count"),
+    ("f6", "p90_as_path_length"),
+    ("f7", "p99_as_path_length"),
+    ("f8", "max_as_path_length"),
+    ("f9", "unique_announced_prefixes"),
+    ("f10", "unique_withdrawn_prefixes"),
+    ("f11", "unique_origin_ases"),
+    ("f12", "unique_peers"),
+    ("f13", "unique_as_paths"),
+)
+# Features f9 .. f13, counted with sketches.DistinctCounter
+DISTINCT_FEATURES = 5
+# Indexes of the features each part of the aggregates is for
+PATH_LENGTH_FEATURES = (3, 4, 6, 7, 8)
+PATH_CHANGE_FEATURE = 5
+DISTINCT_INDEXES = tuple(range(len(FEATURES) - DISTINCT_FEATURES, len(FEATURES)))
+ANNOUNCED_PREFIXES, WITHDRAWN_PREFIXES, ORIGIN_ASES, PEERS, AS_PATHS = DISTINCT_INDEXES
+
+CONSOLIDATED_HEADER = ("timestamp",) + tuple(f"{prefix}_{name}" for prefix, name in FEATURES)
+
+ENGINES = ("petl", "numpy")
+
+RECORD_FIELDS = ("epoch", "type", "prefix", "as_path", "origin_as", "peer")
+# Why tokenize_lines skips a line: blank, no timestamp column, or a timestamp that is not a number
+REJECT_REASONS = ("empty", "short", "timestamp")
 
-def read_input(input_file: str, head: int = None, delimiter: str = '|'):
+
+def read_input(input_file: str, head: int = None, delimiter: str = '|', header=None, decompress: str = "auto"):
     """
     Reads the input BGP data file with PETL, using the specified delimiter.
+    An input of '-' reads from stdin. Files ending in .gz, .bz2, .xz or .zst are
+    decompressed while they are read (see compression.py).
     """
-    data = etl.fromcsv(input_file, delimiter=delimiter)  # Explicitly set delimiter to '|'
+    data = etl.fromcsv(input_source(input_file, decompress), delimiter=delimiter, header=header)  # Explicitly set delimiter to '|'
     if head:
         data = etl.head(data, head)
     return data
 
-def write_output(output_file: str, table):
+def input_source(input_file: str, decompress: str = "auto"):
+    """
+    PETL source of an input file, stdin for '-', counting the bytes read.
+    """
+    if input_file == '-':
+        source = read_source_from_arg(None)
+    elif compression(input_file):
+        source = DecompressedSource(input_file, decompress)
+    else:
+        source = read_source_from_arg(input_file)
+    return CountedSource(source)
+
+def write_output(output_file: str, table, append: bool = False):
     """
     Writes the output table to a CSV file.
+
+    With `append`, the leading rows an existing file already has are kept as they are
+    and the table is written after them, from the first row that differs (usually the
+    window that was still open when the file was written).
     """
-    etl.tocsv(table, output_file)
+    table = TimedTable(table, "write")
+    if not append or not os.path.exists(output_file):
+        with STAGES.stage("write"):
+            etl.tocsv(table, output_file)
+        return
+    lines = _csv_lines(table)
+    with STAGES.stage("write"), open(output_file, 'r+b') as out:
+        kept, pending = 0, None
+        for line in lines:
+            if out.readline() != line:
+                pending = line
+                break
+            kept = out.tell()
+        out.seek(kept)
+        out.truncate()
+        if pending is not None:
+            out.write(pending)
+            out.writelines(lines)
+
+def _csv_lines(table):
+    # Rows encoded like etl.tocsv writes them
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in table:
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
 
 def progress_bar(iterable, description="Processing"):
     """
@@ -29,3 +142,947 @@ def progress_bar(iterable, description="Processing"):
             yield item
             progress.update(task, advance=1)
 
+
+STAGE_NAMES = ("read", "parse", "filter", "sort", "window", "write")
+SAMPLE_SECONDS = 0.01
+RSS_SAMPLES = 10  # RSS is read every RSS_SAMPLES time samples
+
+
+class StageStats:
+    """
+    Counters of one pipeline stage. Rows in are the rows out of the stage before it.
+    """
+    __slots__ = ("rows_out", "bytes_read", "wall", "cpu", "peak_rss")
+
+    def __init__(self):
+        self.rows_out = 0
+        self.bytes_read = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss = 0
+
+    def rows_in(self, previous_rows_out):
+        # Throughput counts the rows a stage takes in; the first stage has only rows out
+        return self.rows_out if previous_rows_out is None else previous_rows_out
+
+
+class Instrumentation:
+    """
+    Rows, bytes read, wall and CPU time and peak RSS per stage of an extraction.
+
+    The PETL stages are lazy iterators pulling from each other, so the active stage is
+    whichever one is producing: entering a wrapped iterator (timed) or a block of code
+    (stage) makes that stage active until it returns. Reading clocks on every row
+    would slow the extraction down by half, so an interval timer samples the active
+    stage every SAMPLE_SECONDS instead and charges it the wall and CPU time since the
+    previous sample. The timer signal is handled in the main thread between
+    bytecodes; a sampling thread would only run when the main thread releases the
+    GIL for I/O, and charge nearly everything to reading. Nothing is measured until
+    start().
+    """
+    def __init__(self):
+        self.enabled = False
+        self.stages = {name: StageStats() for name in STAGE_NAMES}
+        self.rejected = Counter()
+        self.active = None
+        self.started = None
+        self.last = None
+        self.samples = 0
+        self.handler = None
+
+    def start(self):
+        self.stages = {name: StageStats() for name in STAGE_NAMES}
+        self.rejected = Counter()
+        self.active = None
+        self.enabled = True
+        self.started = (time.time(), time.perf_counter(), time.process_time())
+        self.last = self.started[1:]
+        self.samples = 0
+        self.handler = signal.signal(signal.SIGALRM, self._sample)
+        signal.setitimer(signal.ITIMER_REAL, SAMPLE_SECONDS, SAMPLE_SECONDS)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.handler)
+        self._sample()
+        self.enabled = False
+
+    def _sample(self, *_):
+        now, cpu = time.perf_counter(), time.process_time()
+        if self.active is not None:
+            stats = self.stages[self.active]
+            stats.wall += now - self.last[0]
+            stats.cpu += cpu - self.last[1]
+            if self.samples % RSS_SAMPLES == 0:
+                stats.peak_rss = max(stats.peak_rss, current_rss())
+        self.last = (now, cpu)
+        self.samples += 1
+
+    def timed(self, stage: str, iterable, rows=None, size=None):
+        """
+        Yields the items of `iterable`, with `stage` active while they are produced.
+        `rows(item)` and `size(item)` give the rows and bytes of an item (default:
+        one row, no bytes).
+        """
+        if not self.enabled:
+            yield from iterable
+            return
+        stats = self.stages[stage]
+        iterator = iter(iterable)
+        while True:
+            caller, self.active = self.active, stage
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.active = caller
+            stats.rows_out += rows(item) if rows else 1
+            if size:
+                stats.bytes_read += size(item)
+            yield item
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Makes stage `name` active in a block of code, except while wrapped iterators
+        of other stages produce.
+        """
+        if not self.enabled:
+            yield
+            return
+        caller, self.active = self.active, name
+        try:
+            yield
+        finally:
+            self.active = caller
+            stats = self.stages[name]
+            stats.peak_rss = max(stats.peak_rss, current_rss())
+
+    def count(self, name: str, rows: int = 0, bytes_read: int = 0):
+        self.stages[name].rows_out += rows
+        self.stages[name].bytes_read += bytes_read
+
+    def reject(self, counts):
+        """
+        Adds {reason: lines} to the input lines skipped as malformed.
+        """
+        self.rejected.update(counts)
+
+    def report(self):
+        """
+        Returns the counters as a JSON-serializable dict, listing the stages that ran.
+        """
+        stages, rows_in = {}, None
+        for name, stats in self.stages.items():
+            if not (stats.rows_out or stats.bytes_read or stats.wall):
+                continue
+            stages[name] = {
+                "rows_in": rows_in,
+                "rows_out": stats.rows_out,
+                "bytes_read": stats.bytes_read,
+                "wall_seconds": round(stats.wall, 6),
+                "cpu_seconds": round(stats.cpu, 6),
+                "rows_per_second": round(stats.rows_in(rows_in) / stats.wall, 1) if stats.wall else None,
+                "peak_rss_bytes": stats.peak_rss or None,
+            }
+            rows_in = stats.rows_out
+        started, wall, cpu = self.started
+        return {
+            "command": sys.argv,
+            "started": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - wall, 6),
+            "cpu_seconds": round(time.process_time() - cpu, 6),
+            "peak_rss_bytes": peak_rss(),
+            "stages": stages,
+            "rejected_lines": {reason: self.rejected[reason] for reason in REJECT_REASONS if self.rejected[reason]},
+        }
+
+    def table(self):
+        """
+        Rich table of the counters for the live display.
+        """
+        table = Table(title="Extraction stages")
+        for column in ("stage", "rows in", "rows out", "MB read", "wall s", "cpu s", "rows/s", "peak RSS MB"):
+            table.add_column(column, justify="left" if column == "stage" else "right")
+        rows_in = None
+        for name, stats in self.stages.items():
+            if not (stats.rows_out or stats.bytes_read or stats.wall or self.active == name):
+                continue
+            style = "bold cyan" if self.active == name else None
+            table.add_row(name, "" if rows_in is None else f"{rows_in:,}", f"{stats.rows_out:,}",
+                          f"{stats.bytes_read / 1e6:.1f}" if stats.bytes_read else "",
+                          f"{stats.wall:.1f}", f"{stats.cpu:.1f}",
+                          f"{stats.rows_in(rows_in) / stats.wall:,.0f}" if stats.wall else "",
+                          f"{stats.peak_rss / 1e6:.0f}" if stats.peak_rss else "", style=style)
+            rows_in = stats.rows_out
+        if self.rejected:
+            table.caption = "rejected lines: " + ", ".join(f"{reason} {self.rejected[reason]:,}"
+                                                          for reason in REJECT_REASONS if self.rejected[reason])
+        return table
+
+
+STAGES = Instrumentation()
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes (peak RSS where /proc is missing).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss()
+
+def peak_rss():
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024  # bytes on macOS, KiB on Linux
+
+
+@contextmanager
+def instrumented(report_file: str = None):
+    """
+    Measures the stages of the extraction in the block, with a live table when stderr
+    is a terminal, and writes the JSON report to `report_file` at the end.
+    """
+    STAGES.start()
+    console = Console(stderr=True)
+    # Messages printed to a terminal stdout go above the table; piped output stays as it is
+    live = Live(get_renderable=STAGES.table, console=console, refresh_per_second=2, transient=False,
+                redirect_stdout=sys.stdout.isatty()) if console.is_terminal else nullcontext()
+    try:
+        with live:
+            yield STAGES
+    finally:
+        STAGES.stop()
+        if report_file:
+            with open(report_file, 'w') as out:
+                json.dump(STAGES.report(), out, indent=2)
+            typer.echo(f"Wrote stage report to {report_file}")
+
+
+class CountedSource:
+    """
+    PETL source that counts the bytes read from another source into the read stage.
+    """
+    def __init__(self, source):
+        self.source = source
+
+    @contextmanager
+    def open(self, mode='r'):
+        with self.source.open(mode) as stream:
+            yield _CountedStream(stream)
+
+class _CountedStream(io.BufferedIOBase):
+    # Forwards reads to the buffered stream as they are, so that read1 returns the lines
+    # a pipe already has instead of waiting for a full buffer (see feature_live.py)
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._counted(self.stream.read(size))
+
+    def read1(self, size=-1):
+        return self._counted(self.stream.read1(size))
+
+    def _counted(self, data):
+        STAGES.count("read", bytes_read=len(data))
+        return data
+
+
+class TimedTable(etl.Table):
+    """
+    PETL table whose rows (not the header) are counted and timed as stage `stage`.
+    """
+    def __init__(self, table, stage: str):
+        self.table = table
+        self.stage = stage
+
+    def __iter__(self):
+        rows = iter(self.table)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield header
+        yield from STAGES.timed(self.stage, rows)
+
+
+def parse_epoch(raw_timestamp):
+    """
+    Converts a bgpreader timestamp ('1116892809.000000') to integer epoch seconds, or None.
+    """
+    if raw_timestamp:
+        try:
+            return int(raw_timestamp.split('.')[0])
+        except ValueError:
+            return None
+    return None
+
+def parse_start_time(start_time: str):
+    """
+    Converts a '%Y-%m-%d %H:%M:%S' local time string to epoch seconds, or None.
+    """
+    if not start_time:
+        return None
+    return int(datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").timestamp())
+
+def to_record(row):
+    """
+    Maps a raw bgpreader row to an (epoch, type, prefix, as_path, origin_as, peer)
+    record, with peer as 'peer-asn|peer-ip'. Withdrawals are shorter than
+    announcements, so missing columns become ''.
+    """
+    row = tuple(row)
+    if len(row) <= ORIGIN_AS_COL:
+        row = row + ('',) * (ORIGIN_AS_COL + 1 - len(row))
+    peer = f"{row[PEER_ASN_COL]}|{row[PEER_IP_COL]}" if row[PEER_ASN_COL] or row[PEER_IP_COL] else ''
+    return (parse_epoch(row[TIMESTAMP_COL]), row[TYPE_COL], row[PREFIX_COL],
+            row[AS_PATH_COL], row[ORIGIN_AS_COL], peer)
+
+def tokenize_lines(lines, rejected):
+    """
+    Yields the records of bgpreader text lines, the same as to_record on their fields,
+    splitting a line only up to the origin AS column. Lines without a valid timestamp
+    are skipped and counted per REJECT_REASONS in the `rejected` Counter.
+    """
+    splits = ORIGIN_AS_COL + 1
+    for line in lines:
+        fields = line.split('|', splits)
+        if len(fields) > splits:
+            # Complete line: the newline is in the unsplit rest
+            try:
+                epoch = int(fields[TIMESTAMP_COL].partition('.')[0])
+            except ValueError:
+                rejected["timestamp"] += 1
+                continue
+            peer_asn, peer_ip = fields[PEER_ASN_COL], fields[PEER_IP_COL]
+            yield (epoch, fields[TYPE_COL], fields[PREFIX_COL], fields[AS_PATH_COL], fields[ORIGIN_AS_COL],
+                   f"{peer_asn}|{peer_ip}" if peer_asn or peer_ip else '')
+            continue
+        fields = line.rstrip('\r\n').split('|')
+        if len(fields) <= TIMESTAMP_COL:
+            rejected["empty" if fields == [''] else "short"] += 1
+            continue
+        record = to_record(fields)
+        if record[0] is None:
+            rejected["timestamp"] += 1
+        else:
+            yield record
+
+class BgpreaderRecords(etl.Table):
+    """
+    PETL table of the records of a bgpreader text dump, tokenized by tokenize_lines.
+    After a complete pass, `rejected` holds the lines it skipped per reason (also
+    added to the stage report).
+    """
+    def __init__(self, input_file: str, head: int = None, decompress: str = "auto"):
+        self.input_file = input_file
+        self.head = head
+        self.decompress = decompress
+        self.rejected = Counter()
+
+    def __iter__(self):
+        yield RECORD_FIELDS
+        rejected = Counter()
+        with input_source(self.input_file, self.decompress).open('rb') as stream:
+            lines = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+            if self.head:
+                lines = islice(lines, self.head)
+            yield from STAGES.timed("parse", tokenize_lines(STAGES.timed("read", lines), rejected))
+        self.rejected = rejected
+        STAGES.reject(rejected)
+
+class MrtRecords(etl.Table):
+    """
+    PETL table of records read straight from an MRT update dump (see mrt.py).
+    """
+    def __init__(self, input_file: str):
+        self.input_file = input_file
+
+    def __iter__(self):
+        yield RECORD_FIELDS
+        for elem_type, epoch, peer_asn, peer_ip, prefix, _, as_path, origin_as in read_mrt(self.input_file):
+            yield epoch, elem_type, prefix, as_path, origin_as, f"{peer_asn}|{peer_ip}"
+
+def read_records(input_file: str, head: int = None, decompress: str = "auto"):
+    """
+    Reads a bgpreader dump as a PETL table of records with a valid timestamp.
+    Every line is treated as data; bgpreader output has no header row. Malformed
+    lines are skipped and counted (see tokenize_lines).
+
+    MRT update dumps (RIS updates.*.gz/.bz2) are detected by content and decoded
+    directly, without bgpreader's text conversion.
+    """
+    if input_file != '-' and is_mrt(input_file):
+        data = TimedTable(MrtRecords(input_file), "parse")
+        return etl.head(data, head) if head else data
+    return BgpreaderRecords(input_file, head, decompress)
+
+class PathChanges(etl.Table):
+    """
+    PETL table of records with a trailing `path_changed` field for feature_5: True for
+    an announcement that changes the AS path of its prefix and keeps its origin AS.
+    Each announcement is compared with the previous one for its prefix in file order,
+    as the numpy engine does, so feature_5 does not depend on how the records are put
+    in time order afterwards. Records older than `floor` fall in no window and are
+    left out of the comparison.
+
+    With `features`, only feature_5 among them is tracked, and the fields none of them
+    reads are blanked (see record_projection).
+    """
+    def __init__(self, records, floor: int = None, features=None):
+        self.records = records
+        self.floor = floor
+        self.features = features
+
+    def __iter__(self):
+        rows = iter(self.records)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield tuple(header) + ("path_changed",)
+        # Comparing announcements is windowing work, whichever stage pulls the records
+        yield from STAGES.timed("window", self._marked(rows), rows=lambda record: 0)
+
+    def _marked(self, rows):
+        floor, tracker = self.floor, PrefixTracker()
+        tracked = selects(self.features, PATH_CHANGE_FEATURE)
+        project = record_projection(self.features)
+        for record in rows:
+            epoch, elem_type, prefix, as_path, origin_as, peer = record
+            changed = False
+            if tracked and elem_type == "A" and prefix and as_path and origin_as and (floor is None or epoch >= floor):
+                changed = tracker.observe(prefix, as_path, origin_as)
+            if project is not None:
+                record = project(epoch, elem_type, prefix, as_path, origin_as, peer)
+            yield record + (changed,)
+
+def selects(features, *indexes):
+    """
+    Tells whether a selection of feature indexes (None for all) has any of `indexes`.
+    """
+    return features is None or any(index in features for index in indexes)
+
+def record_projection(features):
+    """
+    Returns a function making a record of (epoch, type, prefix, as_path, origin_as,
+    peer) fields with the fields none of `features` reads left empty, which WindowStats
+    skips, or None when every field is read.
+    """
+    keep = (selects(features, PATH_CHANGE_FEATURE, ANNOUNCED_PREFIXES, WITHDRAWN_PREFIXES),
+            selects(features, *PATH_LENGTH_FEATURES, AS_PATHS), selects(features, ORIGIN_ASES),
+            selects(features, PEERS))
+    if all(keep):
+        return None
+    keep_prefix, keep_path, keep_origin, keep_peer = keep
+
+    def project(epoch, elem_type, prefix, as_path, origin_as, peer):
+        return (epoch, elem_type, prefix if keep_prefix else '', as_path if keep_path else '',
+                origin_as if keep_origin else '', peer if keep_peer else '')
+    return project
+
+
+class PathLengthHistogram:
+    """
+    Exact distribution of AS path lengths as counts per length.
+
+    Path lengths are small integers, so memory stays constant however many rows
+    fall in a window, and the mean, median and percentiles are exact.
+    """
+    __slots__ = ("counts", "total", "length_sum")
+
+    def __init__(self):
+        self.counts = []
+        self.total = 0
+        self.length_sum = 0
+
+    def add(self, length: int, count: int = 1):
+        if length >= len(self.counts):
+            self.counts.extend([0] * (length + 1 - len(self.counts)))
+        self.counts[length] += count
+        self.total += count
+        self.length_sum += length * count
+
+    def merge(self, other):
+        for length, count in enumerate(other.counts):
+            if count:
+                self.add(length, count)
+
+    def subtract(self, other):
+        """
+        Removes the lengths of a histogram that was merged into this one.
+        """
+        for length, count in enumerate(other.counts):
+            if count:
+                self.counts[length] -= count
+                self.total -= count
+                self.length_sum -= length * count
+
+    def _value_at(self, rank: int):
+        # Length of the rank-th (0-based) smallest path
+        seen = 0
+        for length, count in enumerate(self.counts):
+            seen += count
+            if seen > rank:
+                return length
+
+    def mean(self):
+        return self.length_sum / self.total if self.total else 0
+
+    def median(self):
+        """
+        Same value and type as statistics.median over the individual lengths.
+        """
+        if not self.total:
+            return 0
+        if self.total % 2:
+            return self._value_at(self.total // 2)
+        return (self._value_at(self.total // 2 - 1) + self._value_at(self.total // 2)) / 2
+
+    def percentile(self, percent: float):
+        """
+        Nearest-rank percentile: the smallest length covering `percent`% of the paths.
+        """
+        if not self.total:
+            return 0
+        return self._value_at(max(math.ceil(percent * self.total / 100), 1) - 1)
+
+    def max(self):
+        return self._value_at(self.total - 1) if self.total else 0
+
+
+class WindowStats:
+    """
+    Aggregates for the features over a single time window. The distinct counts of
+    f9 .. f13 are sketches with 2^precision registers, or exact without a precision.
+    """
+    __slots__ = ("updates", "announcements", "withdrawals", "path_lengths", "changed_prefixes", "distinct")
+
+    def __init__(self, precision: int = None):
+        self.updates = 0
+        self.announcements = 0
+        self.withdrawals = 0
+        self.path_lengths = PathLengthHistogram()
+        self.changed_prefixes = set()
+        self.distinct = tuple(DistinctCounter(precision) for _ in range(DISTINCT_FEATURES))
+
+    def add(self, elem_type: str, prefix: str, as_path: str, origin_as: str, peer: str):
+        """
+        Counts one update row.
+        """
+        announced_prefixes, withdrawn_prefixes, origins, peers, paths = self.distinct
+        self.updates += 1
+        if elem_type == "A":
+            self.announcements += 1
+            if prefix:
+                announced_prefixes.add(prefix)
+            if origin_as:
+                origins.add(origin_as)
+            if as_path:
+                paths.add(as_path)
+        elif elem_type == "W":
+            self.withdrawals += 1
+            if prefix:
+                withdrawn_prefixes.add(prefix)
+        if peer:
+            peers.add(peer)
+        if as_path:
+            self.path_lengths.add(len(as_path.split()))
+
+    def merge(self, other):
+        """
+        Adds the aggregates of another part of the same window.
+        """
+        self.updates += other.updates
+        self.announcements += other.announcements
+        self.withdrawals += other.withdrawals
+        self.path_lengths.merge(other.path_lengths)
+        self.changed_prefixes |= other.changed_prefixes
+        for counter, part in zip(self.distinct, other.distinct):
+            counter.merge(part)
+
+    def compact(self):
+        """
+        Hashes the strings of the distinct counters into their compact keys.
+        """
+        for counter in self.distinct:
+            counter.compact()
+
+    def values(self):
+        """
+        Returns the (f0, ..., f13) feature values for this window.
+        """
+        lengths = self.path_lengths
+        return (self.updates, self.announcements, self.withdrawals,
+                lengths.mean(), lengths.median(), len(self.changed_prefixes),
+                lengths.percentile(90), lengths.percentile(99), lengths.max()) + \
+            tuple(counter.count() for counter in self.distinct)
+
+
+class SlidingStats(WindowStats):
+    """
+    Aggregates of a run of consecutive (window_start, WindowStats) windows that windows
+    enter and leave.
+
+    Counts and the path length histogram are added and subtracted, and changed_prefixes
+    maps each feature_5 prefix to the number of windows in the run it changed in, so
+    moving the run costs the size of the windows moved instead of the whole run.
+    Sketches cannot forget keys, so the distinct counts are merged from the run when
+    values are taken.
+    """
+    __slots__ = ("run",)
+
+    def __init__(self):
+        super().__init__()
+        self.changed_prefixes = {}
+        self.run = deque()
+
+    def enter(self, window_start: int, stats: WindowStats):
+        self.run.append((window_start, stats))
+        self.updates += stats.updates
+        self.announcements += stats.announcements
+        self.withdrawals += stats.withdrawals
+        self.path_lengths.merge(stats.path_lengths)
+        for prefix in stats.changed_prefixes:
+            self.changed_prefixes[prefix] = self.changed_prefixes.get(prefix, 0) + 1
+
+    def leave(self, count: int):
+        """
+        Takes the `count` oldest windows (at most all) out of the run.
+        """
+        for _ in range(min(count, len(self.run))):
+            self._leave(self.run.popleft()[1])
+
+    def _leave(self, stats: WindowStats):
+        self.updates -= stats.updates
+        self.announcements -= stats.announcements
+        self.withdrawals -= stats.withdrawals
+        self.path_lengths.subtract(stats.path_lengths)
+        for prefix in stats.changed_prefixes:
+            if self.changed_prefixes[prefix] == 1:
+                del self.changed_prefixes[prefix]
+            else:
+                self.changed_prefixes[prefix] -= 1
+
+    def values(self):
+        self.distinct = tuple(DistinctCounter() for _ in range(DISTINCT_FEATURES))
+        for _, stats in self.run:
+            for counter, part in zip(self.distinct, stats.distinct):
+                counter.merge(part)
+        return super().values()
+
+
+def parse_features(value: str):
+    """
+    Parses a --features value: comma-separated feature numbers ('0,5'), or None for all.
+    """
+    if value is None:
+        return None
+    try:
+        features = tuple(sorted(set(int(part) for part in value.split(','))))
+    except ValueError:
+        raise typer.BadParameter(f"expected comma-separated feature numbers, got '{value}'", param_hint="--features")
+    if not 0 <= features[0] <= features[-1] < len(FEATURES):
+        raise typer.BadParameter(f"features are numbered 0 to {len(FEATURES) - 1}", param_hint="--features")
+    return features
+
+def parse_windows(value: str):
+    """
+    Parses a --window value: one size in seconds or a comma-separated list ('6,60,300').
+    """
+    try:
+        windows = tuple(int(part) for part in value.split(','))
+    except ValueError:
+        raise typer.BadParameter(f"expected seconds or a comma-separated list of seconds, got '{value}'",
+                                 param_hint="--window")
+    if not windows or min(windows) <= 0:
+        raise typer.BadParameter("window sizes must be positive", param_hint="--window")
+    return tuple(sorted(set(windows)))
+
+def base_window(windows, hop: int = None):
+    """
+    The finest window every size in `windows`, and the hop, is a whole number of.
+    """
+    return math.gcd(*windows, hop or 0)
+
+def check_hop(hop: int, windows):
+    """
+    Validates a --hop value: every window size must be a whole number of hops.
+    """
+    if hop is not None and (hop <= 0 or any(window % hop for window in windows)):
+        raise typer.BadParameter(f"the hop must be a positive number of seconds that every window size "
+                                 f"({', '.join(map(str, windows))}) is a multiple of", param_hint="--hop")
+    return hop
+
+
+def window_features(records, window: int, start: int = None, hop: int = None, precision: int = None):
+    """
+    Computes all features in one pass over time-sorted records of PathChanges.
+
+    Yields (window_start, values) for consecutive windows of `window` seconds
+    starting at `start` (default: the first record). Windows without traffic are
+    yielded with zero values so every feature shares the same time grid.
+    With `hop`, windows start every `hop` seconds and overlap (see hopping_windows).
+    The distinct counts use sketches of 2^`precision` registers (exact without one).
+    """
+    if hop and hop != window:
+        yield from hopping_windows(window_stats(records, hop, start, precision), hop, window, hop)
+        return
+    for window_start, stats in window_stats(records, window, start, precision):
+        yield window_start, stats.values()
+
+def window_stats(records, window: int, start: int = None, precision: int = None):
+    """
+    Same as window_features, yielding the mergeable WindowStats of each window.
+    """
+    stats = WindowStats(precision)
+    current = 0
+    for epoch, elem_type, prefix, as_path, origin_as, peer, path_changed in records:
+        if start is None:
+            start = epoch
+        index = (epoch - start) // window
+        if index < 0:
+            continue
+        while index > current:
+            yield start + current * window, stats
+            stats = WindowStats(precision)
+            current += 1
+
+        stats.add(elem_type, prefix, as_path, origin_as, peer)
+
+        # feature_5: AS path changes while the origin AS remains the same
+        if path_changed:
+            stats.changed_prefixes.add(prefix)
+
+    if start is not None and stats.updates:
+        yield start + current * window, stats
+
+class WindowRollup:
+    """
+    Rolls consecutive (window_start, WindowStats) windows of `base` seconds up into
+    windows of `window` seconds (a multiple of `base`), or with `hop`, into windows
+    starting every `hop` seconds, reducing every window to its values once all its base
+    windows are in. Only the windows still open are kept, so memory does not grow with
+    the number of windows.
+
+    With a hop, one SlidingStats follows the windows: each step lets the next hop of
+    base windows enter and the previous one leave. Windows closed by add() and close()
+    are returned as (window_start, values) lists; close() returns the windows starting
+    before the last base window with what they have.
+    """
+    def __init__(self, base: int, window: int, hop: int = None):
+        self.size = window // base
+        self.step = hop // base if hop and hop != window else None
+        self.sliding = SlidingStats() if self.step else None
+        self.stats = None
+        self.count = 0
+
+    def add(self, window_start: int, stats: WindowStats):
+        if self.sliding is not None:
+            # The run keeps its windows: keys take less memory than their strings
+            stats.compact()
+            self.sliding.enter(window_start, stats)
+            if len(self.sliding.run) < self.size:
+                return []
+            result = [(self.sliding.run[0][0], self.sliding.values())]
+            self.sliding.leave(self.step)
+            return result
+        if self.size == 1:
+            return [(window_start, stats.values())]
+        if self.count == 0:
+            self.stats = (window_start, WindowStats())
+        self.stats[1].merge(stats)
+        self.count += 1
+        return self.close() if self.count == self.size else []
+
+    def close(self):
+        result = []
+        if self.sliding is not None:
+            while self.sliding.run:
+                result.append((self.sliding.run[0][0], self.sliding.values()))
+                self.sliding.leave(self.step)
+        elif self.count:
+            result.append((self.stats[0], self.stats[1].values()))
+            self.stats, self.count = None, 0
+        return result
+
+def hopping_windows(windows, base: int, window: int, hop: int):
+    """
+    Yields (window_start, values) for windows of `window` seconds starting every `hop`
+    seconds, from consecutive (window_start, WindowStats) windows of `base` seconds
+    (a list or a stream). Both sizes are multiples of `base` (see WindowRollup).
+    """
+    rollup = WindowRollup(base, window, hop)
+    for window_start, stats in windows:
+        yield from rollup.add(window_start, stats)
+    yield from rollup.close()
+
+
+def extract_windows(input_file: str, head: int = None, window: int = 300, start_time: str = None, **options):
+    """
+    Reads, sorts and windows a bgpreader dump once, returning a list of
+    (window_start, (f0, ..., f13)) tuples. See extract_window_sets for the options.
+    """
+    return extract_window_sets(input_file, head, (window,), start_time, **options)[window]
+
+def extract_window_sets(input_file: str, head: int = None, windows=(300,), start_time: str = None,
+                        stream: bool = False, reorder_tolerance: int = 60, sort_buffer: int = 100000,
+                        engine: str = "petl", chunk_bytes: int = 8 * 1024 * 1024, workers: int = 1,
+                        cache: bool = False, cache_max_bytes: int = 10 * 1024 ** 3,
+                        checkpoint: str = None, resume: bool = False, checkpoint_interval: float = 60,
+                        decompress: str = "auto", hop: int = None, distinct_error: float = DEFAULT_ERROR,
+                        features=None):
+    """
+    Reads, sorts and windows a bgpreader dump once for several window sizes, returning
+    {window: [(window_start, (f0, ..., f13)), ...]}. All sizes share the same start and
+    are rolled up from mergeable aggregates at their greatest common divisor.
+
+    The "numpy" engine computes the same windows from raw blocks of `chunk_bytes`
+    with vectorized counting instead of per-row PETL processing (see vectorized.py).
+
+    With `stream`, records are put in order by a reorder heap of `reorder_tolerance`
+    seconds instead of a full sort. If the input is more out of order than that, the
+    extraction is restarted with an external sort holding `sort_buffer` rows in memory.
+
+    With `workers` > 1 the file is split into byte ranges that a process pool
+    aggregates separately (see parallel.py); the merged windows are the same.
+
+    With `cache`, the parsed columns are kept next to the input file and later runs
+    read them instead of the text (see parse_cache.py).
+
+    With `checkpoint`, the numpy engine saves its state to that file every
+    `checkpoint_interval` seconds and at the end; `resume` continues from it, after an
+    interruption or when lines have been appended to the input (see checkpoint.py).
+
+    Inputs ending in .gz, .bz2, .xz or .zst are decompressed while they are parsed, by
+    a decompressor process or a reader thread as `decompress` says (see compression.py).
+
+    With `hop`, windows of every size start every `hop` seconds instead of one after the
+    other, and are slid over windows of `hop` seconds (see hopping_windows).
+
+    The distinct counts f9 .. f13 are exact for small windows and HyperLogLog sketches
+    with a relative standard error of `distinct_error` beyond; 0 counts exactly
+    throughout (see sketches.py).
+
+    With `features`, a collection of feature indexes, only the aggregates those
+    features need are kept; the values of the other features are not meaningful.
+    """
+    # Time not taken by the read, parse, filter and sort iterators is windowing
+    with STAGES.stage("window"):
+        window_sets = _window_sets(input_file, head, windows, start_time, stream, reorder_tolerance, sort_buffer,
+                                   engine, chunk_bytes, workers, cache, cache_max_bytes, checkpoint, resume,
+                                   checkpoint_interval, decompress, hop, distinct_error, features)
+    STAGES.count("window", rows=sum(len(rows) for rows in window_sets.values()))
+    return window_sets
+
+def _window_sets(input_file, head, windows, start_time, stream, reorder_tolerance, sort_buffer, engine,
+                 chunk_bytes, workers, cache, cache_max_bytes, checkpoint, resume, checkpoint_interval,
+                 decompress, hop, distinct_error, features):
+    typer.echo(f"Reading input file: {input_file}")
+    start = parse_start_time(start_time)
+    if start is not None:
+        typer.echo(f"Using start time: {datetime.fromtimestamp(start)}")
+
+    if engine not in ENGINES:
+        raise typer.BadParameter(f"engine must be one of {', '.join(ENGINES)}", param_hint="--engine")
+    if decompress not in DECOMPRESSORS:
+        raise typer.BadParameter(f"decompress must be one of {', '.join(DECOMPRESSORS)}", param_hint="--decompress")
+    check_hop(hop, windows)
+    if distinct_error < 0:
+        raise typer.BadParameter("the error bound cannot be negative", param_hint="--distinct-error")
+    precision = precision_for(distinct_error)
+
+    if input_file != '-' and is_mrt(input_file) and (engine != "petl" or workers > 1 or cache):
+        raise typer.BadParameter("MRT dumps are decoded record by record; use the petl engine "
+                                 "without --workers or --cache", param_hint="--input")
+    # Byte offsets of a compressed file are not line offsets of its contents
+    if input_file != '-' and compression(input_file) and (workers > 1 or checkpoint):
+        raise typer.BadParameter(f"{compression(input_file)} files are read as one stream; decompress the input "
+                                 "to use --workers or --checkpoint", param_hint="--input")
+
+    if checkpoint:
+        if engine != "numpy" or workers > 1 or cache or input_file == '-':
+            raise typer.BadParameter("checkpoints are taken by the numpy engine reading a file, "
+                                     "without --workers or --cache", param_hint="--checkpoint")
+        from vectorized import checkpointed_windows
+        typer.echo(f"Processing blocks with the numpy engine, checkpointing to {checkpoint}...")
+        return checkpointed_windows(input_file, head, windows, start, chunk_bytes, checkpoint, resume,
+                                    checkpoint_interval, hop, precision, features)
+    if resume:
+        raise typer.BadParameter("there is no --checkpoint to resume from", param_hint="--resume")
+
+    if cache:
+        if input_file == '-':
+            raise typer.BadParameter("stdin cannot be cached", param_hint="--cache")
+        from parse_cache import cached_windows
+        return cached_windows(input_file, head, windows, start, chunk_bytes, cache_max_bytes, decompress, hop,
+                              precision, features)
+
+    if workers > 1:
+        if input_file == '-':
+            raise typer.BadParameter("stdin cannot be split into byte ranges", param_hint="--workers")
+        from parallel import parallel_windows, RangeOverlap
+        typer.echo(f"Processing byte ranges with {workers} workers...")
+        try:
+            return parallel_windows(input_file, head, windows, start, engine, workers, chunk_bytes, hop, precision,
+                                    features)
+        except RangeOverlap as error:
+            typer.echo(f"{error}; running with a single worker.")
+
+    if engine == "numpy":
+        # Imported here because vectorized.py imports the column layout from this module
+        from vectorized import vectorized_windows
+        typer.echo("Processing blocks with the numpy engine...")
+        return vectorized_windows(input_file, head, windows, start, chunk_bytes, decompress, hop, precision,
+                                  features)
+
+    data = PathChanges(read_records(input_file, head, decompress), start, features)
+
+    if stream:
+        typer.echo(f"Streaming rows with a {reorder_tolerance}s reorder tolerance...")
+        try:
+            records = STAGES.timed("sort", reorder(etl.data(data), reorder_tolerance))
+            return _collect_window_sets(records, windows, start, hop, precision)
+        except ReorderError as error:
+            if input_file == '-':
+                raise typer.BadParameter(f"{error}; stdin cannot be re-read, use a larger tolerance",
+                                         param_hint="--reorder-tolerance")
+            typer.echo(f"{error}; falling back to an external sort.")
+
+    typer.echo("Sorting data by parsed timestamp...")
+    data = TimedTable(etl.sort(data, "epoch", buffersize=sort_buffer), "sort")
+    return _collect_window_sets(etl.data(data), windows, start, hop, precision)
+
+def _collect_window_sets(records, windows, start: int = None, hop: int = None, precision: int = None):
+    base = base_window(windows, hop)
+    typer.echo("Processing rows to calculate features...")
+    rollups = {window: WindowRollup(base, window, hop) for window in windows}
+    window_sets = {window: [] for window in windows}
+    for window_start, stats in window_stats(records, base, start, precision):
+        for window, rollup in rollups.items():
+            window_sets[window].extend(rollup.add(window_start, stats))
+    for window, rollup in rollups.items():
+        window_sets[window].extend(rollup.close())
+    return window_sets
+
+
+def feature_table(index: int, windows):
+    """
+    Builds the per-feature (feature_name, timestamp, value) table for feature_<index>.
+    """
+    feature_name = FEATURES[index][1]
+    rows = [("feature_name", "timestamp", "value")]
+    rows.extend((feature_name, datetime.fromtimestamp(start), values[index]) for start, values in windows)
+    return etl.wrap(rows)
+
+def consolidated_table(windows):
+    """
+    Builds the consolidated (timestamp, f0_update_count, ..., f13_unique_as_paths) table.
+    """
+    rows = [CONSOLIDATED_HEADER]
+    rows.extend((datetime.fromtimestamp(start),) + tuple(values) for start, values in windows)
+    return etl.wrap(rows)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import io
+import bz2
+import gzip
+import lzma
+import queue
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:  # optional: .zst inputs can also go through the zstd command
+    zstandard = None
+
+# Decompressor commands by suffix, preferred first. pigz, lbzip2 and pbzip2 use several
+# cores (pbzip2 only on multi-stream files written by pbzip2); xz -T0 decompresses the
+# blocks of multi-threaded xz files in parallel.
+COMMANDS = {
+    ".gz": (["pigz", "-dc"], ["gzip", "-dc"]),
+    ".bz2": (["lbzip2", "-dc"], ["pbzip2", "-dc"], ["bzip2", "-dc"]),
+    ".xz": (["xz", "-dc", "-T0"],),
+    ".zst": (["zstd", "-dcq"],),
+}
+DECOMPRESSORS = ("auto", "process", "thread")
+CHUNK_BYTES = 1024 * 1024
+QUEUE_CHUNKS = 16
+
+
+def compression(input_file: str):
+    """
+    Returns the compression suffix of an input file name, or None.
+    """
+    for suffix in COMMANDS:
+        if input_file.endswith(suffix):
+            return suffix
+    return None
+
+def decompress_command(suffix: str):
+    for command in COMMANDS[suffix]:
+        if shutil.which(command[0]):
+            return command
+    return None
+
+
+@contextmanager
+def open_decompressed(input_file: str, decompress: str = "auto"):
+    """
+    Opens a compressed file as a binary stream that is decompressed while it is read.
+
+    "process" pipes the output of a decompressor command (a parallel one when
+    installed), "thread" decompresses with the Python modules in a reader thread;
+    zlib, bz2, lzma and zstandard release the GIL, so parsing overlaps with both.
+    "auto" uses a command when one is on the PATH.
+    """
+    if decompress not in DECOMPRESSORS:
+        raise ValueError(f"decompress must be one of {', '.join(DECOMPRESSORS)}")
+    suffix = compression(input_file)
+    command = decompress_command(suffix) if decompress != "thread" else None
+    if decompress == "process" and command is None:
+        raise ValueError(f"no decompressor for {suffix} files on the PATH ({', '.join(c[0] for c in COMMANDS[suffix])})")
+
+    if command is not None:
+        process = subprocess.Popen(command + [input_file], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   bufsize=CHUNK_BYTES)
+        try:
+            yield process.stdout
+        finally:
+            at_end = not process.stdout.read(1)
+            process.stdout.close()
+            if not at_end:
+                # The reader stopped early (e.g., --head)
+                process.kill()
+            process.wait()
+            errors = process.stderr.read().decode().strip()
+            process.stderr.close()
+        if at_end and process.returncode != 0:
+            raise OSError(f"{' '.join(command)} {input_file} failed: {errors}")
+    else:
+        reader = ThreadedReader(open_module(input_file, suffix))
+        try:
+            yield io.BufferedReader(reader, CHUNK_BYTES)
+        finally:
+            reader.close()
+
+def open_module(input_file: str, suffix: str):
+    if suffix == ".gz":
+        return gzip.open(input_file, 'rb')
+    if suffix == ".bz2":
+        return bz2.open(input_file, 'rb')
+    if suffix == ".xz":
+        return lzma.open(input_file, 'rb')
+    if zstandard is None:
+        raise OSError(f"reading {input_file} needs the zstd command or the zstandard package")
+    return zstandard.ZstdDecompressor().stream_reader(open(input_file, 'rb'), closefd=True)
+
+
+class ThreadedReader(io.RawIOBase):
+    """
+    Reads a stream in a background thread, at most QUEUE_CHUNKS chunks ahead.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.chunks = queue.Queue(QUEUE_CHUNKS)
+        self.pending = memoryview(b'')
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+        self.thread.start()
+
+    def _produce(self):
+        try:
+            while not self.stopping.is_set():
+                chunk = self.stream.read(CHUNK_BYTES)
+                self.chunks.put(chunk)
+                if not chunk:
+                    return
+        except EOFError as error:
+            # A truncated file; click would take an EOFError for an aborted prompt
+            self.chunks.put(OSError(f"truncated input: {error}"))
+        except Exception as error:  # re-raised in the reading thread
+            self.chunks.put(error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.pending:
+            chunk = self.chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                self.chunks.put(chunk)  # keep answering end of file
+                return 0
+            self.pending = memoryview(chunk)
+        count = min(len(buffer), len(self.pending))
+        buffer[:count] = self.pending[:count]
+        self.pending = self.pending[count:]
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.stopping.set()
+            # Unblocks a producer waiting on a full queue
+            while self.thread.is_alive():
+                try:
+                    self.chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self.stream.close()
+        super().close()
+
+
+class DecompressedSource:
+    """
+    PETL source for a compressed file, see open_decompressed.
+    """
+    def __init__(self, input_file: str, decompress: str = "auto"):
+        self.input_file = input_file
+        self.decompress = decompress
+
+    @contextmanager
+    def open(self, mode='r'):
+        with open_decompressed(self.input_file, self.decompress) as stream:
+            yield stream
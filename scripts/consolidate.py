@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import csv
+import glob
+import heapq
+from itertools import groupby
+from operator import itemgetter
+from datetime import datetime, timedelta
+import typer
+from common import FEATURES
+
+app = typer.Typer()
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+FEATURE_FILE = re.compile(r"feature_(\d+)_")
+# Distinct timestamps read to infer the grid step when --window is not given
+INFER_TIMESTAMPS = 100
+
+
+def feature_files(input_dir: str, collector: str):
+    """
+    Returns [(feature index, path)] for the feature_N_<collector>.csv files of a directory.
+    """
+    files = []
+    for path in glob.glob(os.path.join(input_dir, f"feature_*_{collector}.csv")):
+        match = FEATURE_FILE.match(os.path.basename(path))
+        if match:
+            files.append((int(match.group(1)), path))
+    return sorted(files)
+
+def feature_rows(path: str, position: int):
+    """
+    Yields (timestamp, position, value) for the rows of a per-feature CSV, which must be
+    sorted by timestamp.
+    """
+    with open(path, newline='') as source:
+        reader = csv.reader(source)
+        next(reader, None)
+        previous = ""
+        for _, timestamp, value in reader:
+            if timestamp < previous:
+                raise typer.BadParameter(f"{path} is not sorted by timestamp ({timestamp} after {previous})")
+            previous = timestamp
+            yield timestamp, position, value
+
+def feature_column(index: int, path: str):
+    """
+    Names the column like the notebooks did: f<N>_<feature_name of the file's rows>.
+    """
+    with open(path, newline='') as source:
+        reader = csv.reader(source)
+        next(reader, None)
+        first = next(reader, None)
+    name = first[0] if first else dict(FEATURES).get(f"f{index}", f"feature_{index}")
+    return f"f{index}_{name}"
+
+def infer_window(paths):
+    """
+    The smallest step between the first INFER_TIMESTAMPS distinct timestamps of the files.
+    """
+    steps = []
+    for path in paths:
+        moments = []
+        for timestamp, _, _ in feature_rows(path, 0):
+            moment = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+            if not moments or moment != moments[-1]:
+                moments.append(moment)
+            if len(moments) == INFER_TIMESTAMPS:
+                break
+        steps.extend(later - earlier for earlier, later in zip(moments, moments[1:]))
+    return min(steps) if steps else None
+
+
+def consolidate(files, output: str, window: int = None):
+    """
+    Merges sorted per-feature files into the consolidated layout in one streaming pass.
+
+    Rows are heap-merged by timestamp, so memory does not grow with the files. Windows
+    missing from every file between two timestamps are written as zeros on a regular
+    grid of `window` seconds; features missing at a timestamp are 0, like fillna(0).
+    The output only replaces `output` once the merge has completed. Returns the
+    number of rows written and of zero-filled windows.
+    """
+    paths = [path for _, path in files]
+    step = timedelta(seconds=window) if window else infer_window(paths)
+    header = ["timestamp"] + [feature_column(index, path) for index, path in files]
+
+    rows, filled = 0, 0
+    merged = heapq.merge(*(feature_rows(path, position) for position, path in enumerate(paths)))
+    partial = f"{output}.partial"
+    try:
+        with open(partial, 'w', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(header)
+            expected = None
+            for timestamp, group in groupby(merged, key=itemgetter(0)):
+                moment = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+                while step and expected is not None and expected < moment:
+                    writer.writerow([str(expected)] + ["0"] * len(paths))
+                    expected += step
+                    filled += 1
+                row = ["0"] * len(paths)
+                for _, position, value in group:
+                    row[position] = value
+                writer.writerow([timestamp] + row)
+                rows += 1
+                # Re-anchors the grid on the rows, so an off-grid timestamp does not shift later ones
+                expected = moment + step if step else None
+    except BaseException:
+        os.remove(partial)
+        raise
+    os.replace(partial, output)
+    return rows + filled, filled
+
+
+@app.command()
+def consolidate_features(
+    input_dir: str = typer.Option(..., "--input-dir", help="Directory with the feature_N_<collector>.csv files"),
+    collector: str = typer.Option(..., "--collector", help="Collector name used in the file names (e.g., 'rrc00')"),
+    output: str = typer.Option(None, "--output", help="Output CSV file (default: <input-dir>/consolidated_features_<collector>.csv)"),
+    window: int = typer.Option(None, "--window", help="Window size in seconds for the zero-filled grid (default: inferred)")
+):
+    """
+    Consolidate the per-feature CSV files of a collector into one timestamp-indexed table.
+
+    Replaces the pd.merge chain and fillna(0) of the exploratory notebooks with a
+    streaming k-way merge onto a dense window grid.
+    """
+    files = feature_files(input_dir, collector)
+    if not files:
+        raise typer.BadParameter(f"no feature_N_{collector}.csv files in {input_dir}", param_hint="--input-dir")
+    output = output or os.path.join(input_dir, f"consolidated_features_{collector}.csv")
+
+    typer.echo(f"Merging {len(files)} feature files from {input_dir}...")
+    rows, filled = consolidate(files, output, window)
+    typer.echo(f"Wrote {rows} windows ({filled} zero-filled) to {output}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import json
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import typer
+from rich.console import Console
+from rich.progress import Progress
+from rich.table import Table
+from threadpoolctl import threadpool_limits
+from sklearn.ensemble import IsolationForest
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score, average_precision_score, precision_recall_fscore_support
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import OneClassSVM
+from build import DEFAULT_CATALOG, load_catalog
+from feature_all import window_dir
+from intervals import to_epochs, label_windows
+from parse_cache import fingerprint
+from scorer import read_feature_rows
+
+app = typer.Typer()
+
+MATRIX_DIR = ".matrix-cache"
+MATRIX_VERSION = 1
+# Hyperparameter grids around the settings of the ml-detection notebooks
+GRIDS = {
+    "isolation-forest": {"contamination": [0.01, 0.02, 0.05, 0.1], "n_estimators": [100, 300]},
+    "one-class-svm": {"nu": [0.01, 0.05, 0.1], "gamma": ["scale", 0.1]},
+    "logistic-regression": {"C": [0.01, 0.1, 1.0, 10.0], "class_weight": [None, "balanced"]},
+}
+SUPERVISED = ("logistic-regression",)
+SCALINGS = ("global", "incident")
+RESULT_FIELDS = ("model", "params", "held_out", "windows", "anomalous", "roc_auc", "average_precision",
+                 "precision", "recall", "f1", "fit_seconds")
+
+
+def feature_matrix(csv_path: str):
+    """
+    Returns the paths of the cached (epoch seconds int64, f0..f5 float32) arrays of a
+    consolidated CSV, building them in .matrix-cache next to it when missing or stale.
+    Epochs are naive: timestamps and labeled intervals are compared as written.
+    """
+    cache_dir = os.path.join(os.path.dirname(csv_path), MATRIX_DIR)
+    stem = os.path.join(cache_dir, os.path.splitext(os.path.basename(csv_path))[0])
+    paths = (f"{stem}.epochs.npy", f"{stem}.values.npy")
+    manifest = {"version": MATRIX_VERSION, "input": fingerprint(csv_path)}
+    try:
+        with open(f"{stem}.json") as manifest_file:
+            if json.load(manifest_file) == manifest:
+                return paths
+    except (OSError, ValueError):
+        pass
+
+    typer.echo(f"Caching feature matrix of {csv_path}")
+    os.makedirs(cache_dir, exist_ok=True)
+    timestamps, values = read_feature_rows(csv_path)
+    np.save(paths[0], to_epochs(timestamps))
+    np.save(paths[1], values.astype(np.float32))
+    with open(f"{stem}.json", 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    return paths
+
+def load_matrix(paths):
+    # Memory-mapped, so the worker processes share the pages of the cache files
+    return tuple(np.load(path, mmap_mode='r') for path in paths)
+
+def load_datasets(catalog: str, window: int):
+    """
+    Returns {incident: [(collector, matrix paths, anomaly intervals)]} for the consolidated
+    files of the catalog's incidents at `window` seconds that exist.
+    """
+    datasets = {}
+    for job in load_catalog(catalog):
+        csv_path = os.path.join(window_dir(job.output_dir, window), f"consolidated_features_{job.collector}.csv")
+        if not os.path.exists(csv_path):
+            typer.echo(f"No {csv_path}; {job.name} is left out.")
+            continue
+        datasets.setdefault(job.incident, []).append((job.collector, feature_matrix(csv_path), job.anomaly_intervals))
+    return datasets
+
+
+def make_estimator(model: str, params, seed: int):
+    if model == "isolation-forest":
+        return IsolationForest(random_state=seed, **params)
+    if model == "one-class-svm":
+        return OneClassSVM(kernel='rbf', tol=0.001, **params)
+    return LogisticRegression(random_state=seed, max_iter=1000, **params)
+
+def stack(parts, scaling: str):
+    """
+    Concatenates the (values, labels) of dataset parts, standardizing each part on
+    its own with `scaling` "incident".
+    """
+    values, labels = [], []
+    for paths, intervals in parts:
+        epochs, matrix = load_matrix(paths)
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if scaling == "incident":
+            matrix = StandardScaler().fit_transform(matrix)
+        values.append(matrix)
+        labels.append(label_windows(epochs, to_epochs([start for start, _ in intervals]),
+                                    to_epochs([end for _, end in intervals])))
+    return np.concatenate(values), np.concatenate(labels)
+
+def run_fold(model: str, params, held_out: str, train_parts, test_parts, scaling: str, max_train_rows: int, seed: int):
+    """
+    Fits a model on the training parts and scores the held-out incident. Runs in a worker
+    process, single-threaded so that the pool alone decides how many cores are busy.
+    """
+    with threadpool_limits(1):
+        train_values, train_labels = stack(train_parts, scaling)
+        if max_train_rows and len(train_values) > max_train_rows:
+            keep = np.random.default_rng(seed).choice(len(train_values), max_train_rows, replace=False)
+            train_values, train_labels = train_values[keep], train_labels[keep]
+        started = time.perf_counter()
+        scaler = StandardScaler().fit(train_values)
+        estimator = make_estimator(model, params, seed)
+        if model in SUPERVISED:
+            estimator.fit(scaler.transform(train_values), train_labels)
+        else:
+            estimator.fit(scaler.transform(train_values))
+        fit_seconds = time.perf_counter() - started
+
+        test_values, test_labels = stack(test_parts, scaling)
+        test_values = scaler.transform(test_values)
+        if model in SUPERVISED:
+            scores = estimator.predict_proba(test_values)[:, 1]
+            flagged = scores >= 0.5
+        else:
+            # Higher is more anomalous, like the probability of the anomalous class
+            scores = -estimator.decision_function(test_values)
+            flagged = estimator.predict(test_values) == -1
+
+    both_classes = 0 < test_labels.sum() < len(test_labels)
+    precision, recall, f1, _ = precision_recall_fscore_support(test_labels, flagged, average='binary',
+                                                               zero_division=0)
+    return {"model": model, "params": json.dumps(params, sort_keys=True), "held_out": held_out,
+            "windows": len(test_labels), "anomalous": int(test_labels.sum()),
+            "roc_auc": roc_auc_score(test_labels, scores) if both_classes else float("nan"),
+            "average_precision": average_precision_score(test_labels, scores) if both_classes else float("nan"),
+            "precision": precision, "recall": recall, "f1": f1, "fit_seconds": round(fit_seconds, 3)}
+
+
+def sweep_tasks(datasets, models):
+    """
+    Yields (model, params, held-out incident, training parts, test parts): every grid
+    point of every model, once per labeled incident left out.
+    """
+    parts = {incident: [(paths, intervals) for _, paths, intervals in collectors]
+             for incident, collectors in datasets.items()}
+    labeled = [incident for incident, collectors in datasets.items() if any(intervals for _, _, intervals in collectors)]
+    for model in models:
+        grid = GRIDS[model]
+        for values in itertools.product(*grid.values()):
+            params = dict(zip(grid, values))
+            for held_out in labeled:
+                # The supervised model learns from labeled incidents only
+                train = [incident for incident in (labeled if model in SUPERVISED else parts) if incident != held_out]
+                yield model, params, held_out, [part for incident in train for part in parts[incident]], parts[held_out]
+
+
+@app.command()
+def evaluate_models(
+    catalog: str = typer.Option(DEFAULT_CATALOG, "--catalog", help="Incident catalog with the labeled anomaly intervals"),
+    window: int = typer.Option(6, "--window", help="Window size of the consolidated files (wNNs directory)"),
+    models: str = typer.Option(",".join(GRIDS), "--models", help="Comma-separated models to sweep"),
+    output: str = typer.Option(..., "--output", help="CSV file for the per-fold results"),
+    jobs: int = typer.Option(os.cpu_count(), "--jobs", help="Worker processes"),
+    scaling: str = typer.Option("global", "--scaling", help="global: one scaler fit on the training windows; incident: also standardize each file on its own"),
+    max_train_rows: int = typer.Option(50000, "--max-train-rows", help="Random subsample of the training windows per fold (0 for all)"),
+    seed: int = typer.Option(42, "--seed", help="Random state of the models and the subsample")
+):
+    """
+    Sweep the notebooks' detectors over all incidents with leave-one-incident-out evaluation.
+
+    Each labeled incident is held out in turn; the unsupervised models are fit on the
+    windows of every other incident and LogisticRegression on the other labeled ones.
+    Folds run in parallel on memory-mapped float32 matrices cached next to the CSV files.
+    Writes one row per model, parameters and held-out incident, and prints the mean
+    over incidents per parameter set, best average precision first.
+    """
+    model_list = [model.strip() for model in models.split(",")]
+    unknown = [model for model in model_list if model not in GRIDS]
+    if unknown:
+        raise typer.BadParameter(f"models must be among {', '.join(GRIDS)}", param_hint="--models")
+    if scaling not in SCALINGS:
+        raise typer.BadParameter(f"scaling must be one of {', '.join(SCALINGS)}", param_hint="--scaling")
+
+    datasets = load_datasets(catalog, window)
+    tasks = list(sweep_tasks(datasets, model_list))
+    if not tasks:
+        raise typer.BadParameter(f"no labeled incident has w{window:02d}s consolidated features", param_hint="--catalog")
+
+    typer.echo(f"Running {len(tasks)} folds on {jobs} workers...")
+    results = []
+    with ProcessPoolExecutor(max(jobs, 1)) as pool, Progress() as progress:
+        task = progress.add_task("Evaluating", total=len(tasks))
+        futures = [pool.submit(run_fold, *fold, scaling, max_train_rows, seed) for fold in tasks]
+        for future in as_completed(futures):
+            results.append(future.result())
+            progress.update(task, advance=1)
+
+    results.sort(key=lambda result: (result["model"], result["params"], result["held_out"]))
+    with open(output, 'w', newline='') as out:
+        writer = csv.DictWriter(out, RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    show_summary(results)
+    typer.echo(f"Wrote {len(results)} fold results to {output}")
+
+
+def summarize(results):
+    """
+    Returns [(model, params, mean ROC AUC, mean average precision, mean F1)] over the
+    held-out incidents, best average precision first.
+    """
+    summary = []
+    for (model, params), folds in itertools.groupby(results, key=lambda result: (result["model"], result["params"])):
+        folds = list(folds)
+        summary.append((model, params) + tuple(float(np.nanmean([fold[metric] for fold in folds]))
+                                               for metric in ("roc_auc", "average_precision", "f1")))
+    return sorted(summary, key=lambda row: -np.nan_to_num(row[3], nan=-1))
+
+def show_summary(results):
+    table = Table(title="Leave-one-incident-out results (mean over held-out incidents)")
+    for column in ("model", "params", "ROC AUC", "avg precision", "F1"):
+        table.add_column(column, justify="left" if column in ("model", "params") else "right")
+    best = set()
+    for model, params, roc_auc, average_precision, f1 in summarize(results):
+        style = None if model in best else "bold green"
+        best.add(model)
+        shown = ", ".join(f"{name}={value}" for name, value in json.loads(params).items())
+        table.add_row(model, shown, f"{roc_auc:.3f}", f"{average_precision:.3f}", f"{f1:.3f}", style=style)
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    app()
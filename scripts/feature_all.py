@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import os
+import inspect
+import typer
+from common import FEATURES, CONSOLIDATED_HEADER, DEFAULT_ERROR, extract_window_sets, parse_windows, parse_features, feature_table, consolidated_table, write_output, instrumented, STAGES
+from feature_store import window_dir, store_dir, write_store
+
+app = typer.Typer()
+
+LAYOUTS = ("per-feature", "consolidated", "both")
+
+@app.command()
+def extract_all_features(
+    input: str = typer.Option(..., "--input", help="Input CSV file (may be .gz, .bz2, .xz or .zst)"),
+    head: int = typer.Option(None, "--head", help="Number of rows to process"),
+    output_dir: str = typer.Option(..., "--output-dir", help="Directory for the output CSV files"),
+    collector: str = typer.Option(..., "--collector", help="Collector name used in output file names (e.g., 'rrc00')"),
+    window: str = typer.Option("300", "--window", help="Time window size in seconds, or a comma-separated list (e.g., '6,60,300')"),
+    hop: int = typer.Option(None, "--hop", help="Start a window of every size every this many seconds (default: the window size)"),
+    window_dirs: bool = typer.Option(False, "--window-dirs", help="Write each window size into <output-dir>/wNNs (implied by a list)"),
+    start_time: str = typer.Option(None, "--start-time", help="Starting timestamp for time windows (e.g., '2024-12-12 00:00:00')"),
+    stream: bool = typer.Option(False, "--stream", help="Order rows with a bounded reorder buffer instead of a full sort"),
+    reorder_tolerance: int = typer.Option(60, "--reorder-tolerance", help="Maximum out-of-order delay in seconds accepted by --stream"),
+    sort_buffer: int = typer.Option(100000, "--sort-buffer", help="Rows kept in memory by the external sort"),
+    engine: str = typer.Option("petl", "--engine", help="Processing engine: petl or numpy"),
+    chunk_bytes: int = typer.Option(8 * 1024 * 1024, "--chunk-bytes", help="Input block size for the numpy engine"),
+    workers: int = typer.Option(1, "--workers", help="Worker processes splitting the input file into byte ranges"),
+    cache: bool = typer.Option(False, "--cache", help="Keep parsed columns in <input dir>/.parse-cache and reuse them"),
+    cache_max_bytes: int = typer.Option(10 * 1024 ** 3, "--cache-max-bytes", help="Size bound of the parse cache directory"),
+    checkpoint: str = typer.Option(None, "--checkpoint", help="Save the numpy engine's state to this file periodically and at the end"),
+    checkpoint_interval: float = typer.Option(60, "--checkpoint-interval", help="Seconds between checkpoints"),
+    resume: bool = typer.Option(False, "--resume", help="Continue an interrupted run from --checkpoint"),
+    append: bool = typer.Option(False, "--append", help="Process only the lines added since --checkpoint and append the new windows to the output"),
+    report: str = typer.Option(None, "--report", help="Write rows, bytes, time and peak memory per stage as JSON to this file"),
+    decompress: str = typer.Option("auto", "--decompress", help="For .gz/.bz2/.xz/.zst inputs: process (decompressor command), thread (Python module) or auto"),
+    distinct_error: float = typer.Option(DEFAULT_ERROR, "--distinct-error", help="Relative standard error of the distinct counts f9..f13 (0 for exact counts)"),
+    features: str = typer.Option(None, "--features", help="Comma-separated feature numbers to compute and write (e.g., '0,5'; default: all)"),
+    layout: str = typer.Option("per-feature", "--layout", help="Output layout: per-feature, consolidated or both"),
+    store: bool = typer.Option(False, "--store", help="Also write the consolidated features to a day-sharded NumPy store in <dir>/store_<collector> (see feature_store.py)")
+):
+    """
+    Extract all features (feature_0 .. feature_13) in a single pass over the input.
+
+    Writes feature_N_<collector>.csv files and/or consolidated_features_<collector>.csv.
+    With several window sizes, all are rolled up from one pass and each is written to
+    its own wNNs directory (e.g., w06s, w60s). With --hop, windows overlap: a window
+    of each size starts every --hop seconds. With --store, the notebooks can load time
+    ranges of the consolidated features without reading the CSV files. With --features,
+    only those features are computed and their per-feature files written.
+    """
+    if layout not in LAYOUTS:
+        raise typer.BadParameter(f"layout must be one of {', '.join(LAYOUTS)}", param_hint="--layout")
+    selected = parse_features(features)
+    if selected is not None and (layout != "per-feature" or store):
+        raise typer.BadParameter("the consolidated file and the store hold every feature; "
+                                 "use --layout per-feature without --store", param_hint="--features")
+
+    windows = parse_windows(window)
+    with instrumented(report):
+        window_sets = extract_window_sets(input, head=head, windows=windows, start_time=start_time,
+                                          stream=stream, reorder_tolerance=reorder_tolerance, sort_buffer=sort_buffer,
+                                          engine=engine, chunk_bytes=chunk_bytes, workers=workers,
+                                          cache=cache, cache_max_bytes=cache_max_bytes,
+                                          checkpoint=checkpoint, resume=resume or append, checkpoint_interval=checkpoint_interval,
+                                          decompress=decompress, hop=hop, distinct_error=distinct_error, features=selected)
+
+        for size, rows in window_sets.items():
+            directory = window_dir(output_dir, size) if window_dirs or len(windows) > 1 else output_dir
+            write_features(rows, directory, collector, layout, append, store, selected)
+    typer.echo("Feature extraction complete!")
+
+
+def output_files(output_dir: str, collector: str, layout: str, features=None):
+    """
+    Returns [(feature index or None for the consolidated file, path)] written for a layout,
+    with the per-feature files of `features` only (default: all).
+    """
+    files = []
+    if layout in ("per-feature", "both"):
+        indexes = range(len(FEATURES)) if features is None else features
+        files += [(index, os.path.join(output_dir, f"feature_{index}_{collector}.csv")) for index in indexes]
+    if layout in ("consolidated", "both"):
+        files.append((None, os.path.join(output_dir, f"consolidated_features_{collector}.csv")))
+    return files
+
+def write_features(windows, output_dir: str, collector: str, layout: str, append: bool = False, store: bool = False,
+                   features=None):
+    """
+    Writes the per-feature and/or consolidated CSV files of one window size,
+    appending to the existing files with `append`, and the feature store with `store`
+    (rewritten as a whole: the windows are always complete).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for index, output in output_files(output_dir, collector, layout, features):
+        typer.echo(f"Writing results to output file: {output}")
+        table = consolidated_table(windows) if index is None else feature_table(index, windows)
+        write_output(output, table, append)
+    if store:
+        directory = store_dir(output_dir, collector)
+        typer.echo(f"Writing feature store: {directory}")
+        with STAGES.stage("write"):
+            write_store(directory, CONSOLIDATED_HEADER, windows)
+
+
+# Options of extract_all_features that feature_app replaces or leaves out
+SINGLE_FEATURE_OPTIONS = {
+    "output_dir": inspect.Parameter("output", inspect.Parameter.KEYWORD_ONLY, annotation=str,
+                                    default=typer.Option(..., "--output", help="Output CSV file")),
+    "window": inspect.Parameter("window", inspect.Parameter.KEYWORD_ONLY, annotation=int,
+                                default=typer.Option(300, "--window", help="Time window size in seconds")),
+    "collector": None, "window_dirs": None, "distinct_error": None, "features": None, "layout": None, "store": None,
+}
+
+def feature_app(index: int, description: str):
+    """
+    Builds the command line of feature_<index>.py: the options of extract_all_features
+    for a single window size and output file, computing feature_<index> only.
+    """
+    app = typer.Typer()
+
+    def extract_feature(output: str, window: int, append: bool, report: str, **options):
+        with instrumented(report):
+            windows = extract_window_sets(options.pop("input"), windows=(window,), features=(index,),
+                                          resume=options.pop("resume") or append, **options)[window]
+            typer.echo(f"Writing results to output file: {output}")
+            write_output(output, feature_table(index, windows), append=append)
+        typer.echo("Feature extraction complete!")
+
+    parameters = inspect.signature(extract_all_features).parameters.values()
+    extract_feature.__signature__ = inspect.Signature([
+        SINGLE_FEATURE_OPTIONS.get(parameter.name, parameter.replace(kind=inspect.Parameter.KEYWORD_ONLY))
+        for parameter in parameters if SINGLE_FEATURE_OPTIONS.get(parameter.name, parameter) is not None])
+    extract_feature.__name__ = f"extract_feature_{index}"
+    extract_feature.__doc__ = f"Extract feature_{index}: {description}"
+    app.command()(extract_feature)
+    return app
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import csv
+from datetime import datetime
+import typer
+import petl as etl
+from common import CONSOLIDATED_HEADER, DEFAULT_ERROR, PathChanges, read_records, parse_start_time, window_features, check_hop
+from sketches import precision_for
+from reorder import reorder
+
+app = typer.Typer()
+
+FORMATS = ("csv", "jsonl")
+
+@app.command()
+def extract_live_features(
+    input: str = typer.Option("-", "--input", help="Input stream: '-' for stdin, or a file/FIFO path"),
+    head: int = typer.Option(None, "--head", help="Number of rows to process"),
+    output: str = typer.Option("-", "--output", help="Output file, '-' for stdout"),
+    window: int = typer.Option(300, "--window", help="Time window size in seconds"),
+    hop: int = typer.Option(None, "--hop", help="Start a window every this many seconds (default: the window size)"),
+    start_time: str = typer.Option(None, "--start-time", help="Starting timestamp for time windows (e.g., '2024-12-12 00:00:00')"),
+    reorder_tolerance: int = typer.Option(2, "--reorder-tolerance", help="Maximum out-of-order delay in seconds; later rows are dropped"),
+    distinct_error: float = typer.Option(DEFAULT_ERROR, "--distinct-error", help="Relative standard error of the distinct counts f9..f13 (0 for exact counts)"),
+    format: str = typer.Option("csv", "--format", help="Output format: csv or jsonl")
+):
+    """
+    Extract all features online from a live bgpreader stream.
+
+    Each window is written and flushed as soon as the stream moves past its end,
+    so rows appear one window length (plus the reorder tolerance) after the traffic.
+    With --hop, a window ends every --hop seconds.
+
+    Example: bgpreader -p ris -c rrc00 -t updates -w <now> | ./feature_live.py --window 6
+    """
+    if format not in FORMATS:
+        raise typer.BadParameter(f"format must be one of {', '.join(FORMATS)}", param_hint="--format")
+    check_hop(hop, (window,))
+    if distinct_error < 0:
+        raise typer.BadParameter("the error bound cannot be negative", param_hint="--distinct-error")
+
+    # Status messages go to stderr so stdout only carries feature rows
+    typer.echo(f"Reading input stream: {input}", err=True)
+    start = parse_start_time(start_time)
+    records = etl.data(PathChanges(read_records(input, head), start))
+
+    late_rows = 0
+    def on_late(record):
+        nonlocal late_rows
+        if not late_rows:
+            typer.echo(f"Dropping row at {datetime.fromtimestamp(record[0])}: later than the "
+                       f"{reorder_tolerance}s reorder tolerance (further late rows are only counted)", err=True)
+        late_rows += 1
+
+    out = sys.stdout if output == '-' else open(output, 'w', newline='', buffering=1)
+    try:
+        writer = csv.writer(out)
+        if format == "csv":
+            writer.writerow(CONSOLIDATED_HEADER)
+            out.flush()
+
+        for window_start, values in window_features(reorder(records, reorder_tolerance, on_late),
+                                                    window, start, hop,
+                                                    precision_for(distinct_error)):
+            row = (str(datetime.fromtimestamp(window_start)),) + tuple(values)
+            if format == "csv":
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(dict(zip(CONSOLIDATED_HEADER, row))) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    typer.echo(f"Stream ended; {late_rows} late rows dropped.", err=True)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import shutil
+from datetime import datetime
+import numpy as np
+
+# Bump when the layout of the store changes
+STORE_VERSION = 1
+# Windows of one shard: a day of naive time
+SHARD_SECONDS = 86400
+INDEX_FILE = "index.json"
+TIMESTAMP = "timestamp"
+FEATURES_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "features")
+
+
+def window_dir(output_dir: str, window: int):
+    return os.path.join(output_dir, f"w{window:02d}s")
+
+def store_dir(output_dir: str, collector: str):
+    return os.path.join(output_dir, f"store_{collector}")
+
+def to_seconds(timestamp):
+    """
+    Naive epoch seconds of a '%Y-%m-%d %H:%M:%S' string, datetime or numpy.datetime64,
+    compared as written like the timestamps of the consolidated files.
+    """
+    return int(np.datetime64(timestamp, 's').astype(np.int64))
+
+
+def write_store(directory: str, header, windows):
+    """
+    Writes (window_start, values) windows as a store of one .npy file per column and
+    day, replacing the store in `directory`. `header` names the timestamp and value
+    columns, like the consolidated CSV. Timestamps are kept as the naive seconds of the
+    local times the CSV files show.
+    """
+    starts = np.array([datetime.fromtimestamp(start) for start, _ in windows], dtype="datetime64[s]").astype(np.int64)
+    columns = {name: np.array([values[i] for _, values in windows]) for i, name in enumerate(header[1:])}
+    building = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    shards = []
+    bounds = np.flatnonzero(np.diff(starts // SHARD_SECONDS)) + 1
+    for begin, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(starts)]))):
+        if begin == end:
+            continue
+        name = f"{int(starts[begin]) // SHARD_SECONDS:06d}"
+        os.makedirs(os.path.join(building, name))
+        np.save(os.path.join(building, name, f"{TIMESTAMP}.npy"), starts[begin:end])
+        for column, values in columns.items():
+            np.save(os.path.join(building, name, f"{column}.npy"), values[begin:end])
+        shards.append({"name": name, "first": int(starts[begin]), "last": int(starts[end - 1]), "rows": int(end - begin)})
+
+    with open(os.path.join(building, INDEX_FILE), 'w') as index_file:
+        json.dump({"version": STORE_VERSION, "columns": list(header[1:]),
+                   "dtypes": {column: values.dtype.str for column, values in columns.items()},
+                   "shards": shards}, index_file, indent=1)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(building, directory)
+
+
+class FeatureStore:
+    """
+    Reads time ranges of a store written by write_store. The shard files are memory
+    mapped, so a range inside one shard is a view of the page cache without copies.
+    """
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, INDEX_FILE)) as index_file:
+            index = json.load(index_file)
+        if index.get("version") != STORE_VERSION:
+            raise ValueError(f"{directory} was written by another version of feature_store.py")
+        self.directory = directory
+        self.columns = index["columns"]
+        self.dtypes = index["dtypes"]
+        self.shards = index["shards"]
+        self.firsts = np.array([shard["first"] for shard in self.shards], dtype=np.int64)
+        self.lasts = np.array([shard["last"] for shard in self.shards], dtype=np.int64)
+
+    def _array(self, shard, column: str):
+        return np.load(os.path.join(self.directory, shard["name"], f"{column}.npy"), mmap_mode='r')
+
+    def read(self, t0=None, t1=None, columns=None):
+        """
+        Returns {"timestamp": datetime64[s] array, column: array} for the windows starting
+        between t0 and t1 (both included, open when None), with all columns by default.
+        """
+        columns = list(self.columns if columns is None else columns)
+        unknown = [column for column in columns if column not in self.columns]
+        if unknown:
+            raise KeyError(f"no columns {', '.join(unknown)} in {self.directory}")
+        low = -np.inf if t0 is None else to_seconds(t0)
+        high = np.inf if t1 is None else to_seconds(t1)
+        parts = []
+        for i in np.flatnonzero((self.lasts >= low) & (self.firsts <= high)):
+            shard = self.shards[i]
+            times = self._array(shard, TIMESTAMP)
+            begin = np.searchsorted(times, low, side='left') if t0 is not None else 0
+            end = np.searchsorted(times, high, side='right') if t1 is not None else len(times)
+            if begin < end:
+                parts.append({TIMESTAMP: times[begin:end],
+                              **{column: self._array(shard, column)[begin:end] for column in columns}})
+        if len(parts) == 1:
+            result = parts[0]
+        else:
+            result = {name: np.concatenate([part[name] for part in parts]) if parts else
+                      np.zeros(0, dtype=np.int64 if name == TIMESTAMP else self.dtypes[name])
+                      for name in [TIMESTAMP] + columns}
+        result[TIMESTAMP] = result[TIMESTAMP].view("datetime64[s]")
+        return result
+
+
+def open_store(incident: str, collector: str, window: int, root: str = FEATURES_ROOT):
+    """
+    The store of features/<incident>/wNNs/store_<collector>.
+    """
+    return FeatureStore(store_dir(window_dir(os.path.join(root, incident), window), collector))
+
+def load_features(incident: str, collector: str, window: int, t0=None, t1=None, columns=None,
+                  root: str = FEATURES_ROOT):
+    """
+    Returns {"timestamp": ..., column: ...} arrays of the windows of one incident,
+    collector and window size starting between t0 and t1 (e.g., '2005-05-24 22:10:09'),
+    e.g. load_features("2005-moscow-blackout", "rrc05", 6, t0, t1, ["f0_update_count"]).
+    """
+    return open_store(incident, collector, window, root).read(t0, t1, columns)
+
+def load_frame(incident: str, collector: str, window: int, t0=None, t1=None, columns=None,
+               root: str = FEATURES_ROOT):
+    """
+    load_features as a pandas DataFrame indexed by timestamp, like the consolidated CSV
+    read with pd.read_csv and pd.to_datetime.
+    """
+    import pandas as pd  # only for notebooks that want a DataFrame
+    arrays = load_features(incident, collector, window, t0, t1, columns, root)
+    timestamps = arrays.pop(TIMESTAMP)
+    return pd.DataFrame(arrays, index=pd.DatetimeIndex(timestamps, name=TIMESTAMP))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import csv
+import numpy as np
+import typer
+from rich.console import Console
+from rich.table import Table
+from build import DEFAULT_CATALOG, load_catalog
+
+app = typer.Typer()
+
+# Cells of the (thresholds x windows) comparison held at once by threshold_runs
+MAX_CELLS = 1 << 26
+EVENT_FIELDS = ("threshold", "intervals", "precision", "recall", "f1", "coverage", "iou", "mean_delay")
+# Scores thresholds can be ranked by, higher is better; ties go to the higher IoU
+RANKINGS = ("f1", "iou", "coverage", "precision", "recall")
+
+
+def to_epochs(timestamps):
+    """
+    Converts '%Y-%m-%d %H:%M:%S' strings to int64 seconds, without a time zone: feature
+    timestamps and labeled intervals are compared as they are written.
+    """
+    return np.array(timestamps, dtype="datetime64[s]").astype(np.int64)
+
+def threshold_runs(scores, thresholds, max_cells: int = MAX_CELLS):
+    """
+    Finds the runs of consecutive windows scoring below each threshold, for all
+    thresholds at once. Returns (threshold index, first window, window after the run)
+    arrays, sorted by threshold and then by position.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    rows = max(1, max_cells // max(len(scores), 1))
+    groups, starts, ends = [], [], []
+    for first in range(0, len(thresholds), rows):
+        block = thresholds[first:first + rows]
+        # Run-length encoding: +1 where a run starts, -1 after it ends
+        padded = np.zeros((len(block), len(scores) + 2), dtype=np.int8)
+        padded[:, 1:-1] = scores[None, :] < block[:, None]
+        change = np.diff(padded, axis=1)
+        group, start = np.nonzero(change == 1)
+        _, end = np.nonzero(change == -1)
+        groups.append(group + first)
+        starts.append(start)
+        ends.append(end)
+    return np.concatenate(groups), np.concatenate(starts), np.concatenate(ends)
+
+def runs_to_intervals(times, starts, ends):
+    """
+    Turns window runs into (start, end) times like the notebooks'
+    compute_anomaly_intervals_from_score: a run ends at the time of the first window
+    back above the threshold, or at the last window when it lasts until the end.
+    """
+    times = np.asarray(times)
+    return times[starts], times[np.minimum(ends, len(times) - 1)]
+
+def merge_intervals(starts, ends, gap=0, groups=None):
+    """
+    Merges intervals whose gap to the ones before them in the same group is at most
+    `gap`, like the notebooks' merge_intervals but for every group (e.g., threshold) in
+    one pass. Returns (groups, starts, ends) sorted by group and start.
+    """
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    groups = np.zeros(len(starts), dtype=np.int64) if groups is None else np.asarray(groups)
+    if not len(starts):
+        return groups, starts, ends
+    order = np.lexsort((starts, groups))
+    groups, starts, ends = groups[order], starts[order], ends[order]
+    # Shifting each group past the end of the previous one lets a single running
+    # maximum of the ends serve all groups
+    shift = (groups - groups[0]) * (ends.max() - starts.min() + gap + 1)
+    reach = np.maximum.accumulate(ends + shift)
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = starts[1:] + shift[1:] - reach[:-1] > gap
+    heads = np.flatnonzero(first)
+    return groups[heads], starts[heads], np.maximum.reduceat(ends, heads)
+
+def label_windows(times, label_starts, label_ends):
+    """
+    1 for the windows whose time is within one of the [start, end] labeled intervals.
+    """
+    times = np.asarray(times)
+    _, starts, ends = merge_intervals(label_starts, label_ends)
+    index = np.searchsorted(starts, times, side='right') - 1
+    inside = index >= 0
+    inside[inside] = times[inside] <= ends[index[inside]]
+    return inside.astype(np.int8)
+
+
+def event_scores(groups, starts, ends, label_starts, label_ends, count: int):
+    """
+    Event-level comparison of the detected intervals of `count` groups with the labeled
+    intervals. Per group, returns arrays of:
+
+    - intervals: detected intervals
+    - precision: share of the detected time within labeled intervals (0 without any), so
+      detections outside the labels count against it however few intervals they make
+    - recall: share of labeled intervals overlapped by a detected one
+    - f1: harmonic mean of the two
+    - coverage: share of the labeled time covered by detections
+    - iou: labeled and detected time in common over their union
+    - mean_delay: mean time from the start of a detected labeled interval to the first
+      detection inside it (NaN when none is detected)
+
+    Detected intervals must not overlap within a group (see merge_intervals).
+    """
+    _, label_starts, label_ends = merge_intervals(label_starts, label_ends)
+    groups, starts, ends = np.asarray(groups), np.asarray(starts), np.asarray(ends)
+    labels = len(label_starts)
+    # Detected x labeled overlaps; there are few labeled intervals per incident
+    overlaps = (starts[:, None] <= label_ends[None, :]) & (ends[:, None] >= label_starts[None, :])
+    common = np.clip(np.minimum(ends[:, None], label_ends[None, :]) - np.maximum(starts[:, None], label_starts[None, :]),
+                     0, None) * overlaps
+
+    detected = np.bincount(groups, minlength=count)
+    pair = (groups[:, None] * labels + np.arange(labels)[None, :])[overlaps]
+    found = np.bincount(pair, minlength=count * labels).reshape(count, labels) > 0
+    first_seen = np.full(count * labels, np.inf)
+    np.minimum.at(first_seen, pair, np.broadcast_to(np.maximum(starts[:, None], label_starts[None, :]), overlaps.shape)[overlaps])
+    delays = first_seen.reshape(count, labels) - label_starts[None, :]
+
+    intersection = np.bincount(groups, weights=common.sum(axis=1), minlength=count)
+    labeled_time = float((label_ends - label_starts).sum())
+    detected_time = np.bincount(groups, weights=ends - starts, minlength=count)
+    union = labeled_time + detected_time - intersection
+
+    precision = np.divide(intersection, detected_time, out=np.zeros(count), where=detected_time > 0)
+    recall = found.sum(axis=1) / max(labels, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        mean_delay = np.where(found.any(axis=1), np.where(found, delays, 0).sum(axis=1) / found.sum(axis=1), np.nan)
+    return {"intervals": detected, "precision": precision, "recall": recall, "f1": f1,
+            "coverage": intersection / labeled_time if labeled_time else np.zeros(count),
+            "iou": np.divide(intersection, union, out=np.zeros(count), where=union > 0),
+            "mean_delay": mean_delay}
+
+def sweep_thresholds(times, scores, thresholds, label_starts, label_ends, gap=0):
+    """
+    Detected intervals (scores below the threshold, merged within `gap`) scored against
+    the labeled intervals, for every threshold. Returns event_scores plus "threshold".
+    """
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    groups, first, after = threshold_runs(scores, thresholds)
+    starts, ends = runs_to_intervals(times, first, after)
+    groups, starts, ends = merge_intervals(starts, ends, gap, groups)
+    return {"threshold": thresholds,
+            **event_scores(groups, starts, ends, label_starts, label_ends, len(thresholds))}
+
+
+def read_scores(path: str, column: str):
+    with open(path, newline='') as source:
+        reader = csv.DictReader(source)
+        if column not in (reader.fieldnames or ()):
+            raise typer.BadParameter(f"{path} has no {column} column", param_hint="--score-column")
+        rows = [(row["timestamp"], float(row[column])) for row in reader]
+    rows.sort()
+    return to_epochs([timestamp for timestamp, _ in rows]), np.array([score for _, score in rows])
+
+@app.command()
+def sweep(
+    scores: str = typer.Option(..., "--scores", help="CSV with timestamp and score columns (e.g., scorer.py score output)"),
+    incident: str = typer.Option(..., "--incident", help="Incident of the catalog whose anomaly_intervals are the labels"),
+    catalog: str = typer.Option(DEFAULT_CATALOG, "--catalog", help="Incident catalog"),
+    score_column: str = typer.Option("decision_score", "--score-column", help="Column flagged when below the threshold"),
+    thresholds: int = typer.Option(100, "--thresholds", help="Thresholds to try, at evenly spaced quantiles of the scores"),
+    gap: int = typer.Option(240, "--gap", help="Seconds between detected intervals that are merged"),
+    output: str = typer.Option(None, "--output", help="Write the scores of every threshold to this CSV file"),
+    sort: str = typer.Option("f1", "--sort", help=f"Ranking of the thresholds shown: {', '.join(RANKINGS)}"),
+    top: int = typer.Option(10, "--top", help="Thresholds shown, best first")
+):
+    """
+    Score the anomaly intervals detected at many thresholds against the labeled ones.
+    """
+    if sort not in RANKINGS:
+        raise typer.BadParameter(f"sort must be one of {', '.join(RANKINGS)}", param_hint="--sort")
+    labels = {job.incident: job.anomaly_intervals for job in load_catalog(catalog)}
+    if not labels.get(incident):
+        raise typer.BadParameter(f"{incident} has no anomaly_intervals in {catalog}", param_hint="--incident")
+    label_starts = to_epochs([start for start, _ in labels[incident]])
+    label_ends = to_epochs([end for _, end in labels[incident]])
+    times, values = read_scores(scores, score_column)
+    candidates = np.unique(np.quantile(values, np.linspace(0, 1, thresholds + 1)[1:]))
+    result = sweep_thresholds(times, values, candidates, label_starts, label_ends, gap)
+
+    if output:
+        with open(output, 'w', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(EVENT_FIELDS)
+            writer.writerows(zip(*(result[field].tolist() for field in EVENT_FIELDS)))
+    table = Table(title=f"{incident}: {len(candidates)} thresholds, gap {gap}s")
+    for field in EVENT_FIELDS:
+        table.add_column(field, justify="right")
+    for index in np.lexsort((-result["iou"], -result[sort]))[:top]:
+        table.add_row(*(f"{result[field][index]:.4g}" for field in EVENT_FIELDS))
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    app()
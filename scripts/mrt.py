@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+import bz2
+import gzip
+import os
+import socket
+import stat
+import struct
+
+# MRT record types and BGP4MP subtypes (RFC 6396, RFC 8050)
+BGP4MP, BGP4MP_ET = 16, 17
+STATE_CHANGE, MESSAGE, MESSAGE_AS4, STATE_CHANGE_AS4 = 0, 1, 4, 5
+MESSAGE_LOCAL, MESSAGE_AS4_LOCAL = 6, 7
+MESSAGE_ADDPATH, MESSAGE_AS4_ADDPATH, MESSAGE_LOCAL_ADDPATH, MESSAGE_AS4_LOCAL_ADDPATH = 8, 9, 10, 11
+STATE_SUBTYPES = {STATE_CHANGE, STATE_CHANGE_AS4}
+MESSAGE_SUBTYPES = {MESSAGE, MESSAGE_AS4, MESSAGE_LOCAL, MESSAGE_AS4_LOCAL,
+                    MESSAGE_ADDPATH, MESSAGE_AS4_ADDPATH, MESSAGE_LOCAL_ADDPATH, MESSAGE_AS4_LOCAL_ADDPATH}
+AS4_SUBTYPES = {MESSAGE_AS4, STATE_CHANGE_AS4, MESSAGE_AS4_LOCAL, MESSAGE_AS4_ADDPATH, MESSAGE_AS4_LOCAL_ADDPATH}
+ADDPATH_SUBTYPES = {MESSAGE_ADDPATH, MESSAGE_AS4_ADDPATH, MESSAGE_LOCAL_ADDPATH, MESSAGE_AS4_LOCAL_ADDPATH}
+
+BGP_UPDATE = 2
+BGP_HEADER_BYTES = 19
+ATTR_AS_PATH, ATTR_NEXT_HOP, ATTR_MP_REACH_NLRI, ATTR_MP_UNREACH_NLRI, ATTR_AS4_PATH = 2, 3, 14, 15, 17
+ATTR_EXTENDED_LENGTH = 0x10
+AS_SET, AS_SEQUENCE, AS_CONFED_SEQUENCE, AS_CONFED_SET = 1, 2, 3, 4
+AFI_FAMILIES = {1: socket.AF_INET, 2: socket.AF_INET6}
+ADDRESS_BYTES = {socket.AF_INET: 4, socket.AF_INET6: 16}
+
+MRT_HEADER = struct.Struct(">IHHI")
+READ_BYTES = 4 * 1024 * 1024
+
+# Elements are tuples in this layout, one per prefix, in bgpreader's order:
+# withdrawals, MP_UNREACH withdrawals, announcements, MP_REACH announcements.
+# Peer state changes are 'S' elements with empty prefix and path fields.
+ELEM_FIELDS = ("type", "timestamp", "peer_asn", "peer_ip", "prefix", "next_hop", "as_path", "origin_as")
+
+
+def open_dump(input_file: str):
+    """
+    Opens an MRT dump, decompressing .bz2 and .gz files.
+    """
+    if input_file.endswith('.bz2'):
+        return bz2.open(input_file, 'rb')
+    if input_file.endswith('.gz'):
+        return gzip.open(input_file, 'rb')
+    return open(input_file, 'rb')
+
+def is_mrt(input_file: str):
+    """
+    Tells MRT update dumps from bgpreader text by the type of their first record header.
+    Only regular files are read: the first bytes of a pipe would be lost to the reader.
+    """
+    try:
+        if not stat.S_ISREG(os.stat(input_file).st_mode):
+            return False
+        with open_dump(input_file) as source:
+            header = source.read(MRT_HEADER.size)
+    except (OSError, EOFError):
+        return False
+    return len(header) == MRT_HEADER.size and MRT_HEADER.unpack(header)[1] in (BGP4MP, BGP4MP_ET)
+
+
+def mrt_records(source):
+    """
+    Yields (timestamp, type, subtype, body) for the records of an MRT stream.
+    Bodies are memoryview slices of the read buffer; a truncated last record is dropped.
+    """
+    pending = b''
+    while True:
+        data = source.read(READ_BYTES)
+        if not data:
+            return
+        buffer = pending + data if pending else data
+        view = memoryview(buffer)
+        offset, size = 0, len(buffer)
+        while offset + MRT_HEADER.size <= size:
+            timestamp, record_type, subtype, length = MRT_HEADER.unpack_from(buffer, offset)
+            end = offset + MRT_HEADER.size + length
+            if end > size:
+                break
+            yield timestamp, record_type, subtype, view[offset + MRT_HEADER.size:end]
+            offset = end
+        pending = buffer[offset:]
+
+
+def read_mrt(input_file: str):
+    """
+    Yields the BGP4MP update and state elements of an MRT dump as ELEM_FIELDS tuples.
+    """
+    with open_dump(input_file) as source:
+        for timestamp, record_type, subtype, body in mrt_records(source):
+            if record_type in (BGP4MP, BGP4MP_ET):
+                yield from bgp4mp_elems(timestamp, record_type, subtype, body)
+
+
+def bgp4mp_elems(timestamp: int, record_type: int, subtype: int, body):
+    offset = 4 if record_type == BGP4MP_ET else 0  # BGP4MP_ET: microseconds
+    asn_bytes = 4 if subtype in AS4_SUBTYPES else 2
+    peer_asn = int.from_bytes(body[offset:offset + asn_bytes], 'big')
+    offset += 2 * asn_bytes + 2  # peer AS, local AS, interface index
+    family = AFI_FAMILIES.get(int.from_bytes(body[offset:offset + 2], 'big'))
+    if family is None:
+        return
+    offset += 2
+    peer_ip = socket.inet_ntop(family, body[offset:offset + ADDRESS_BYTES[family]])
+    offset += 2 * ADDRESS_BYTES[family]  # peer IP, local IP
+
+    if subtype in STATE_SUBTYPES:
+        yield ("S", timestamp, peer_asn, peer_ip, "", "", "", "")
+        return
+    if subtype not in MESSAGE_SUBTYPES or len(body) < offset + BGP_HEADER_BYTES or \
+            body[offset + BGP_HEADER_BYTES - 1] != BGP_UPDATE:
+        return
+    addpath = subtype in ADDPATH_SUBTYPES
+    offset += BGP_HEADER_BYTES
+
+    withdrawn_end = offset + 2 + int.from_bytes(body[offset:offset + 2], 'big')
+    withdrawn = nlri_prefixes(body, offset + 2, withdrawn_end, socket.AF_INET, addpath)
+    attributes_end = withdrawn_end + 2 + int.from_bytes(body[withdrawn_end:withdrawn_end + 2], 'big')
+    attributes = path_attributes(body, withdrawn_end + 2, attributes_end, asn_bytes, addpath)
+    announced = nlri_prefixes(body, attributes_end, len(body), socket.AF_INET, addpath)
+
+    for prefix in withdrawn + attributes["mp_withdrawn"]:
+        yield ("W", timestamp, peer_asn, peer_ip, prefix, "", "", "")
+    if announced or attributes["mp_announced"]:
+        as_path, origin_as = format_as_path(attributes["as_path"], attributes["as4_path"])
+        for prefix in announced:
+            yield ("A", timestamp, peer_asn, peer_ip, prefix, attributes["next_hop"], as_path, origin_as)
+        for prefix in attributes["mp_announced"]:
+            yield ("A", timestamp, peer_asn, peer_ip, prefix, attributes["mp_next_hop"], as_path, origin_as)
+
+
+def nlri_prefixes(data, offset: int, end: int, family: int, addpath: bool = False):
+    """
+    Decodes a run of (length, prefix bytes) NLRI entries into 'address/length' strings.
+    """
+    size = ADDRESS_BYTES[family]
+    prefixes = []
+    while offset < end:
+        if addpath:
+            offset += 4  # path identifier
+        length = data[offset]
+        count = (length + 7) // 8
+        address = bytes(data[offset + 1:offset + 1 + count]).ljust(size, b'\0')
+        prefixes.append(f"{socket.inet_ntop(family, address)}/{length}")
+        offset += 1 + count
+    return prefixes
+
+def path_attributes(data, offset: int, end: int, asn_bytes: int, addpath: bool):
+    """
+    Extracts the attributes the features use from an UPDATE's path attributes.
+    """
+    attributes = {"as_path": [], "as4_path": None, "next_hop": "", "mp_next_hop": "",
+                  "mp_announced": [], "mp_withdrawn": []}
+    while offset + 3 <= end:
+        flags, code = data[offset], data[offset + 1]
+        if flags & ATTR_EXTENDED_LENGTH:
+            length = int.from_bytes(data[offset + 2:offset + 4], 'big')
+            offset += 4
+        else:
+            length = data[offset + 2]
+            offset += 3
+        value = data[offset:offset + length]
+        offset += length
+
+        if code == ATTR_AS_PATH:
+            attributes["as_path"] = as_path_segments(value, asn_bytes)
+        elif code == ATTR_AS4_PATH:
+            attributes["as4_path"] = as_path_segments(value, 4)
+        elif code == ATTR_NEXT_HOP and length == 4:
+            attributes["next_hop"] = socket.inet_ntop(socket.AF_INET, value)
+        elif code == ATTR_MP_REACH_NLRI:
+            family = AFI_FAMILIES.get(int.from_bytes(value[0:2], 'big'))
+            if family is None:
+                continue
+            hop_length = value[3]
+            if hop_length >= ADDRESS_BYTES[family]:
+                # IPv6 may carry a link-local address after the global one
+                attributes["mp_next_hop"] = socket.inet_ntop(family, value[4:4 + ADDRESS_BYTES[family]])
+            attributes["mp_announced"] = nlri_prefixes(value, 5 + hop_length, length, family, addpath)
+        elif code == ATTR_MP_UNREACH_NLRI:
+            family = AFI_FAMILIES.get(int.from_bytes(value[0:2], 'big'))
+            if family is not None:
+                attributes["mp_withdrawn"] = nlri_prefixes(value, 3, length, family, addpath)
+    return attributes
+
+def as_path_segments(data, asn_bytes: int):
+    """
+    Decodes AS_PATH segments into (segment type, [ASNs]) pairs.
+    """
+    code = ">%dH" if asn_bytes == 2 else ">%dI"
+    segments = []
+    offset = 0
+    while offset + 2 <= len(data):
+        segment_type, count = data[offset], data[offset + 1]
+        segments.append((segment_type, list(struct.unpack_from(code % count, data, offset + 2))))
+        offset += 2 + count * asn_bytes
+    return segments
+
+
+def format_as_path(as_path, as4_path=None):
+    """
+    Formats AS path segments like bgpreader and returns (as_path, origin_as).
+
+    Sequences are space-separated ASNs, sets are '{a,b}', confederation sequences
+    '(a b)' and confederation sets '[a,b]'. A 4-byte AS4_PATH replaces the tail of a
+    2-byte AS_PATH as described in RFC 6793.
+    """
+    hops = [_format_segment(segment_type, asns) for segment_type, asns in as_path]
+    if as4_path:
+        hops4 = [_format_segment(segment_type, asns) for segment_type, asns in as4_path]
+        count, count4 = _hop_count(hops), _hop_count(hops4)
+        if count >= count4:
+            hops = _leading_hops(hops, count - count4) + hops4
+    tokens = [token for segment in hops for token in segment[1]]
+    return " ".join(tokens), tokens[-1] if tokens else ""
+
+def _format_segment(segment_type: int, asns):
+    # Returns (segment type, tokens): one token per AS in sequences, one per segment in sets
+    if segment_type == AS_SEQUENCE:
+        return segment_type, [str(asn) for asn in asns]
+    if segment_type == AS_SET:
+        return segment_type, ["{" + ",".join(map(str, asns)) + "}"]
+    if segment_type == AS_CONFED_SEQUENCE:
+        return segment_type, ["(" + " ".join(map(str, asns)) + ")"]
+    return segment_type, ["[" + ",".join(map(str, asns)) + "]"]
+
+def _hop_count(hops):
+    # RFC 6793: sets count as one AS, confederation segments are not counted
+    return sum(len(tokens) for segment_type, tokens in hops if segment_type in (AS_SEQUENCE, AS_SET))
+
+def _leading_hops(hops, count: int):
+    leading = []
+    for segment_type, tokens in hops:
+        if segment_type not in (AS_SEQUENCE, AS_SET):
+            leading.append((segment_type, tokens))
+        elif count > 0:
+            leading.append((segment_type, tokens[:count]))
+            count -= len(tokens[:count])
+    return leading
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import math
+from collections import Counter, deque
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from common import WindowStats, WindowRollup, PATH_CHANGE_FEATURE, tokenize_lines, base_window, record_projection, \
+    selects, STAGES
+from prefix_tracker import PrefixTracker
+from sketches import compact_counters
+import vectorized
+from vectorized import WindowArrays, range_seconds, unique_pairs
+
+# Each worker gets several byte ranges so that ranges finishing at different times
+# do not leave cores idle, and a range is small enough to hold in memory.
+RANGES_PER_WORKER = 4
+MAX_RANGE_BYTES = 64 * 1024 * 1024
+# Ranges per worker submitted ahead of the one being merged
+RANGES_AHEAD = 1
+
+
+class RangeOverlap(Exception):
+    """
+    Raised when a byte range has records in base windows that the ranges before it
+    have already rolled up (see PetlRanges).
+    """
+
+
+def head_offset(input_file: str, head: int, block_bytes: int = 8 * 1024 * 1024):
+    """
+    Returns the byte offset just after the first `head` lines of a file.
+    """
+    offset, lines = 0, 0
+    with open(input_file, 'rb') as source:
+        while True:
+            block = source.read(block_bytes)
+            if not block:
+                return offset
+            count = block.count(b'\n')
+            if lines + count >= head:
+                end = -1
+                for _ in range(head - lines):
+                    end = block.index(b'\n', end + 1)
+                return offset + end + 1
+            offset += len(block)
+            lines += count
+
+def byte_ranges(input_file: str, count: int, size: int = None):
+    """
+    Splits the first `size` bytes of a file (default: all) into at most `count`
+    (begin, end) byte ranges starting at line starts.
+    """
+    if size is None:
+        size = os.path.getsize(input_file)
+    bounds = [0]
+    with open(input_file, 'rb') as source:
+        for i in range(1, count):
+            position = size * i // count
+            if position <= bounds[-1]:
+                continue
+            # Move to the start of the line after the one holding byte position - 1
+            source.seek(position - 1)
+            source.readline()
+            if bounds[-1] < source.tell() < size:
+                bounds.append(source.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class RangeSeconds:
+    """
+    Per-second WindowStats of one byte range, with the feature_5 state at its edges:
+    the first announcement of every prefix (unseen) and the last one (last), and the
+    lines the tokenizer rejected.
+    """
+    __slots__ = ("seconds", "unseen", "last", "rejected")
+
+    def __init__(self):
+        self.seconds = {}
+        self.unseen = []
+        self.last = {}
+        self.rejected = Counter()
+
+
+def _petl_range(input_file: str, floor: int, precision: int, features, byte_range):
+    # Same records as read_records (undecodable bytes replaced, universal newlines),
+    # restricted to one byte range, compared in file order for feature_5 and reduced to
+    # the fields of `features` like PathChanges
+    begin, end = byte_range
+    with open(input_file, 'rb') as source:
+        source.seek(begin)
+        text = source.read(end - begin).decode(errors="replace")
+    part = RangeSeconds()
+    records = tokenize_lines(io.StringIO(text, newline=None), part.rejected)
+    tracked, project = selects(features, PATH_CHANGE_FEATURE), record_projection(features)
+    for epoch, elem_type, prefix, as_path, origin_as, peer in records:
+        if floor is not None and epoch < floor:
+            continue
+        stats = part.seconds.get(epoch)
+        if stats is None:
+            stats = part.seconds[epoch] = WindowStats(precision)
+        if project is None:
+            stats.add(elem_type, prefix, as_path, origin_as, peer)
+        else:
+            stats.add(*project(epoch, elem_type, prefix, as_path, origin_as, peer)[1:])
+
+        if tracked and elem_type == "A" and prefix and as_path and origin_as:
+            previous = part.last.get(prefix)
+            if previous is None:
+                part.unseen.append((epoch, prefix, as_path, origin_as))
+            elif as_path != previous[0] and origin_as == previous[1]:
+                stats.changed_prefixes.add(prefix)
+            part.last[prefix] = (as_path, origin_as)
+    # Keys take less memory than their strings on the way back and while the range waits
+    compact_counters(counter for stats in part.seconds.values() for counter in stats.distinct)
+    return part
+
+def _numpy_range(input_file: str, floor: int, chunk_bytes: int, precision: int, features, byte_range):
+    return range_seconds(input_file, *byte_range, floor=floor, chunk_bytes=chunk_bytes, precision=precision,
+                         features=features)
+
+
+class PetlRanges:
+    """
+    Merges RangeSeconds in file order into windows of every size.
+
+    feature_5 reconciliation: the first announcement of each prefix in a range is
+    compared with the last state left by the ranges before it, then that state is
+    replaced by the range's last announcement, which gives the serial result for any
+    input, as in NumpyRanges.
+
+    The seconds of a range are merged into base windows and the base windows that end
+    before a range starts are rolled up (see WindowRollup) when it arrives, so only
+    the windows of the last ranges are kept. This matches the serial run as long as
+    no range has records in the windows rolled up before it.
+    """
+    def __init__(self, start: int, windows, hop: int = None):
+        self.start = start
+        self.base = base_window(windows, hop)
+        self.rollups = {window: WindowRollup(self.base, window, hop) for window in windows}
+        self.results = {window: [] for window in windows}
+        self.open = {}
+        self.next = 0
+        self.tracker = PrefixTracker()
+
+    def add(self, part: RangeSeconds, begin: int):
+        STAGES.reject(part.rejected)
+        if not part.seconds:
+            return
+        earliest = min(part.seconds)
+        if self.start is not None and (earliest - self.start) // self.base < self.next:
+            raise RangeOverlap(f"the byte range at offset {begin} has records from {datetime.fromtimestamp(earliest)}, "
+                               f"before the windows of the preceding ranges that were rolled up")
+        for epoch, prefix, as_path, origin_as in part.unseen:
+            if self.tracker.observe(prefix, as_path, origin_as):
+                part.seconds[epoch].changed_prefixes.add(prefix)
+        for prefix, (as_path, origin_as) in part.last.items():
+            self.tracker.observe(prefix, as_path, origin_as)
+
+        if self.start is None:
+            self.start = earliest
+        self._roll((earliest - self.start) // self.base)
+        for epoch, stats in part.seconds.items():
+            index = (epoch - self.start) // self.base
+            if index in self.open:
+                self.open[index].merge(stats)
+            else:
+                self.open[index] = stats
+
+    def _roll(self, end: int):
+        # Rolls up the base windows before `end`, which no later record falls in
+        for index in range(self.next, end):
+            stats = self.open.pop(index, None)
+            for window, rollup in self.rollups.items():
+                self.results[window].extend(rollup.add(self.start + index * self.base,
+                                                       WindowStats() if stats is None else stats))
+        self.next = max(self.next, end)
+
+    def window_sets(self):
+        if self.start is None:
+            return self.results
+        self._roll(max(self.open) + 1 if self.open else self.next)
+        for window, rollup in self.rollups.items():
+            self.results[window].extend(rollup.close())
+        return self.results
+
+
+class NumpyRanges:
+    """
+    Merges per-second WindowArrays in file order.
+
+    feature_5 reconciliation: comparing the unseen prefixes of each range with the
+    tracker state of the ranges before it gives the serial result for any input.
+    """
+    def __init__(self, start: int, windows, hop: int = None):
+        self.start = start
+        self.sizes = windows
+        self.hop = hop
+        self.parts = []
+        self.tracker = vectorized.PrefixTracker()
+        self.first = None
+
+    def add(self, part, begin: int):
+        arrays, first = part
+        if first is None:
+            return
+        for positions, keys, paths, origins in arrays.unseen:
+            found, last_paths, last_origins = self.tracker.lookup(keys)
+            changed = found & (paths != last_paths) & (origins == last_origins)
+            if changed.any():
+                arrays.changes.append(unique_pairs(positions[changed], keys[changed]))
+        self.tracker.update(arrays.tracker.keys, arrays.tracker.paths, arrays.tracker.origins)
+
+        # Only the counts are needed from here on
+        arrays.unseen, arrays.tracker = None, None
+        self.parts.append((arrays, first))
+        self.first = first if self.first is None else min(self.first, first)
+
+    def windows(self, start: int, window: int, hop: int = None):
+        step = hop or window
+        total = WindowArrays()
+        for arrays, first in self.parts:
+            total.merge(arrays, (first + np.arange(len(arrays.updates)) - start) // step)
+        if step != window:
+            total = total.hop(window // step, 1)
+        return total.windows(start, step)
+
+    def window_sets(self):
+        start = self.first if self.start is None else self.start
+        return {window: self.windows(start, window, self.hop) if start is not None else [] for window in self.sizes}
+
+
+def bounded_map(pool, function, items, ahead: int):
+    """
+    Like pool.map, but with at most `ahead` items submitted and not yet consumed, so
+    the results waiting to be merged do not pile up in memory.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(function, item))
+        if len(pending) > ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def parallel_windows(input_file: str, head: int = None, windows=(300,), start: int = None,
+                     engine: str = "petl", workers: int = 2, chunk_bytes: int = 8 * 1024 * 1024,
+                     hop: int = None, precision: int = None, features=None):
+    """
+    Computes the same {window: [(window_start, (f0, ..., f13)), ...]} as
+    common.extract_window_sets by aggregating newline-aligned byte ranges per second in
+    a pool of `workers` processes and rolling the merged seconds up into each window
+    size, or sliding them every `hop` seconds. Only the first `head` lines are read.
+
+    Raises RangeOverlap for the petl engine when the file is not ordered enough for
+    the base windows to be rolled up as the ranges arrive.
+    """
+    size = head_offset(input_file, head) if head else os.path.getsize(input_file)
+    ranges = byte_ranges(input_file, max(workers * RANGES_PER_WORKER, math.ceil(size / MAX_RANGE_BYTES)), size)
+    if engine == "numpy":
+        work = partial(_numpy_range, input_file, start, chunk_bytes, precision, features)
+        merged = NumpyRanges(start, windows, hop)
+    else:
+        work, merged = partial(_petl_range, input_file, start, precision, features), PetlRanges(start, windows, hop)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for (begin, end), part in zip(ranges, bounded_map(pool, work, ranges, RANGES_AHEAD * workers)):
+                # The workers read and parse; their time shows as windowing here
+                STAGES.count("read", bytes_read=end - begin)
+                merged.add(part, begin)
+        except RangeOverlap:
+            pool.shutdown(cancel_futures=True)
+            raise
+    return merged.window_sets()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import shutil
+from hashlib import blake2b
+
+import numpy as np
+import typer
+
+from common import base_window, STAGES
+from vectorized import Columns, WindowArrays, read_blocks, parse_block, HashPowers
+
+# Bump when the columns or the way parse_block computes them change
+CACHE_VERSION = 2
+CACHE_COLUMNS = (
+    ("epoch", "<i8"),
+    ("elem_type", "u1"),
+    ("path_length", "<i4"),
+    ("prefix_hash", "<u8"),
+    ("path_hash", "<u8"),
+    ("origin_hash", "<u8"),
+    ("peer_hash", "<u8"),
+    ("announced", "?"),
+)
+CACHE_DIRECTORY = ".parse-cache"
+DEFAULT_CACHE_BYTES = 10 * 1024 ** 3
+SAMPLE_BYTES = 1024 * 1024
+SLICE_ROWS = 1 << 20
+
+
+def cache_root(input_file: str):
+    """
+    The cache lives next to the input: <input dir>/.parse-cache/.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(input_file)), CACHE_DIRECTORY)
+
+def entry_path(input_file: str):
+    path = os.path.abspath(input_file)
+    return os.path.join(cache_root(input_file),
+                        f"{os.path.basename(path)}-{blake2b(path.encode(), digest_size=8).hexdigest()}")
+
+def fingerprint(input_file: str):
+    """
+    Identifies an input version by size, modification time and a hash of its
+    first and last SAMPLE_BYTES (hashing the whole file would cost a full read).
+    """
+    stat = os.stat(input_file)
+    digest = blake2b(str(stat.st_size).encode(), digest_size=16)
+    with open(input_file, 'rb') as source:
+        digest.update(source.read(SAMPLE_BYTES))
+        source.seek(max(stat.st_size - SAMPLE_BYTES, 0))
+        digest.update(source.read(SAMPLE_BYTES))
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sample": digest.hexdigest()}
+
+
+def load_cache(input_file: str):
+    """
+    Returns {column: read-only memmap} for a valid cache entry of the input, or None.
+    Stale entries (other schema version or input fingerprint) are removed.
+    """
+    entry = entry_path(input_file)
+    try:
+        with open(os.path.join(entry, "manifest.json")) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != CACHE_VERSION or manifest.get("input") != fingerprint(input_file):
+        typer.echo(f"Parse cache is stale, removing: {entry}")
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    # Marks the entry as recently used for eviction
+    os.utime(os.path.join(entry, "manifest.json"))
+    rows = manifest["rows"]
+    return {name: np.memmap(os.path.join(entry, f"{name}.bin"), dtype=dtype, mode='r', shape=(rows,))
+            if rows else np.zeros(0, dtype=dtype)
+            for name, dtype in CACHE_COLUMNS}
+
+def build_cache(input_file: str, chunk_bytes: int = 8 * 1024 * 1024, decompress: str = "auto"):
+    """
+    Parses the whole input once with parse_block and writes one raw array file per column.
+    """
+    entry = entry_path(input_file)
+    building = f"{entry}.{os.getpid()}.tmp"
+    os.makedirs(building, exist_ok=True)
+    rows = 0
+    powers = HashPowers()
+    files = {name: open(os.path.join(building, f"{name}.bin"), 'wb') for name, _ in CACHE_COLUMNS}
+    try:
+        for block in STAGES.timed("read", read_blocks(input_file, chunk_bytes, decompress=decompress),
+                                  rows=lambda block: block.count(b'\n'), size=len):
+            with STAGES.stage("parse"):
+                columns = parse_block(block, powers)
+            for name, dtype in CACHE_COLUMNS:
+                np.asarray(getattr(columns, name), dtype=dtype).tofile(files[name])
+            rows += len(columns.epoch)
+    finally:
+        for column_file in files.values():
+            column_file.close()
+
+    with open(os.path.join(building, "manifest.json"), 'w') as manifest_file:
+        json.dump({"version": CACHE_VERSION, "input": fingerprint(input_file), "rows": rows,
+                   "built": time.time()}, manifest_file)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(building, entry)
+
+def evict(root: str, max_bytes: int, keep: str = None):
+    """
+    Removes the least recently used entries until the cache holds at most `max_bytes`.
+    """
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        manifest = os.path.join(path, "manifest.json")
+        if not os.path.isfile(manifest):
+            continue
+        size = sum(os.path.getsize(os.path.join(path, file)) for file in os.listdir(path))
+        entries.append((os.path.getmtime(manifest), size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            typer.echo(f"Evicting parse cache entry: {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def cached_windows(input_file: str, head: int = None, windows=(300,), start: int = None,
+                   chunk_bytes: int = 8 * 1024 * 1024,
+                   max_bytes: int = DEFAULT_CACHE_BYTES, decompress: str = "auto", hop: int = None,
+                   precision: int = None, features=None):
+    """
+    Computes {window: [(window_start, (f0, ..., f13)), ...]} from the parse cache of the
+    input, building the cache first when it is missing or stale.
+
+    Rows are replayed in file order, which is the order of feature_5 for both engines
+    (see common.PathChanges); the counts do not depend on row order.
+    """
+    columns = load_cache(input_file)
+    if columns is None:
+        typer.echo(f"Building parse cache: {entry_path(input_file)}")
+        build_cache(input_file, chunk_bytes, decompress)
+        evict(cache_root(input_file), max_bytes, keep=entry_path(input_file))
+        columns = load_cache(input_file)
+    else:
+        typer.echo(f"Loading parse cache: {entry_path(input_file)}")
+
+    rows = len(columns["epoch"]) if not head else min(head, len(columns["epoch"]))
+    epoch = columns["epoch"][:rows]
+    valid = epoch >= 0
+    if start is None:
+        if not valid.any():
+            return {window: [] for window in windows}
+        start = int(epoch[valid].min())
+
+    base = base_window(windows, hop)
+    aggregates = WindowArrays(precision=precision, features=features)
+    for begin in range(0, rows, SLICE_ROWS):
+        rows_slice = slice(begin, min(begin + SLICE_ROWS, rows))
+        block = Columns()
+        for name, _ in CACHE_COLUMNS:
+            setattr(block, name, np.asarray(columns[name][rows_slice]))
+        index = np.where(block.epoch >= 0, (block.epoch - start) // base, -1)
+        index[index < 0] = -1
+        block.announced = block.announced & (index >= 0)
+        aggregates.add(index, block)
+    return aggregates.window_sets(start, base, windows, hop)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+from datetime import datetime
+import numpy as np
+import typer
+from common import FEATURES, parse_windows, parse_start_time, instrumented, STAGES
+from compression import DECOMPRESSORS
+from feature_all import window_dir
+from mrt import is_mrt
+from vectorized import peer_windows
+
+app = typer.Typer()
+
+# f0 .. f8 split by peer (see vectorized.PeerArrays)
+PEER_FEATURES = tuple(f"{prefix}_{name}" for prefix, name in FEATURES[:9])
+PEER_HEADER = ("timestamp", "peer_asn", "peer_ip") + PEER_FEATURES
+FORMATS = ("long", "csr")
+# Columns written as integers in the long format; the others are means and medians
+INTEGER_FEATURES = (0, 1, 2, 5, 6, 7, 8)
+
+
+@app.command()
+def extract_peer_features(
+    input: str = typer.Option(..., "--input", help="Input CSV file (may be .gz, .bz2, .xz or .zst)"),
+    head: int = typer.Option(None, "--head", help="Number of rows to process"),
+    output_dir: str = typer.Option(..., "--output-dir", help="Directory for the output files"),
+    collector: str = typer.Option(..., "--collector", help="Collector name used in output file names (e.g., 'rrc00')"),
+    window: str = typer.Option("300", "--window", help="Time window size in seconds, or a comma-separated list (e.g., '6,60,300')"),
+    window_dirs: bool = typer.Option(False, "--window-dirs", help="Write each window size into <output-dir>/wNNs (implied by a list)"),
+    start_time: str = typer.Option(None, "--start-time", help="Starting timestamp for time windows (e.g., '2024-12-12 00:00:00')"),
+    chunk_bytes: int = typer.Option(8 * 1024 * 1024, "--chunk-bytes", help="Input block size"),
+    decompress: str = typer.Option("auto", "--decompress", help="For .gz/.bz2/.xz/.zst inputs: process (decompressor command), thread (Python module) or auto"),
+    report: str = typer.Option(None, "--report", help="Write rows, bytes, time and peak memory per stage as JSON to this file"),
+    format: str = typer.Option("long", "--format", help="long: CSV row per window and peer with traffic; csr: NumPy CSR arrays (.npz)")
+):
+    """
+    Extract f0 .. f8 per peer (peer ASN and IP) in a single pass with the numpy engine.
+
+    Only windows in which a peer sent updates are stored and written, so the output
+    grows with the traffic rather than with windows x peers. Writes
+    per_peer_features_<collector>.csv (long) or .npz (csr).
+    """
+    if format not in FORMATS:
+        raise typer.BadParameter(f"format must be one of {', '.join(FORMATS)}", param_hint="--format")
+    if decompress not in DECOMPRESSORS:
+        raise typer.BadParameter(f"decompress must be one of {', '.join(DECOMPRESSORS)}", param_hint="--decompress")
+    if input != '-' and is_mrt(input):
+        raise typer.BadParameter("MRT dumps are decoded record by record; convert them with bgpreader first",
+                                 param_hint="--input")
+
+    windows = parse_windows(window)
+    with instrumented(report):
+        typer.echo(f"Reading input file: {input}")
+        with STAGES.stage("window"):
+            start, peers, cells = peer_windows(input, head, windows, parse_start_time(start_time), chunk_bytes,
+                                               decompress)
+        typer.echo(f"Found {len(peers)} peers")
+        for size, (window_indexes, peer_ids, values) in cells.items():
+            STAGES.count("window", rows=len(window_indexes))
+            directory = window_dir(output_dir, size) if window_dirs or len(windows) > 1 else output_dir
+            os.makedirs(directory, exist_ok=True)
+            output = os.path.join(directory, f"per_peer_features_{collector}.{'csv' if format == 'long' else 'npz'}")
+            typer.echo(f"Writing {len(window_indexes)} window and peer cells to {output}")
+            with STAGES.stage("write"):
+                if format == "long":
+                    write_long(output, start, size, peers, window_indexes, peer_ids, values)
+                else:
+                    write_csr(output, start, size, peers, window_indexes, peer_ids, values)
+    typer.echo("Per-peer feature extraction complete!")
+
+
+def write_long(output: str, start: int, window: int, peers, window_indexes, peer_ids, values):
+    """
+    Writes one (timestamp, peer_asn, peer_ip, f0 .. f8) row per cell, in window order.
+    """
+    names = [(peer.split('|', 1) + [''])[:2] for peer in peers]
+    columns = [values[:, column].astype(np.int64).tolist() if column in INTEGER_FEATURES else values[:, column].tolist()
+               for column in range(len(PEER_FEATURES))]
+    with open(output, 'w', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(PEER_HEADER)
+        timestamp, last = None, None
+        for index, peer, *row in zip(window_indexes.tolist(), peer_ids.tolist(), *columns):
+            if index != last:
+                timestamp, last = datetime.fromtimestamp(start + index * window), index
+            writer.writerow([timestamp, *names[peer], *row])
+
+def write_csr(output: str, start: int, window: int, peers, window_indexes, peer_ids, values):
+    """
+    Writes a windows x peers CSR matrix per feature sharing one structure: row i is the
+    window starting at window_start[i] (epoch seconds), indptr[i]:indptr[i + 1] indexes
+    its peers (columns, named in `peers`) and their data[:, feature] values, e.g.
+    scipy.sparse.csr_matrix((data[:, 0], indices, indptr)) for f0.
+    """
+    count = int(window_indexes[-1]) + 1 if len(window_indexes) else 0
+    np.savez_compressed(output, window_start=(start or 0) + window * np.arange(count, dtype=np.int64),
+                        peers=np.array(peers, dtype=str), features=np.array(PEER_FEATURES),
+                        indptr=np.searchsorted(window_indexes, np.arange(count + 1)).astype(np.int64),
+                        indices=peer_ids.astype(np.int32), data=values.astype(np.float32))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import socket
+from array import array
+from hashlib import blake2b
+
+# Slot layout, one entry per array:
+#   high, low : network address as two 64-bit words (IPv4 uses `high` only)
+#   codes     : 0 = empty, 1 + length for IPv4, 64 + length for IPv6,
+#               UNPARSED for prefixes that are not valid IP networks (hashed into `high`)
+#   paths     : 64-bit hash of the last announced AS path
+#   origins   : 64-bit hash of the last announced origin AS
+# That is 33 bytes per slot. The table doubles when the load factor would pass
+# MAX_LOAD, so the tracker needs between 33 / 0.7 = 47 bytes per prefix (just
+# before a resize) and 94 bytes (just after one), against about 160 for the dict
+# of string tuples it replaces (see bench_prefix_tracker.py).
+SLOT_BYTES = 33
+MAX_LOAD = 0.7
+UNPARSED = 255
+MASK64 = (1 << 64) - 1
+
+
+def stable_hash(text: str):
+    """
+    64-bit hash of a string that is the same in every process and run.
+    """
+    return int.from_bytes(blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def prefix_key(prefix: str):
+    """
+    Packs an 'address/length' prefix into (high, low, code) integers. Prefixes that
+    are not valid IP networks, including those with a length outside 0-32 (IPv4) or
+    0-128 (IPv6), get an UNPARSED code with their string hash.
+    """
+    address, _, length = prefix.partition('/')
+    try:
+        if ':' in address:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big")
+            if 0 <= int(length) <= 128:
+                return value >> 64, value & MASK64, 64 + int(length)
+        else:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+            if 0 <= int(length) <= 32:
+                return value, 0, 1 + int(length)
+    except (OSError, ValueError):
+        pass
+    return stable_hash(prefix), 0, UNPARSED
+
+
+class PrefixTracker:
+    """
+    feature_5 state: the last (AS path, origin AS) announced for each prefix.
+
+    Prefixes are stored as integer network/length keys and AS paths and origins
+    as 64-bit hashes, in parallel arrays with open addressing and linear probing,
+    instead of a dict of string tuples.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self._allocate(max(capacity, 8))
+
+    def _allocate(self, capacity: int):
+        capacity = 1 << (capacity - 1).bit_length()
+        self.mask = capacity - 1
+        self.high = array('Q', bytes(8 * capacity))
+        self.low = array('Q', bytes(8 * capacity))
+        self.codes = array('B', bytes(capacity))
+        self.paths = array('Q', bytes(8 * capacity))
+        self.origins = array('Q', bytes(8 * capacity))
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return SLOT_BYTES * (self.mask + 1)
+
+    def _slot(self, high: int, low: int, code: int):
+        # Returns the slot holding the key, or the empty slot where it belongs
+        mask, codes, highs, lows = self.mask, self.codes, self.high, self.low
+        slot = (((high ^ (low * 0x9E3779B97F4A7C15) ^ code) * 0xBF58476D1CE4E5B9) & MASK64) >> 20 & mask
+        while True:
+            stored = codes[slot]
+            if not stored or (stored == code and highs[slot] == high and lows[slot] == low):
+                return slot
+            slot = (slot + 1) & mask
+
+    def observe(self, prefix: str, as_path: str, origin_as: str):
+        """
+        Records an announcement and returns True when it changes the prefix's
+        AS path while keeping the same origin AS.
+        """
+        high, low, code = prefix_key(prefix)
+        path, origin = stable_hash(as_path), stable_hash(origin_as)
+        slot = self._slot(high, low, code)
+        if self.codes[slot]:
+            changed = path != self.paths[slot] and origin == self.origins[slot]
+        else:
+            changed = False
+            if self.size + 1 > MAX_LOAD * (self.mask + 1):
+                self._grow()
+                slot = self._slot(high, low, code)
+            self.codes[slot], self.high[slot], self.low[slot] = code, high, low
+            self.size += 1
+        self.paths[slot], self.origins[slot] = path, origin
+        return changed
+
+    def _grow(self):
+        old = (self.high, self.low, self.codes, self.paths, self.origins)
+        self._allocate(2 * (self.mask + 1))
+        for high, low, code, path, origin in zip(*old):
+            if code:
+                slot = self._slot(high, low, code)
+                self.codes[slot], self.high[slot], self.low[slot] = code, high, low
+                self.paths[slot], self.origins[slot] = path, origin
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+from array import array
+from functools import lru_cache
+
+from prefix_tracker import prefix_key, UNPARSED, MASK64
+
+# Node layout, one entry per array:
+#   high, low   : network address left-aligned in KEY_BITS bits, as two 64-bit words
+#   lengths     : prefix length
+#   left, right : child node indexes (NO_NODE when missing)
+#   values      : value of the prefix, NO_VALUE for the forks that only split paths
+# That is 33 bytes per node and at most two nodes per prefix. IPv4 and IPv6 prefixes
+# hang from separate roots (nodes 0 and 1).
+KEY_BITS = 128
+NODE_BYTES = 33
+NO_NODE = -1
+NO_VALUE = -1
+IPV4, IPV6 = 0, 1
+
+
+@lru_cache(maxsize=1 << 16)
+def parse_prefix(prefix: str):
+    """
+    Returns the (root, key, length) of an 'address/length' prefix, with the host bits
+    of the key cleared, or None when it is not a valid IP network.
+    """
+    high, low, code = prefix_key(prefix)
+    if code == UNPARSED:
+        return None
+    if code < 64:
+        root, length, key = IPV4, code - 1, high << (KEY_BITS - 32)
+    else:
+        root, length, key = IPV6, code - 64, (high << 64) | low
+    return root, key >> (KEY_BITS - length) << (KEY_BITS - length), length
+
+
+class PrefixTrie:
+    """
+    Path-compressed binary radix trie mapping IPv4 and IPv6 prefixes to integers.
+
+    Nodes are kept in parallel arrays instead of objects, and only prefixes and the
+    forks between them get a node, so a lookup visits at most one node per stored
+    prefix on the way to it. There is no removal: values can only be replaced.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.high = array('Q')
+        self.low = array('Q')
+        self.lengths = array('B')
+        self.left = array('i')
+        self.right = array('i')
+        self.values = array('q')
+        for _ in (IPV4, IPV6):
+            self._new(0, 0, NO_VALUE)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return NODE_BYTES * len(self.lengths)
+
+    def _new(self, key: int, length: int, value: int):
+        self.high.append(key >> 64)
+        self.low.append(key & MASK64)
+        self.lengths.append(length)
+        self.left.append(NO_NODE)
+        self.right.append(NO_NODE)
+        self.values.append(value)
+        return len(self.lengths) - 1
+
+    def add(self, prefix: str, value: int):
+        """
+        Sets the value of a prefix. Returns False for a prefix that is not a valid IP network.
+        """
+        parsed = parse_prefix(prefix)
+        if parsed is None:
+            return False
+        node, key, length = parsed
+        highs, lows, lengths, lefts, rights, values = self.high, self.low, self.lengths, self.left, self.right, self.values
+        while True:
+            # The prefix of `node` is a prefix of the key
+            node_length = lengths[node]
+            if node_length == length:
+                if values[node] == NO_VALUE:
+                    self.size += 1
+                values[node] = value
+                return True
+            children = rights if key >> (KEY_BITS - 1 - node_length) & 1 else lefts
+            child = children[node]
+            if child == NO_NODE:
+                children[node] = self._new(key, length, value)
+                self.size += 1
+                return True
+            child_key, child_length = (highs[child] << 64) | lows[child], lengths[child]
+            common = min(KEY_BITS - (key ^ child_key).bit_length(), length, child_length)
+            if common == child_length:
+                node = child
+                continue
+            if common == length:
+                # The new prefix covers the child
+                new = self._new(key, length, value)
+                (rights if child_key >> (KEY_BITS - 1 - length) & 1 else lefts)[new] = child
+            else:
+                # The paths split below the common bits: a fork takes the child's place
+                new = self._new(key >> (KEY_BITS - common) << (KEY_BITS - common), common, NO_VALUE)
+                leaf = self._new(key, length, value)
+                if key >> (KEY_BITS - 1 - common) & 1:
+                    rights[new], lefts[new] = leaf, child
+                else:
+                    lefts[new], rights[new] = leaf, child
+            children[node] = new
+            self.size += 1
+            return True
+
+    def lookup(self, prefix: str):
+        """
+        Returns (value of the prefix, value of the longest prefix strictly covering it),
+        NO_VALUE for either when there is none.
+        """
+        parsed = parse_prefix(prefix)
+        if parsed is None:
+            return NO_VALUE, NO_VALUE
+        node, key, length = parsed
+        highs, lows, lengths, lefts, rights, values = self.high, self.low, self.lengths, self.left, self.right, self.values
+        cover = NO_VALUE
+        while node != NO_NODE:
+            node_length = lengths[node]
+            if node_length > length or (key ^ ((highs[node] << 64) | lows[node])) >> (KEY_BITS - node_length):
+                break
+            if node_length == length:
+                return values[node], cover
+            if values[node] != NO_VALUE:
+                cover = values[node]
+            node = rights[node] if key >> (KEY_BITS - 1 - node_length) & 1 else lefts[node]
+        return NO_VALUE, cover
+
+    def longest_match(self, prefix: str):
+        """
+        Value of the longest stored prefix equal to or covering `prefix`, or NO_VALUE.
+        """
+        exact, cover = self.lookup(prefix)
+        return cover if exact == NO_VALUE else exact
+
+    def overlaps(self, prefix: str):
+        """
+        True when a stored prefix covers `prefix`, equals it or lies inside it.
+        """
+        parsed = parse_prefix(prefix)
+        if parsed is None:
+            return False
+        node, key, length = parsed
+        highs, lows, lengths, lefts, rights, values = self.high, self.low, self.lengths, self.left, self.right, self.values
+        while node != NO_NODE:
+            node_length = lengths[node]
+            node_key = (highs[node] << 64) | lows[node]
+            if node_length >= length:
+                if node in (IPV4, IPV6):
+                    return values[node] != NO_VALUE or lefts[node] != NO_NODE or rights[node] != NO_NODE
+                # Every node below the prefix leads to a stored one: forks have two children
+                return not (key ^ node_key) >> (KEY_BITS - length)
+            if (key ^ node_key) >> (KEY_BITS - node_length):
+                return False
+            if values[node] != NO_VALUE:
+                return True
+            node = rights[node] if key >> (KEY_BITS - 1 - node_length) & 1 else lefts[node]
+        return False
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import heapq
+
+
+class ReorderError(Exception):
+    """
+    Raised when a record arrives later than the reorder tolerance allows.
+    """
+
+
+def reorder(records, tolerance: int, on_late=None):
+    """
+    Yields (epoch, ...) records in timestamp order without sorting the whole input.
+
+    bgpreader output is almost time-ordered, so records are held in a heap only
+    until the newest timestamp seen is `tolerance` seconds past them. Memory is
+    bounded by the traffic within the tolerance, not by the input size. Records
+    with equal timestamps keep their input order, so the output matches a stable
+    sort. A record older than one already released raises ReorderError, unless
+    `on_late` is given, in which case it is called with the record and the record
+    is skipped.
+    """
+    heap = []
+    sequence = 0
+    newest = None
+    released = None
+    for record in records:
+        epoch = record[0]
+        if released is not None and epoch < released:
+            if on_late is not None:
+                on_late(record)
+                continue
+            raise ReorderError(
+                f"Record at {epoch} arrived after {released} was released "
+                f"(disorder exceeds the {tolerance}s reorder tolerance)"
+            )
+        heapq.heappush(heap, (epoch, sequence, record))
+        sequence += 1
+        if newest is None or epoch > newest:
+            newest = epoch
+        watermark = newest - tolerance
+        while heap and heap[0][0] <= watermark:
+            released, _, ready = heapq.heappop(heap)
+            yield ready
+
+    while heap:
+        _, _, ready = heapq.heappop(heap)
+        yield ready
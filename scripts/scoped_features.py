@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import os
+from functools import lru_cache
+from datetime import datetime
+import typer
+import petl as etl
+from common import read_records, parse_windows, parse_start_time, base_window, write_output, instrumented, \
+    TimedTable, STAGES
+from feature_all import window_dir
+from prefix_trie import PrefixTrie, NO_VALUE
+from reorder import reorder, ReorderError
+
+app = typer.Typer()
+
+# (column prefix, feature_name) of the features counted inside the scope
+SCOPED_FEATURES = (
+    ("s0", "update_count"),
+    ("s1", "announcement_count"),
+    ("s2", "withdrawal_count"),
+    ("s3", "more_specific_count"),
+    ("s4", "origin_change_count"),
+    ("s5", "new_subprefix_count"),
+)
+SCOPED_HEADER = ("timestamp",) + tuple(f"{prefix}_{name}" for prefix, name in SCOPED_FEATURES)
+
+
+class Scope:
+    """
+    Address blocks and origin ASes that scoped features look at.
+
+    An update is in scope when its prefix overlaps a block (inside it or covering it),
+    when it is announced by one of the origin ASes, or when its prefix is inside or
+    equal to one already in scope (e.g., another AS announcing a more specific of a
+    scoped AS's prefix). Block matches are cached per prefix string.
+    """
+    def __init__(self, blocks=(), origins=()):
+        self.blocks = PrefixTrie()
+        for index, block in enumerate(blocks):
+            if not self.blocks.add(block, index):
+                raise ValueError(f"{block} is not an IP prefix")
+        self.origins = frozenset(origins)
+        self.overlaps_block = lru_cache(maxsize=1 << 16)(self.blocks.overlaps) if len(self.blocks) else None
+
+
+class ScopedState:
+    """
+    Last origin AS announced for every in-scope prefix, in a PrefixTrie (origins are
+    numbered in order of appearance), and the counts of the current window.
+    """
+    __slots__ = ("routes", "origins", "counts")
+
+    def __init__(self):
+        self.routes = PrefixTrie()
+        self.origins = {}
+        self.counts = [0] * len(SCOPED_FEATURES)
+
+    def add(self, scope: Scope, elem_type: str, prefix: str, origin_as: str):
+        """
+        Counts one update row if it is in scope.
+        """
+        if not (scope.overlaps_block and scope.overlaps_block(prefix)) and origin_as not in scope.origins:
+            if not scope.origins or not prefix:
+                return
+            route, cover = self.routes.lookup(prefix)
+            if route == NO_VALUE and cover == NO_VALUE:
+                return
+        counts = self.counts
+        counts[0] += 1
+        if elem_type == "W":
+            counts[2] += 1
+        elif elem_type == "A":
+            counts[1] += 1
+            if prefix and origin_as:
+                self._announce(prefix, self.origins.setdefault(origin_as, len(self.origins)))
+
+    def _announce(self, prefix: str, origin: int):
+        counts = self.counts
+        route, cover = self.routes.lookup(prefix)
+        if cover != NO_VALUE:
+            counts[3] += 1
+        if route != NO_VALUE:
+            if route != origin:
+                counts[4] += 1
+        elif cover != NO_VALUE:
+            # A new sub-prefix counts as an origin change when its covering prefix has another origin
+            counts[5] += 1
+            if cover != origin:
+                counts[4] += 1
+        if route != origin:
+            self.routes.add(prefix, origin)
+
+
+def scoped_windows(records, scope: Scope, window: int, start: int = None):
+    """
+    Yields (window_start, (s0, ..., s5)) for consecutive windows of `window` seconds over
+    time-sorted records, windows without traffic in scope included:
+
+    - s0, s1, s2: updates, announcements and withdrawals in scope
+    - s3: announcements of a prefix more specific than an in-scope prefix announced before
+    - s4: announcements whose origin AS differs from the last one of the prefix, or for
+      a new prefix, from the last one of the prefix covering it
+    - s5: announcements of a prefix not seen before inside one seen before
+    """
+    state = ScopedState()
+    current = 0
+    for epoch, elem_type, prefix, _, origin_as, _ in records:
+        if start is None:
+            start = epoch
+        index = (epoch - start) // window
+        if index < 0:
+            continue
+        while index > current:
+            yield start + current * window, tuple(state.counts)
+            state.counts = [0] * len(SCOPED_FEATURES)
+            current += 1
+        state.add(scope, elem_type, prefix, origin_as)
+    if start is not None and any(state.counts):
+        yield start + current * window, tuple(state.counts)
+
+def rollup_counts(windows, factor: int):
+    """
+    Sums consecutive (window_start, counts) windows `factor` at a time.
+    """
+    return [(windows[i][0], tuple(map(sum, zip(*(counts for _, counts in windows[i:i + factor])))))
+            for i in range(0, len(windows), factor)]
+
+
+@app.command()
+def extract_scoped_features(
+    input: str = typer.Option(..., "--input", help="Input CSV file (may be .gz, .bz2, .xz or .zst)"),
+    head: int = typer.Option(None, "--head", help="Number of rows to process"),
+    output_dir: str = typer.Option(..., "--output-dir", help="Directory for the output CSV file"),
+    collector: str = typer.Option(..., "--collector", help="Collector name used in output file names (e.g., 'rrc00')"),
+    blocks: str = typer.Option("", "--blocks", help="Comma-separated address blocks in scope (e.g., '200.0.0.0/8,2800::/12')"),
+    origins: str = typer.Option("", "--origins", help="Comma-separated origin ASes in scope (e.g., '7418,27651')"),
+    window: str = typer.Option("300", "--window", help="Time window size in seconds, or a comma-separated list (e.g., '6,60,300')"),
+    window_dirs: bool = typer.Option(False, "--window-dirs", help="Write each window size into <output-dir>/wNNs (implied by a list)"),
+    start_time: str = typer.Option(None, "--start-time", help="Starting timestamp for time windows (e.g., '2024-12-12 00:00:00')"),
+    stream: bool = typer.Option(False, "--stream", help="Order rows with a bounded reorder buffer instead of a full sort"),
+    reorder_tolerance: int = typer.Option(60, "--reorder-tolerance", help="Maximum out-of-order delay in seconds accepted by --stream"),
+    sort_buffer: int = typer.Option(100000, "--sort-buffer", help="Rows kept in memory by the external sort"),
+    report: str = typer.Option(None, "--report", help="Write rows, bytes, time and peak memory per stage as JSON to this file"),
+    decompress: str = typer.Option("auto", "--decompress", help="For .gz/.bz2/.xz/.zst inputs: process (decompressor command), thread (Python module) or auto")
+):
+    """
+    Extract features scoped to address blocks and/or origin ASes in a single pass.
+
+    Writes scoped_features_<collector>.csv with update, announcement and withdrawal
+    counts in scope, more-specific announcements, origin changes and new sub-prefixes.
+    """
+    block_list = [block.strip() for block in blocks.split(",") if block.strip()]
+    origin_list = [origin.strip() for origin in origins.split(",") if origin.strip()]
+    if not block_list and not origin_list:
+        raise typer.BadParameter("give the address blocks and/or origin ASes in scope", param_hint="--blocks")
+    try:
+        scope = Scope(block_list, origin_list)
+    except ValueError as error:
+        raise typer.BadParameter(str(error), param_hint="--blocks")
+    windows = parse_windows(window)
+    base = base_window(windows)
+    start = parse_start_time(start_time)
+
+    with instrumented(report):
+        typer.echo(f"Reading input file: {input}")
+        data = read_records(input, head, decompress)
+        result = None
+        if stream:
+            typer.echo(f"Streaming rows with a {reorder_tolerance}s reorder tolerance...")
+            try:
+                with STAGES.stage("window"):
+                    result = list(scoped_windows(STAGES.timed("sort", reorder(etl.data(data), reorder_tolerance)),
+                                                 scope, base, start))
+            except ReorderError as error:
+                if input == '-':
+                    raise typer.BadParameter(f"{error}; stdin cannot be re-read, use a larger tolerance",
+                                             param_hint="--reorder-tolerance")
+                typer.echo(f"{error}; falling back to an external sort.")
+        if result is None:
+            typer.echo("Sorting data by parsed timestamp...")
+            data = TimedTable(etl.sort(data, "epoch", buffersize=sort_buffer), "sort")
+            with STAGES.stage("window"):
+                result = list(scoped_windows(etl.data(data), scope, base, start))
+
+        for size in windows:
+            rows = rollup_counts(result, size // base)
+            STAGES.count("window", rows=len(rows))
+            directory = window_dir(output_dir, size) if window_dirs or len(windows) > 1 else output_dir
+            os.makedirs(directory, exist_ok=True)
+            output = os.path.join(directory, f"scoped_features_{collector}.csv")
+            typer.echo(f"Writing results to output file: {output}")
+            write_output(output, etl.wrap([SCOPED_HEADER] + [(datetime.fromtimestamp(window_start),) + counts
+                                                             for window_start, counts in rows]))
+    typer.echo("Scoped feature extraction complete!")
+
+
+if __name__ == "__main__":
+    app()
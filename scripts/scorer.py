@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import sys
+import csv
+import json
+import time
+import queue
+import threading
+import numpy as np
+import joblib
+import typer
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import OneClassSVM
+from common import CONSOLIDATED_HEADER
+
+app = typer.Typer()
+
+# f0 .. f5, the features the detection notebooks train on
+MODEL_FEATURES = CONSOLIDATED_HEADER[1:7]
+MODELS = ("isolation-forest", "one-class-svm")
+FORMATS = ("csv", "jsonl")
+MODEL_VERSION = 1
+OUTPUT_HEADER = ("timestamp", "decision_score", "anomaly", "batch_size", "latency_ms")
+
+
+def read_feature_rows(path: str):
+    """
+    Returns (timestamps, float64 matrix of MODEL_FEATURES) from a consolidated CSV.
+    """
+    with open(path, newline='') as source:
+        reader = csv.reader(source)
+        header = next(reader)
+        try:
+            columns = [header.index(name) for name in MODEL_FEATURES]
+        except ValueError:
+            raise typer.BadParameter(f"{path} lacks some of the columns {', '.join(MODEL_FEATURES)}", param_hint="--input")
+        timestamps, values = [], []
+        for row in reader:
+            timestamps.append(row[0])
+            values.append([float(row[column]) for column in columns])
+    return timestamps, np.array(values, dtype=np.float64).reshape(-1, len(MODEL_FEATURES))
+
+def make_model(kind: str, contamination: float = 0.1, nu: float = 0.1, seed: int = 42):
+    """
+    The detectors of the ml-detection notebooks, with their settings.
+    """
+    if kind == "isolation-forest":
+        return IsolationForest(contamination=contamination, random_state=seed)
+    if kind == "one-class-svm":
+        return OneClassSVM(nu=nu, kernel='rbf', gamma='scale', tol=0.001)
+    raise typer.BadParameter(f"model must be one of {', '.join(MODELS)}", param_hint="--model")
+
+def load_model(path: str):
+    """
+    Loads a model saved by `scorer.py train`: {"model", "scaler", "features", ...}.
+    """
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict) or bundle.get("version") != MODEL_VERSION:
+        raise typer.BadParameter(f"{path} was not written by this version of scorer.py train", param_hint="--model")
+    return bundle
+
+
+class WindowScorer:
+    """
+    Scores window rows with a persisted scaler and model, several rows per call.
+    """
+    def __init__(self, bundle, threshold: float = 0.0):
+        self.scaler = bundle["scaler"]
+        self.model = bundle["model"]
+        self.threshold = threshold
+        # The first call of a fitted estimator pays for lazy setup; keep it off the first window
+        self.score(np.zeros((1, len(MODEL_FEATURES))))
+
+    def score(self, values):
+        """
+        Returns (decision scores, anomaly flags); lower scores are more abnormal.
+        """
+        scores = self.model.decision_function(self.scaler.transform(values))
+        return scores, scores < self.threshold
+
+
+def parse_window(line: str, header):
+    """
+    Returns (timestamp, [f0 .. f5]) for a CSV or JSON line of feature_live.py, or None
+    for a header line. `header` holds the CSV column names seen so far.
+    """
+    if line.startswith("{"):
+        row = json.loads(line)
+        return row["timestamp"], [float(row[name]) for name in MODEL_FEATURES]
+    fields = next(csv.reader([line]))
+    if fields[0] == "timestamp":
+        header[:] = fields
+        return None
+    row = dict(zip(header, fields))
+    return row["timestamp"], [float(row[name]) for name in MODEL_FEATURES]
+
+def read_windows(lines, windows: queue.Queue):
+    """
+    Puts (arrival time, timestamp, values) for every window line on `windows`, then None.
+    A line that cannot be parsed is put as the error, for the scoring thread to raise.
+    """
+    header = list(CONSOLIDATED_HEADER)
+    try:
+        for line in lines:
+            line = line.strip()
+            if line:
+                window = parse_window(line, header)
+                if window is not None:
+                    windows.put((time.perf_counter(),) + window)
+    except (KeyError, ValueError) as error:
+        windows.put(typer.BadParameter(f"cannot read window row ({error!r}): {line}", param_hint="--input"))
+    finally:
+        windows.put(None)
+
+def micro_batches(windows: queue.Queue, batch_size: int, max_delay: float):
+    """
+    Yields lists of windows: a batch is closed when it holds `batch_size` windows or
+    when its first window has waited `max_delay` seconds, whichever comes first.
+    """
+    ended, error = False, None
+    while not ended:
+        first = windows.get()
+        if first is None:
+            return
+        if isinstance(first, Exception):
+            raise first
+        batch = [first]
+        deadline = first[0] + max_delay
+        while len(batch) < batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                window = windows.get(timeout=remaining) if remaining > 0 else windows.get_nowait()
+            except queue.Empty:
+                break
+            if window is None or isinstance(window, Exception):
+                ended, error = True, window
+                break
+            batch.append(window)
+        yield batch
+    if error is not None:
+        raise error
+
+
+@app.command()
+def train(
+    input: str = typer.Option(..., "--input", help="Comma-separated consolidated feature CSV files to train on"),
+    output: str = typer.Option(..., "--output", help="File for the model and scaler (joblib)"),
+    model: str = typer.Option("isolation-forest", "--model", help="Detector: isolation-forest or one-class-svm"),
+    contamination: float = typer.Option(0.1, "--contamination", help="IsolationForest share of anomalies"),
+    nu: float = typer.Option(0.1, "--nu", help="OneClassSVM bound on the share of outliers"),
+    seed: int = typer.Option(42, "--seed", help="Random state of the IsolationForest")
+):
+    """
+    Fit a StandardScaler and a detector on the f0..f5 features and save both.
+    """
+    paths = [path.strip() for path in input.split(",")]
+    values = np.concatenate([read_feature_rows(path)[1] for path in paths])
+    typer.echo(f"Training {model} on {len(values)} windows from {len(paths)} file(s)...")
+    scaler = StandardScaler().fit(values)
+    detector = make_model(model, contamination, nu, seed).fit(scaler.transform(values))
+    joblib.dump({"version": MODEL_VERSION, "kind": model, "features": MODEL_FEATURES, "scaler": scaler,
+                 "model": detector, "trained_on": paths, "windows": len(values),
+                 "created": time.strftime("%Y-%m-%d %H:%M:%S")}, output)
+    typer.echo(f"Saved model and scaler to {output}")
+
+@app.command()
+def score(
+    model: str = typer.Option(..., "--model", help="Model file written by 'scorer.py train'"),
+    input: str = typer.Option("-", "--input", help="Window rows (CSV or JSON lines of feature_live.py); '-' for stdin"),
+    output: str = typer.Option("-", "--output", help="Output file, '-' for stdout"),
+    format: str = typer.Option("csv", "--format", help="Output format: csv or jsonl"),
+    threshold: float = typer.Option(0.0, "--threshold", help="Windows with a decision score below this are flagged"),
+    batch_size: int = typer.Option(64, "--batch-size", help="Most windows scored together"),
+    max_delay: float = typer.Option(0.05, "--max-delay", help="Seconds a window may wait for a batch to fill")
+):
+    """
+    Score window rows as they arrive and write anomaly flags and decision scores.
+
+    Rows are scored in micro-batches that close after --batch-size windows or once
+    their first window has waited --max-delay seconds, so a live stream gets each flag
+    within about --max-delay plus the scoring time, while a file is scored in full
+    batches. latency_ms is the time from reading a window to writing its flag.
+
+    Example: bgpreader ... | ./feature_live.py --window 6 --format jsonl | ./scorer.py score --model if.joblib
+    """
+    if format not in FORMATS:
+        raise typer.BadParameter(f"format must be one of {', '.join(FORMATS)}", param_hint="--format")
+    bundle = load_model(model)
+    scorer = WindowScorer(bundle, threshold)
+    typer.echo(f"Scoring with {bundle['kind']} trained on {bundle['windows']} windows", err=True)
+
+    source = sys.stdin if input == '-' else open(input, newline='')
+    # Bounded, so that a file is read at the pace it is scored and latencies stay per window
+    windows = queue.Queue(2 * batch_size)
+    reader = threading.Thread(target=read_windows, args=(source, windows), daemon=True)
+    reader.start()
+
+    out = sys.stdout if output == '-' else open(output, 'w', newline='', buffering=1)
+    latencies, anomalies, batches = [], 0, 0
+    try:
+        writer = csv.writer(out)
+        if format == "csv":
+            writer.writerow(OUTPUT_HEADER)
+        for batch in micro_batches(windows, batch_size, max_delay):
+            scores, flags = scorer.score(np.array([values for _, _, values in batch], dtype=np.float64))
+            done = time.perf_counter()
+            for (arrival, timestamp, _), window_score, flag in zip(batch, scores.tolist(), flags.tolist()):
+                latency = (done - arrival) * 1000
+                row = (timestamp, round(window_score, 6), int(flag), len(batch), round(latency, 3))
+                if format == "csv":
+                    writer.writerow(row)
+                else:
+                    out.write(json.dumps(dict(zip(OUTPUT_HEADER, row))) + "\n")
+                latencies.append(latency)
+            out.flush()
+            anomalies += int(flags.sum())
+            batches += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if source is not sys.stdin:
+            source.close()
+
+    if latencies:
+        p50, p99 = np.percentile(latencies, [50, 99])
+        typer.echo(f"Scored {len(latencies)} windows in {batches} batches; {anomalies} flagged; "
+                   f"latency p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {max(latencies):.2f} ms", err=True)
+    else:
+        typer.echo("No windows to score.", err=True)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Polynomial hash of a byte string: sum(c[i] * BASE^i) modulo 2^64. parse_block computes
+# the same hashes for whole blocks with NumPy (see vectorized.py).
+HASH_BASE = 0x100000001B3
+MASK = (1 << 64) - 1
+
+# Relative standard error of the distinct counts by default: 4096 one-byte registers
+DEFAULT_ERROR = 0.02
+MIN_PRECISION, MAX_PRECISION = 4, 16
+# Strings an exact counter gathers before hashing them into its keys
+VALUE_BATCH = 1024
+# Keys of a counter that has none (never modified in place)
+NO_KEYS = np.zeros(0, dtype=np.uint64)
+
+
+def text_hash(value: str):
+    """
+    The polynomial hash parse_block gives the same field, 0 for an empty one.
+    """
+    result, power = 0, 1
+    for byte in value.encode():
+        result = (result + byte * power) & MASK
+        power = (power * HASH_BASE) & MASK
+    return result
+
+def mix(value: int):
+    """
+    Spreads the bits of a 64-bit hash (the splitmix64 finalizer). The polynomial hashes
+    of similar strings share their low bits, and the sketches need uniform ones.
+    """
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+def mix_array(values):
+    """
+    mix over a uint64 array.
+    """
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+@lru_cache(maxsize=1 << 16)
+def key_of(value: str):
+    """
+    Sketch key of a text field. Prefixes, paths, origins and peers repeat a lot, so the
+    keys of recent values are cached.
+    """
+    return mix(text_hash(value))
+
+def keys_of(values):
+    """
+    key_of over a collection of strings, hashed together with NumPy.
+    """
+    encoded = [value.encode() for value in values]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    if not len(data):
+        return mix_array(np.zeros(len(encoded), dtype=np.uint64))
+    starts = np.cumsum(lengths) - lengths
+    positions = np.arange(len(data)) - np.repeat(starts, lengths)
+    weighted = data * _powers(int(lengths.max()).bit_length())[positions]
+    sums = np.add.reduceat(weighted, np.minimum(starts, len(data) - 1))
+    return mix_array(np.where(lengths > 0, sums, np.uint64(0)))
+
+@lru_cache(maxsize=None)
+def _powers(bits: int):
+    # HASH_BASE^i modulo 2^64 for i < 2^bits
+    series = np.full(1 << bits, HASH_BASE, dtype=np.uint64)
+    series[0] = 1
+    return np.cumprod(series, dtype=np.uint64)
+
+
+def precision_for(error: float):
+    """
+    Register count exponent of sketches with a relative standard error of at most
+    `error` (1.04 / sqrt(registers)), or None for exact counting with an error of 0.
+    """
+    if not error:
+        return None
+    if error < 0:
+        raise ValueError("the error bound of the distinct counts cannot be negative")
+    return min(max(math.ceil(math.log2((1.04 / error) ** 2)), MIN_PRECISION), MAX_PRECISION)
+
+def exact_limit(precision: int):
+    """
+    Distinct keys counted exactly before a sketch takes over: a quarter of the registers,
+    so the 8-byte keys take at most twice the memory of the one-byte registers.
+    """
+    return (1 << precision) // 4
+
+def key_positions(keys, precision: int):
+    """
+    Returns the (register, rank) of mixed keys: the first `precision` bits pick the
+    register and the rank is one more than the leading zeros of the other bits.
+    """
+    keys = np.asarray(keys, dtype=np.uint64)
+    registers = (keys >> np.uint64(64 - precision)).astype(np.int64)
+    rest = keys & np.uint64((1 << (64 - precision)) - 1)
+    # Bit lengths through float64 exponents, exact for 32-bit halves
+    high, low = (rest >> np.uint64(32)).astype(np.float64), (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+    return registers, (64 - precision - length + 1).astype(np.uint8)
+
+def estimate(registers):
+    """
+    HyperLogLog estimate of the distinct keys behind each row of registers, with linear
+    counting while registers are still empty enough for it to be the better estimate.
+    """
+    registers = np.atleast_2d(registers)
+    count = registers.shape[1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(count, 0.7213 / (1 + 1.079 / count))
+    raw = alpha * count * count / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    with np.errstate(divide='ignore'):
+        linear = count * np.log(count / np.maximum(zeros, 1))
+    return np.rint(np.where((raw <= 2.5 * count) & (zeros > 0), linear, raw)).astype(np.int64)
+
+
+class DistinctCounter:
+    """
+    Count of distinct strings that can be merged with others.
+
+    Strings are counted by their 64-bit keys (see key_of), kept in a sorted array. The
+    strings added to a counter and the keys merged into it wait in `values` and
+    `pending` until there are more than exact_limit(precision) of them (VALUE_BATCH
+    without a precision), or the counter is counted or compacted; then they are
+    hashed and deduplicated in one batch. Beyond exact_limit(precision) keys, the keys
+    go into 2^precision HyperLogLog registers, so memory stays bounded however many
+    strings a window has. Without a precision the count stays exact. Whether a
+    counter is exact depends only on its distinct keys, so merging in any order gives
+    the same result, and the same as the numpy engine's counts of the field hashes.
+    Counters of a different precision cannot be merged.
+    """
+    __slots__ = ("precision", "limit", "values", "pending", "waiting", "keys", "registers")
+
+    def __init__(self, precision: int = None):
+        self.precision = precision
+        self.limit = None if precision is None else exact_limit(precision)
+        self.values = set()
+        self.pending = []
+        self.waiting = 0
+        self.keys = NO_KEYS
+        self.registers = None
+
+    def add(self, value: str):
+        if self.registers is None:
+            self.values.add(value)
+            if len(self.values) + self.waiting > (self.limit or VALUE_BATCH):
+                self.compact()
+            return
+        key = key_of(value)
+        register = key >> (64 - self.precision)
+        rank = 64 - self.precision - (key & ((1 << (64 - self.precision)) - 1)).bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def compact(self):
+        """
+        Hashes the strings added and deduplicates the keys merged since the last call
+        into the keys or registers.
+        """
+        if self.values:
+            self.pending.append(keys_of(self.values))
+            self.values = set()
+        if self.pending:
+            keys = np.concatenate(self.pending) if len(self.pending) > 1 else self.pending[0]
+            self.pending, self.waiting = [], 0
+            self._add_keys(keys)
+
+    def merge(self, other):
+        if self.precision is None and other.precision is not None:
+            self.precision, self.limit = other.precision, other.limit
+        elif other.precision not in (None, self.precision):
+            raise ValueError(f"cannot merge sketches of precision {other.precision} into {self.precision}")
+        if other.registers is not None:
+            if self.registers is None:
+                self._to_registers()
+            np.maximum(self.registers, other.registers, out=self.registers)
+        for keys in (other.keys, *other.pending):
+            if len(keys):
+                self.pending.append(keys)
+                self.waiting += len(keys)
+        self.values |= other.values
+        if self.registers is not None or len(self.values) + self.waiting > (self.limit or VALUE_BATCH):
+            self.compact()
+
+    def _to_registers(self):
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        keys, self.keys = self.keys, NO_KEYS
+        self._add_keys(keys)
+        self.compact()
+
+    def _add_keys(self, keys):
+        if self.registers is None:
+            self.keys = _union(self.keys, keys)
+            if self.limit is not None and len(self.keys) > self.limit:
+                self._to_registers()
+        elif len(keys):
+            registers, ranks = key_positions(keys, self.precision)
+            np.maximum.at(self.registers, registers, ranks)
+
+    def count(self):
+        self.compact()
+        return len(self.keys) if self.registers is None else int(estimate(self.registers)[0])
+
+
+def _union(keys, more):
+    # Sorted distinct keys of both arrays; np.union1d costs more on small arrays
+    merged = np.concatenate((keys, more))
+    merged.sort()
+    return merged[np.concatenate(([True], merged[1:] != merged[:-1]))] if len(merged) else merged
+
+def compact_counters(counters):
+    """
+    DistinctCounter.compact over many counters, hashing all their strings at once.
+    """
+    counters = [counter for counter in counters if counter.values]
+    if not counters:
+        return
+    keys = keys_of([value for counter in counters for value in counter.values])
+    bounds = np.cumsum([len(counter.values) for counter in counters])[:-1]
+    for counter, part in zip(counters, np.split(keys, bounds)):
+        counter.values = set()
+        counter.pending.append(part)
+        counter.compact()
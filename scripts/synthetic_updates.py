@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import typer
+from bench_prefix_tracker import synthetic_table
+from common import parse_start_time
+
+app = typer.Typer()
+
+PATH_VARIANTS = 3  # alternative paths per prefix, so that re-announcements change the path
+TRANSIT_ASNS = 2000
+CHUNK_SECONDS = 60
+
+
+class UpdateStream:
+    """
+    Seeded generator of bgpreader update lines (pipe-delimited, RIS layout).
+
+    Messages arrive as a Poisson process of `rate` per second. Peers and prefixes are
+    drawn with Zipf-like weights, as a few of them send most of the updates. Every
+    prefix has an origin AS and PATH_VARIANTS paths whose lengths follow a shifted
+    Poisson distribution around `path_length`. During the `leaks` episodes of
+    `leak_seconds` the rate is multiplied by `leak_factor`, withdrawals are rarer and
+    `leak_share` of the announcements go through a leaking AS, with the origin unchanged.
+    """
+    def __init__(self, seed: int = 1, rate: float = 200, withdrawal_share: float = 0.15,
+                 prefixes: int = 50000, peers: int = 30, path_length: float = 4.5, max_path_length: int = 15,
+                 leaks: int = 1, leak_seconds: int = 600, leak_factor: float = 20, leak_share: float = 0.8,
+                 collector: str = "rrc00"):
+        self.rng = np.random.default_rng(seed)
+        self.rate = rate
+        self.withdrawal_share = withdrawal_share
+        self.leak_seconds = leak_seconds
+        self.leak_factor = leak_factor
+        self.leak_share = leak_share
+        self.collector = collector
+
+        table = synthetic_table(prefixes, seed)
+        self.prefixes = [prefix for prefix, _ in table]
+        self.origins = [origin for _, origin in table]
+        self.prefix_weights = _zipf_weights(prefixes, 0.8)
+
+        self.peer_asns = [str(asn) for asn in self.rng.integers(1, 65000, peers)]
+        self.peer_ips = [f"10.{i // 256}.{i % 256}.1" for i in range(peers)]
+        self.peer_weights = _zipf_weights(peers, 1.0)
+
+        transit = [str(asn) for asn in self.rng.integers(1, 400000, TRANSIT_ASNS)]
+        transit_weights = _zipf_weights(TRANSIT_ASNS, 1.0)
+        lengths = np.clip(2 + self.rng.poisson(max(path_length - 2, 0), (prefixes, PATH_VARIANTS)),
+                          2, max_path_length)
+        hops = iter(self.rng.choice(TRANSIT_ASNS, int((lengths - 2).sum()), p=transit_weights).tolist())
+        # Transit ASes and the origin; lines put the peer ASN in front
+        self.paths = [[" ".join([transit[next(hops)] for _ in range(length - 2)] + [origin]) for length in variants]
+                      for origin, variants in zip(self.origins, lengths.tolist())]
+        self.leaker = str(self.rng.integers(1, 400000))
+
+        # Leak episodes start at random times within the expected duration
+        self.leak_starts = sorted(self.rng.uniform(0.1, 0.9, leaks).tolist())
+
+    def lines(self, rows: int, start: int):
+        """
+        Yields lists of lines, `rows` lines in total, with timestamps from `start`.
+        """
+        # Leaks are shortened to take at most half of the rows, and placed within the
+        # expected duration of the stream
+        leak_rate = self.rate * self.leak_factor
+        leak_seconds = min(self.leak_seconds, rows / 2 / leak_rate / max(len(self.leak_starts), 1))
+        duration = (rows - len(self.leak_starts) * leak_seconds * leak_rate) / self.rate
+        duration += len(self.leak_starts) * leak_seconds
+        leak_starts = [start + int(share * duration) for share in self.leak_starts]
+        written, second = 0, start
+        while written < rows:
+            seconds = np.arange(second, second + CHUNK_SECONDS)
+            leaking = np.zeros(CHUNK_SECONDS, dtype=bool)
+            for leak_start in leak_starts:
+                leaking |= (seconds >= leak_start) & (seconds < leak_start + leak_seconds)
+            counts = self.rng.poisson(np.where(leaking, leak_rate, self.rate))
+            count = min(int(counts.sum()), rows - written)
+            times = np.repeat(seconds, counts)[:count]
+            in_leak = np.repeat(leaking, counts)[:count]
+
+            withdrawal_share = np.where(in_leak, self.withdrawal_share / 4, self.withdrawal_share)
+            withdrawn = self.rng.random(count) < withdrawal_share
+            leaked = in_leak & ~withdrawn & (self.rng.random(count) < self.leak_share)
+            peers = self.rng.choice(len(self.peer_asns), count, p=self.peer_weights)
+            prefixes = self.rng.choice(len(self.prefixes), count, p=self.prefix_weights)
+            variants = self.rng.integers(0, PATH_VARIANTS, count)
+            yield [self._line(*values) for values in zip(times.tolist(), withdrawn.tolist(), leaked.tolist(),
+                                                         peers.tolist(), prefixes.tolist(), variants.tolist())]
+            written += count
+            second += CHUNK_SECONDS
+
+    def _line(self, second, withdrawn, leaked, peer, prefix, variant):
+        peer_asn, peer_ip = self.peer_asns[peer], self.peer_ips[peer]
+        if withdrawn:
+            return f"U|W|{second}.000000|ris|{self.collector}|||{peer_asn}|{peer_ip}|{self.prefixes[prefix]}||||||\n"
+        path = self.paths[prefix][variant]
+        if leaked:
+            path = f"{self.leaker} {path}"
+        return (f"U|A|{second}.000000|ris|{self.collector}|||{peer_asn}|{peer_ip}|{self.prefixes[prefix]}|"
+                f"{peer_ip}|{peer_asn} {path}|{self.origins[prefix]}|||\n")
+
+
+def _zipf_weights(count: int, exponent: float):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate(output: str, rows: int, start_time: str = "2024-01-01 00:00:00", **options):
+    """
+    Writes `rows` synthetic update lines to `output`; `options` go to UpdateStream.
+    """
+    stream = UpdateStream(**options)
+    with open(output, 'w') as out:
+        for lines in stream.lines(rows, parse_start_time(start_time)):
+            out.writelines(lines)
+
+
+@app.command()
+def synthetic_updates(
+    output: str = typer.Option(..., "--output", help="Output file in bgpreader's pipe-delimited format"),
+    rows: int = typer.Option(1000000, "--rows", help="Number of update lines"),
+    seed: int = typer.Option(1, "--seed", help="Random seed; the same seed and options give the same file"),
+    start_time: str = typer.Option("2024-01-01 00:00:00", "--start-time", help="Timestamp of the first second"),
+    rate: float = typer.Option(200, "--rate", help="Mean messages per second outside leaks"),
+    withdrawal_share: float = typer.Option(0.15, "--withdrawal-share", help="Share of withdrawals outside leaks"),
+    prefixes: int = typer.Option(50000, "--prefixes", help="Distinct prefixes"),
+    peers: int = typer.Option(30, "--peers", help="Distinct peers"),
+    path_length: float = typer.Option(4.5, "--path-length", help="Mean AS path length"),
+    max_path_length: int = typer.Option(15, "--max-path-length", help="Longest AS path"),
+    leaks: int = typer.Option(1, "--leaks", help="Number of route leak episodes"),
+    leak_seconds: int = typer.Option(600, "--leak-seconds", help="Duration of each leak episode"),
+    leak_factor: float = typer.Option(20, "--leak-factor", help="Message rate multiplier during leaks"),
+    leak_share: float = typer.Option(0.8, "--leak-share", help="Share of announcements through the leaking AS during leaks"),
+    collector: str = typer.Option("rrc00", "--collector", help="Collector name in the collector column")
+):
+    """
+    Generate a reproducible synthetic RIS update stream for benchmarks.
+    """
+    generate(output, rows, start_time, seed=seed, rate=rate, withdrawal_share=withdrawal_share,
+             prefixes=prefixes, peers=peers, path_length=path_length, max_path_length=max_path_length,
+             leaks=leaks, leak_seconds=leak_seconds, leak_factor=leak_factor, leak_share=leak_share,
+             collector=collector)
+    typer.echo(f"Wrote {rows} update lines to {output}")
+
+
+if __name__ == "__main__":
+    app()
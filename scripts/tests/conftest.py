@@ -0,0 +1,46 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The scripts import each other as top-level modules, as when they are run from scripts/
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+PATH_VARIANTS = 3
+
+
+def updates(rows: int, rate: int = 50, prefixes: int = 300, peers: int = 8, seed: int = 1,
+            start: int = 1704067200):
+    """
+    Yields `rows` time-ordered bgpreader update lines, `rate` per second. Every prefix
+    has an origin and PATH_VARIANTS paths to it, so re-announcements change paths.
+    """
+    generator = random.Random(seed)
+    for row in range(rows):
+        epoch = start + row // rate
+        prefix = generator.randrange(prefixes)
+        peer = generator.randrange(peers)
+        peer_asn, peer_ip = 3000 + peer, f"10.0.{peer}.1"
+        network = f"10.{prefix // 256}.{prefix % 256}.0/24" if prefix % 5 else f"2001:db8:{prefix:x}::/48"
+        if generator.random() < 0.15:
+            yield f"U|W|{epoch}.000000|ris|rrc00|||{peer_asn}|{peer_ip}|{network}||||||\n"
+            continue
+        origin = 64500 + prefix % 40
+        transit = " ".join(str(100 + (prefix * 7 + hop) % 90) for hop in range(generator.randrange(PATH_VARIANTS)))
+        as_path = " ".join(part for part in (str(peer_asn), transit, str(origin)) if part)
+        yield f"U|A|{epoch}.000000|ris|rrc00|||{peer_asn}|{peer_ip}|{network}|{peer_ip}|{as_path}|{origin}|||\n"
+
+
+@pytest.fixture(scope="session")
+def write_updates():
+    """
+    Writes the lines of `updates` to a file: write_updates(path, rows, **options).
+    """
+    def write(path, rows: int, **options):
+        os.makedirs(os.path.dirname(str(path)), exist_ok=True)
+        with open(path, 'w') as out:
+            out.writelines(updates(rows, **options))
+        return str(path)
+    return write
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+from typer.testing import CliRunner
+
+import build
+
+CATALOG = """
+[defaults]
+windows = [30, 60]
+layout = "consolidated"
+
+[[incidents]]
+name = "synthetic"
+output_dir = "features"
+dumps = {{ rrc00 = "updates.txt" }}
+{extra}
+"""
+
+
+def write_catalog(root, extra: str = ""):
+    catalog = root / "incidents.toml"
+    catalog.write_text(CATALOG.format(extra=extra))
+    return str(catalog)
+
+
+def status(catalog: str):
+    [job] = build.load_catalog(catalog)
+    return build.job_status(job, build.code_version())
+
+
+@pytest.fixture
+def built(tmp_path, write_updates):
+    write_updates(tmp_path / "updates.txt", 2000)
+    catalog = write_catalog(tmp_path)
+    assert status(catalog) == "stale"
+    result = CliRunner().invoke(build.app, ["--catalog", catalog, "--jobs", "1"])
+    assert result.exit_code == 0, result.output
+    return catalog
+
+
+def test_outputs_and_stamp(built, tmp_path):
+    for window in ("w30s", "w60s"):
+        assert os.path.exists(tmp_path / "features" / window / "consolidated_features_rrc00.csv")
+    assert status(built) == "current"
+    result = CliRunner().invoke(build.app, ["--catalog", built, "--dry-run"])
+    assert "would build" not in result.output
+
+
+def test_touched_input_stays_current(built, tmp_path):
+    dump = tmp_path / "updates.txt"
+    stat = os.stat(dump)
+    os.utime(dump, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert status(built) == "current"
+    [job] = build.load_catalog(built)
+    assert build.read_stamp(job)["input"]["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_changed_input_is_stale(built, tmp_path):
+    with open(tmp_path / "updates.txt", 'a') as out:
+        out.write("U|W|1704067300.000000|ris|rrc00|||3000|10.0.0.1|10.0.0.0/24||||||\n")
+    assert status(built) == "stale"
+
+
+def test_changed_settings_are_stale(built, tmp_path):
+    write_catalog(tmp_path, 'engine = "numpy"')
+    assert status(built) == "stale"
+
+
+def test_missing_or_changed_output_is_stale(built, tmp_path):
+    output = tmp_path / "features" / "w60s" / "consolidated_features_rrc00.csv"
+    with open(output, 'a') as out:
+        out.write("\n")
+    assert status(built) == "stale"
+    os.remove(output)
+    assert status(built) == "stale"
+
+
+def test_write_stamp_replaces_the_stamp(built):
+    [job] = build.load_catalog(built)
+    assert build.job_status(job, "other code") == "stale"
+    build.write_stamp(job, {"built": "now"}, {})
+    stamp = build.read_stamp(job)
+    assert stamp["key"] == job.key and stamp["outputs"] == {} and stamp["built"] == "now"
+    assert not os.path.exists(f"{job.stamp_file}.partial")
+    # The stamp lists no outputs, so the job's outputs are not accounted for
+    assert build.job_status(job, "other code") == "stale"
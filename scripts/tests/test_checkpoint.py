@@ -0,0 +1,83 @@
+import os
+
+import pytest
+from typer.testing import CliRunner
+
+import vectorized
+import feature_all
+
+
+def extract(input_file: str, output_dir: str, *options):
+    return CliRunner().invoke(feature_all.app, ["--input", input_file, "--output-dir", output_dir, "--collector", "rrc00",
+                                                "--window", "10", "--engine", "numpy", "--chunk-bytes", "4096",
+                                                *options])
+
+
+def outputs(output_dir: str):
+    files = {}
+    for name in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, name)) as output:
+            files[name] = output.read()
+    return files
+
+
+@pytest.fixture
+def full(tmp_path, write_updates):
+    dump = write_updates(tmp_path / "full" / "updates.txt", 3000)
+    result = extract(dump, str(tmp_path / "expected"))
+    assert result.exit_code == 0, result.output
+    return dump, outputs(str(tmp_path / "expected"))
+
+
+def test_resume_after_an_interruption(full, tmp_path, monkeypatch):
+    dump, expected = full
+    checkpoint = str(tmp_path / "state.checkpoint")
+    saves = []
+
+    def interrupted(path, state):
+        save_checkpoint(path, state)
+        saves.append(state.offset)
+        if len(saves) == 3:
+            raise KeyboardInterrupt
+
+    save_checkpoint = vectorized.save_checkpoint
+    monkeypatch.setattr(vectorized, "save_checkpoint", interrupted)
+    result = extract(dump, str(tmp_path / "out"), "--checkpoint", checkpoint, "--checkpoint-interval", "0")
+    assert result.exit_code != 0
+    assert 0 < saves[-1] < os.path.getsize(dump)
+
+    monkeypatch.setattr(vectorized, "save_checkpoint", save_checkpoint)
+    result = extract(dump, str(tmp_path / "out"), "--checkpoint", checkpoint, "--resume")
+    assert result.exit_code == 0, result.output
+    assert f"({saves[-1]} bytes)" in result.output
+    assert outputs(str(tmp_path / "out")) == expected
+
+
+def test_append_continues_after_new_lines(full, tmp_path):
+    dump, expected = full
+    with open(dump) as source:
+        lines = source.readlines()
+    growing = tmp_path / "growing" / "updates.txt"
+    growing.parent.mkdir()
+    growing.write_text("".join(lines[:1700]))
+    checkpoint = str(tmp_path / "state.checkpoint")
+    result = extract(str(growing), str(tmp_path / "out"), "--checkpoint", checkpoint)
+    assert result.exit_code == 0, result.output
+
+    with open(growing, 'a') as out:
+        out.writelines(lines[1700:])
+    result = extract(str(growing), str(tmp_path / "out"), "--checkpoint", checkpoint, "--append")
+    assert result.exit_code == 0, result.output
+    assert "after 1700 lines" in result.output
+    assert outputs(str(tmp_path / "out")) == expected
+
+
+def test_checkpoint_of_another_input_is_not_resumed(full, tmp_path, write_updates):
+    dump, expected = full
+    checkpoint = str(tmp_path / "state.checkpoint")
+    other = write_updates(tmp_path / "other" / "updates.txt", 500, seed=2)
+    assert extract(other, str(tmp_path / "other-out"), "--checkpoint", checkpoint).exit_code == 0
+    result = extract(dump, str(tmp_path / "out"), "--checkpoint", checkpoint, "--resume")
+    assert result.exit_code == 0, result.output
+    assert "is for another input" in result.output
+    assert outputs(str(tmp_path / "out")) == expected
@@ -0,0 +1,70 @@
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+
+import pytest
+from typer.testing import CliRunner
+
+from compression import open_decompressed, decompress_command
+import feature_all
+
+MODULES = {".gz": gzip, ".bz2": bz2, ".xz": lzma}
+
+
+def consolidated(input_file: str, output_dir: str, *options):
+    result = CliRunner().invoke(feature_all.app, ["--input", input_file, "--output-dir", output_dir, "--collector", "rrc00",
+                                                  "--window", "30", "--layout", "consolidated", *options])
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(output_dir, "consolidated_features_rrc00.csv")) as output:
+        return output.read()
+
+
+@pytest.fixture(scope="module")
+def dump(tmp_path_factory, write_updates):
+    return write_updates(tmp_path_factory.mktemp("dump") / "updates.txt", 3000)
+
+
+def compressed(dump: str, suffix: str):
+    path = dump + suffix
+    if not os.path.exists(path):
+        with open(dump, 'rb') as source, MODULES[suffix].open(path, 'wb') as out:
+            shutil.copyfileobj(source, out)
+    return path
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".bz2", ".xz"])
+@pytest.mark.parametrize("mode", ["process", "thread"])
+def test_same_bytes(dump, suffix, mode):
+    if mode == "process" and decompress_command(suffix) is None:
+        pytest.skip(f"no {suffix} decompressor on the PATH")
+    with open(dump, 'rb') as source, open_decompressed(compressed(dump, suffix), mode) as stream:
+        assert stream.read() == source.read()
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".bz2"])
+@pytest.mark.parametrize("mode", ["process", "thread"])
+@pytest.mark.parametrize("engine", ["petl", "numpy"])
+def test_same_features(dump, suffix, mode, engine, tmp_path):
+    if mode == "process" and decompress_command(suffix) is None:
+        pytest.skip(f"no {suffix} decompressor on the PATH")
+    expected = consolidated(dump, str(tmp_path / "plain"), "--engine", engine)
+    assert consolidated(compressed(dump, suffix), str(tmp_path / "compressed"), "--engine", engine,
+                        "--decompress", mode) == expected
+
+
+def test_head_stops_the_decompressor(dump, tmp_path):
+    expected = consolidated(dump, str(tmp_path / "plain"), "--head", "100")
+    assert consolidated(compressed(dump, ".gz"), str(tmp_path / "compressed"), "--head", "100") == expected
+
+
+def test_truncated_input_fails(dump, tmp_path):
+    path = compressed(dump, ".gz")
+    truncated = str(tmp_path / "truncated.gz")
+    with open(path, 'rb') as source, open(truncated, 'wb') as out:
+        out.write(source.read()[:os.path.getsize(path) // 2])
+    result = CliRunner().invoke(feature_all.app, ["--input", truncated, "--output-dir", str(tmp_path / "out"),
+                                                  "--collector", "rrc00", "--decompress", "thread"])
+    assert result.exit_code != 0
+    assert isinstance(result.exception, OSError)
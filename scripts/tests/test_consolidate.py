@@ -0,0 +1,44 @@
+import csv
+
+from typer.testing import CliRunner
+
+from consolidate import app, consolidate, feature_files
+
+
+def write_feature(path, name, rows):
+    with open(path, 'w', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(("feature_name", "timestamp", "value"))
+        writer.writerows((name, timestamp, value) for timestamp, value in rows)
+
+
+def read(path):
+    with open(path, newline='') as source:
+        return list(csv.reader(source))
+
+
+def test_missing_windows_are_zero_filled(tmp_path):
+    write_feature(tmp_path / "feature_0_rrc00.csv", "update_count",
+                  [("2024-01-01 00:00:00", "5"), ("2024-01-01 00:01:00", "7"), ("2024-01-01 00:04:00", "2")])
+    write_feature(tmp_path / "feature_1_rrc00.csv", "announcement_count",
+                  [("2024-01-01 00:01:00", "3"), ("2024-01-01 00:02:00", "1")])
+    output = str(tmp_path / "consolidated.csv")
+    assert consolidate(feature_files(str(tmp_path), "rrc00"), output) == (5, 1)
+    assert read(output) == [
+        ["timestamp", "f0_update_count", "f1_announcement_count"],
+        ["2024-01-01 00:00:00", "5", "0"],
+        ["2024-01-01 00:01:00", "7", "3"],
+        ["2024-01-01 00:02:00", "0", "1"],
+        ["2024-01-01 00:03:00", "0", "0"],
+        ["2024-01-01 00:04:00", "2", "0"],
+    ]
+
+
+def test_command_with_an_explicit_window(tmp_path):
+    write_feature(tmp_path / "feature_2_rrc00.csv", "withdrawal_count",
+                  [("2024-01-01 00:00:00", "1"), ("2024-01-01 00:00:30", "4")])
+    result = CliRunner().invoke(app, ["--input-dir", str(tmp_path), "--collector", "rrc00", "--window", "10"])
+    assert result.exit_code == 0, result.output
+    rows = read(tmp_path / "consolidated_features_rrc00.csv")
+    assert [row[1] for row in rows[1:]] == ["1", "0", "0", "4"]
+    assert "(2 zero-filled)" in result.output
@@ -0,0 +1,78 @@
+import csv
+import os
+import random
+
+import pytest
+from typer.testing import CliRunner
+
+import feature_all
+
+# Every way of computing the features; all must give the output of the default petl run
+VARIANTS = {
+    "stream": ["--stream"],
+    "numpy": ["--engine", "numpy"],
+    "workers": ["--workers", "2"],
+    "numpy-workers": ["--engine", "numpy", "--workers", "2"],
+    "cache": ["--cache"],
+    "numpy-cache": ["--engine", "numpy", "--cache"],
+    "checkpoint": ["--engine", "numpy", "--checkpoint", "{tmp}/state.npz"],
+}
+
+
+def consolidated(input_file: str, output_dir: str, *options):
+    result = CliRunner().invoke(feature_all.app, ["--input", input_file, "--output-dir", output_dir, "--collector", "rrc00",
+                                                  "--window", "6,30", "--layout", "consolidated", *options])
+    assert result.exit_code == 0, result.output
+    features = {}
+    for window in ("w06s", "w30s"):
+        with open(os.path.join(output_dir, window, "consolidated_features_rrc00.csv")) as rows:
+            features[window] = list(csv.reader(rows))
+    return features
+
+
+@pytest.fixture(scope="module")
+def dumps(tmp_path_factory, write_updates):
+    """
+    A time-ordered synthetic dump; the same lines with timestamps up to 3 seconds early
+    or 1 second late, as several peers interleaved by a collector give; and the ordered
+    lines with CRLF endings, malformed lines, lines without a peer and bytes that are
+    not UTF-8.
+    """
+    root = tmp_path_factory.mktemp("dumps")
+    ordered = write_updates(root / "ordered" / "updates.txt", 6000)
+    generator = random.Random(1)
+    jittered = str(root / "jittered" / "updates.txt")
+    os.makedirs(os.path.dirname(jittered))
+    with open(ordered) as source, open(jittered, "w") as out:
+        for line in source:
+            fields = line.split("|")
+            epoch = int(fields[2].partition(".")[0]) + generator.choice([0, 0, 0, 1, -1, -2, -3])
+            fields[2] = f"{epoch}.000000"
+            out.write("|".join(fields))
+    malformed = str(root / "malformed" / "updates.txt")
+    os.makedirs(os.path.dirname(malformed))
+    with open(ordered, "rb") as source, open(malformed, "wb") as out:
+        for number, line in enumerate(source):
+            if number % 7 == 0:
+                # Undecodable bytes in the communities column
+                line = line[:-4] + b"|65000:\xff\xfe||\n"
+            if number % 11 == 0:
+                line = line[:-1] + b"\r\n"
+            if number % 13 == 0:
+                # No peer-asn or peer-ip
+                fields = line.split(b"|")
+                fields[7:9] = [b"", b""]
+                line = b"|".join(fields)
+            if number % 500 == 0:
+                out.write(b"\n" + b"U|A\n" + b"U|A|\xff|ris|rrc00|||1|10.0.0.1|10.0.0.0/8|||||\n")
+            out.write(line)
+    return {"ordered": ordered, "jittered": jittered, "malformed": malformed}
+
+
+@pytest.mark.parametrize("dump", ["ordered", "jittered", "malformed"])
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_same_features(dumps, dump, variant, tmp_path):
+    expected = consolidated(dumps[dump], str(tmp_path / "petl"))
+    assert sum(int(row[6]) for row in expected["w06s"][1:]) > 0  # f5 has changes to compare
+    options = [option.format(tmp=tmp_path) for option in VARIANTS[variant]]
+    assert consolidated(dumps[dump], str(tmp_path / variant), *options) == expected
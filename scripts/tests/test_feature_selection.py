@@ -0,0 +1,60 @@
+import filecmp
+import importlib
+import os
+
+import pytest
+from typer.testing import CliRunner
+
+import feature_all
+
+ENGINES = {"petl": [], "numpy": ["--engine", "numpy"], "workers": ["--workers", "2"]}
+
+
+@pytest.fixture(scope="module")
+def dump(tmp_path_factory, write_updates):
+    return write_updates(tmp_path_factory.mktemp("dump") / "updates.txt", 3000, prefixes=200, peers=6)
+
+
+def run(app, *arguments):
+    result = CliRunner().invoke(app, list(arguments))
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def all_features(dump: str, output_dir: str, *options):
+    run(feature_all.app, "--input", dump, "--output-dir", output_dir, "--collector", "rrc00", "--window", "30", *options)
+    return output_dir
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("index", range(6))
+def test_single_feature_scripts(dump, engine, index, tmp_path):
+    expected = all_features(dump, str(tmp_path / "all"), *ENGINES[engine])
+    output = str(tmp_path / f"feature_{index}.csv")
+    script = importlib.import_module(f"feature_{index}")
+    run(script.app, "--input", dump, "--output", output, "--window", "30", *ENGINES[engine])
+    assert filecmp.cmp(output, os.path.join(expected, f"feature_{index}_rrc00.csv"), shallow=False)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("features", ["5", "3,9", "10,11,12,13"])
+def test_selected_features(dump, engine, features, tmp_path):
+    expected = all_features(dump, str(tmp_path / "all"), *ENGINES[engine])
+    selected = all_features(dump, str(tmp_path / "selected"), "--features", features, *ENGINES[engine])
+    names = sorted(os.listdir(selected))
+    assert names == sorted(f"feature_{index}_rrc00.csv" for index in features.split(","))
+    for name in names:
+        assert filecmp.cmp(os.path.join(selected, name), os.path.join(expected, name), shallow=False)
+
+
+@pytest.mark.parametrize("options", [["--features", "14"], ["--features", "a"],
+                                     ["--features", "5", "--layout", "both"], ["--features", "5", "--store"]])
+def test_invalid_selection(dump, options, tmp_path):
+    result = CliRunner().invoke(feature_all.app, ["--input", dump, "--output-dir", str(tmp_path), "--collector", "rrc00",
+                                                  *options])
+    assert result.exit_code != 0
+    assert "--features" in result.output
+
+
+def test_help():
+    assert "--engine" in run(importlib.import_module("feature_0").app, "--help").output
@@ -0,0 +1,68 @@
+import csv
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+from feature_store import FeatureStore, write_store, store_dir
+import feature_all
+
+HEADER = ("timestamp", "f0_update_count", "f3_avg_as_path_length")
+FIRST = datetime(2024, 1, 1)
+# A window every 3 hours over three days: 8 per daily shard
+MOMENTS = [FIRST + timedelta(hours=3 * i) for i in range(24)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    windows = [(int(moment.timestamp()), (i, i / 2)) for i, moment in enumerate(MOMENTS)]
+    directory = str(tmp_path / "store_rrc00")
+    write_store(directory, HEADER, windows)
+    return FeatureStore(directory)
+
+
+def times(result):
+    return [datetime.fromisoformat(str(moment)) for moment in result["timestamp"]]
+
+
+def test_shards(store):
+    assert [shard["rows"] for shard in store.shards] == [8, 8, 8]
+
+
+def test_range_across_shard_boundaries(store):
+    result = store.read("2024-01-01 21:00:00", "2024-01-03 03:00:00")
+    assert times(result) == MOMENTS[7:18]
+    assert result["f0_update_count"].tolist() == list(range(7, 18))
+    assert result["f3_avg_as_path_length"].tolist() == [i / 2 for i in range(7, 18)]
+
+
+def test_bounds_are_included_and_open_ends(store):
+    assert times(store.read("2024-01-02 00:00:00", "2024-01-02 00:00:00")) == [MOMENTS[8]]
+    assert times(store.read(None, "2024-01-01 05:59:59")) == MOMENTS[:2]
+    assert times(store.read("2024-01-03 20:00:00")) == MOMENTS[23:]
+    assert times(store.read()) == MOMENTS
+
+
+def test_empty_range_and_columns(store):
+    result = store.read("2024-01-01 01:00:00", "2024-01-01 02:00:00", ["f0_update_count"])
+    assert set(result) == {"timestamp", "f0_update_count"}
+    assert len(result["timestamp"]) == 0 and result["f0_update_count"].dtype == np.int64
+    with pytest.raises(KeyError):
+        store.read(columns=["f99"])
+
+
+def test_store_matches_the_consolidated_file(tmp_path, write_updates):
+    dump = write_updates(tmp_path / "dump" / "updates.txt", 2000)
+    output_dir = str(tmp_path / "out")
+    result = CliRunner().invoke(feature_all.app, ["--input", dump, "--output-dir", output_dir, "--collector", "rrc00",
+                                                  "--window", "6", "--layout", "consolidated", "--store"])
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(output_dir, "consolidated_features_rrc00.csv")) as source:
+        rows = list(csv.reader(source))
+    loaded = FeatureStore(store_dir(output_dir, "rrc00")).read(rows[2][0], rows[5][0])
+    assert [str(moment).replace("T", " ") for moment in loaded["timestamp"]] == [row[0] for row in rows[2:6]]
+    # Columns mixing integer and fractional values (the median) are floats in the store
+    for position, column in enumerate(rows[0][1:], 1):
+        assert loaded[column].tolist() == [float(row[position]) for row in rows[2:6]]
@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_report_without_a_terminal(tmp_path):
+    dump = tmp_path / "updates.txt"
+    lines = [f"U|A|{100 + i}.000000|ris|rrc00|||3333|1.1.1.3|10.{i}.0.0/16|1.1.1.1|3333 {i} 64503|64503|||\n"
+             for i in range(50)]
+    dump.write_text("".join(lines) + "U|A|not-a-time|ris\n")
+    report = tmp_path / "report.json"
+    result = subprocess.run([sys.executable, "feature_0.py", "--input", str(dump), "--output", str(tmp_path / "f0.csv"),
+                             "--window", "10", "--report", str(report)],
+                            cwd=SCRIPTS_DIR, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+    # The stage table is only drawn on a terminal
+    assert "Extraction stages" not in result.stdout + result.stderr
+    assert result.stdout.endswith("\nFeature extraction complete!\n")
+
+    stages = json.loads(report.read_text())
+    assert stages["stages"]["read"]["bytes_read"] == os.path.getsize(dump)
+    assert stages["stages"]["parse"]["rows_out"] == 50
+    assert stages["stages"]["write"]["rows_out"] == 5
+    assert stages["rejected_lines"] == {"timestamp": 1}
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from intervals import event_scores, sweep_thresholds
+
+LABEL_STARTS, LABEL_ENDS = np.array([3000, 9000]), np.array([6000, 9600])
+
+
+def scores_of(starts, ends):
+    result = event_scores(np.zeros(len(starts), dtype=np.int64), np.array(starts), np.array(ends),
+                          LABEL_STARTS, LABEL_ENDS, 1)
+    return {name: values[0] for name, values in result.items()}
+
+
+def test_exact_detection():
+    result = scores_of([3000, 9000], [6000, 9600])
+    assert (result["precision"], result["recall"], result["f1"], result["iou"]) == (1, 1, 1, 1)
+    assert result["mean_delay"] == 0
+
+
+def test_detection_spanning_everything_is_not_precise():
+    result = scores_of([0], [36000])
+    assert result["recall"] == 1
+    assert result["precision"] == pytest.approx(3600 / 36000)
+    assert result["f1"] < 0.2
+
+
+def test_precision_is_the_detected_time_within_labels():
+    result = scores_of([2000, 9300, 20000], [4000, 9600, 20500])
+    assert result["precision"] == pytest.approx((1000 + 300) / (2000 + 300 + 500))
+    assert result["recall"] == 1
+    assert result["mean_delay"] == pytest.approx((0 + 300) / 2)
+
+
+def test_sweep_ranks_the_tight_threshold_first():
+    times = np.arange(0, 36000, 60)
+    inside = ((times >= 3000) & (times < 6000)) | ((times >= 9000) & (times < 9600))
+    # Labeled windows score lowest; the second threshold flags every window
+    scores = np.where(inside, -1.0, 0.5)
+    result = sweep_thresholds(times, scores, [0.0, 1.0], LABEL_STARTS, LABEL_ENDS)
+    assert result["recall"].tolist() == [1, 1]
+    assert result["f1"][0] == pytest.approx(1)
+    assert result["f1"][1] < 0.2
+    assert np.argmax(result["f1"]) == 0
@@ -0,0 +1,54 @@
+import json
+import os
+import select
+import subprocess
+import sys
+from datetime import datetime
+
+from common import CONSOLIDATED_HEADER
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def update(epoch: int, prefix: str = "10.0.0.0/8", as_path: str = "3333 7 64503"):
+    return f"U|A|{epoch}.000000|ris|rrc00|||3333|1.1.1.3|{prefix}|1.1.1.1|{as_path}|{as_path.split()[-1]}|||\n"
+
+
+def next_line(stream, timeout: float = 60):
+    readable, _, _ = select.select([stream], [], [], timeout)
+    assert readable, "no output within the timeout"
+    return stream.readline().decode()
+
+
+def test_window_is_written_before_the_input_ends():
+    live = subprocess.Popen([sys.executable, "feature_live.py", "--window", "2", "--reorder-tolerance", "0"],
+                            cwd=SCRIPTS_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+    try:
+        assert next_line(live.stdout).rstrip("\r\n") == ",".join(CONSOLIDATED_HEADER)
+        for epoch in (100, 101, 102):
+            live.stdin.write(update(epoch).encode())
+            live.stdin.flush()
+        # The record at 102 closes the window of 100 and 101 while the feed is still open
+        row = next_line(live.stdout).split(",")
+        assert row[0] == str(datetime.fromtimestamp(100))
+        assert row[1] == "2"
+        assert live.poll() is None
+    finally:
+        live.stdin.close()
+        live.stdout.close()
+        live.wait(timeout=60)
+
+
+def test_jsonl_rows_and_late_rows():
+    # The second 101 arrives after 105 has released 102 with the 2s tolerance
+    feed = "".join(update(epoch, f"10.{epoch % 7}.0.0/16") for epoch in (100, 101, 102, 105, 101, 104, 106))
+    result = subprocess.run([sys.executable, "feature_live.py", "--window", "2", "--reorder-tolerance", "2",
+                             "--format", "jsonl"], cwd=SCRIPTS_DIR, input=feed, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0, result.stderr
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [list(row) for row in rows] == [list(CONSOLIDATED_HEADER)] * 4
+    assert [row["timestamp"] for row in rows] == [str(datetime.fromtimestamp(epoch)) for epoch in (100, 102, 104, 106)]
+    assert [row["f0_update_count"] for row in rows] == [2, 1, 2, 1]
+    assert "1 late rows dropped" in result.stderr
@@ -0,0 +1,85 @@
+import csv
+import os
+import threading
+
+from typer.testing import CliRunner
+
+from common import read_records
+from mrt import is_mrt, read_mrt
+import feature_all
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# BGP4MP and BGP4MP_ET records: 4-byte and 2-byte sessions (with AS4_PATH and an AS_SET),
+# IPv4 NLRI, IPv6 MP_REACH/MP_UNREACH and a state change
+MRT_FIXTURE = os.path.join(DATA_DIR, "updates.20050524.0000.gz")
+# The same elements as bgpreader text
+TEXT_FIXTURE = os.path.join(DATA_DIR, "updates.20050524.0000.txt")
+
+ELEMS = [
+    ("A", 1116892801, 3333, "1.1.1.3", "10.6.199.0/24", "1.1.1.1", "3333 8 7 64503", "64503"),
+    ("A", 1116892801, 3333, "1.1.1.3", "10.6.200.0/23", "1.1.1.1", "3333 8 7 64503", "64503"),
+    ("W", 1116892801, 1299, "1.1.1.9", "10.0.192.0/24", "", "", ""),
+    ("A", 1116892802, 3333, "1.1.1.3", "10.6.199.0/24", "1.1.1.1", "3333 9 64503", "64503"),
+    ("A", 1116892807, 6939, "1.1.1.5", "192.0.2.0/24", "1.1.1.5", "6939 196608 {196609,701}", "{196609,701}"),
+    ("S", 1116892808, 1299, "1.1.1.9", "", "", "", ""),
+    ("A", 1116892813, 20932, "2001:db8::5", "2001:db8:100::/48", "2001:db8::5", "20932 3356 64510", "64510"),
+    ("A", 1116892813, 20932, "2001:db8::5", "2001:db8:200::/40", "2001:db8::5", "20932 3356 64510", "64510"),
+    ("W", 1116892814, 20932, "2001:db8::5", "2001:db8:200::/40", "", "", ""),
+    ("A", 1116892815, 3333, "1.1.1.3", "10.6.199.0/24", "1.1.1.1", "3333 8 64999", "64999"),
+]
+
+
+def consolidated(input_file: str, output_dir: str, *options):
+    result = CliRunner().invoke(feature_all.app, ["--input", input_file, "--output-dir", output_dir, "--collector", "rrc00",
+                                                  "--window", "6", "--layout", "consolidated", *options])
+    assert result.exit_code == 0, result.output
+    with open(os.path.join(output_dir, "consolidated_features_rrc00.csv")) as features:
+        return list(csv.reader(features))
+
+
+def rows(input_file: str):
+    # A single pass: len() of a petl table reads it once more to count the rows
+    return [row for row in read_records(input_file)][1:]
+
+
+def test_read_mrt():
+    assert list(read_mrt(MRT_FIXTURE)) == ELEMS
+
+
+def test_is_mrt():
+    assert is_mrt(MRT_FIXTURE)
+    assert not is_mrt(TEXT_FIXTURE)
+    assert not is_mrt(os.path.join(DATA_DIR, "missing.gz"))
+
+
+def test_mrt_features_match_text(tmp_path):
+    features = consolidated(MRT_FIXTURE, str(tmp_path / "mrt"))
+    assert len(features) == 4
+    assert features == consolidated(TEXT_FIXTURE, str(tmp_path / "text"))
+
+
+def test_fifo_is_read_as_text(tmp_path):
+    fifo = str(tmp_path / "live")
+    os.mkfifo(fifo)
+    with open(TEXT_FIXTURE, "rb") as text:
+        data = text.read()
+
+    # Sniffing would consume the first bytes of the stream (and close it under the writer)
+    both_ends = os.open(fifo, os.O_RDWR | os.O_NONBLOCK)
+    try:
+        os.write(both_ends, data)
+        assert not is_mrt(fifo)
+        assert os.read(both_ends, len(data) + 1) == data
+    finally:
+        os.close(both_ends)
+
+    def write():
+        with open(fifo, "wb") as live:
+            live.write(data)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    records = rows(fifo)
+    writer.join()
+    assert len(records) == len(ELEMS)
+    assert records == rows(TEXT_FIXTURE)
@@ -0,0 +1,35 @@
+import pytest
+
+from prefix_tracker import PrefixTracker, prefix_key, stable_hash, UNPARSED
+from prefix_trie import parse_prefix
+
+INVALID = ["2001:db8::/300", "2001:db8::/129", "2001:db8::/-5", "10.0.0.0/33", "10.0.0.0/-1", "10.0.0.0/x",
+           "10.0.0.0", "not-a-prefix/24"]
+
+
+@pytest.mark.parametrize("prefix", INVALID)
+def test_invalid_prefixes_are_hashed(prefix):
+    assert prefix_key(prefix) == (stable_hash(prefix), 0, UNPARSED)
+    assert parse_prefix(prefix) is None
+
+
+@pytest.mark.parametrize("prefix, code", [("10.0.0.0/0", 1), ("10.0.0.0/32", 33), ("::/0", 64), ("2001:db8::/128", 192)])
+def test_length_bounds(prefix, code):
+    assert prefix_key(prefix)[2] == code
+
+
+@pytest.mark.parametrize("prefix", INVALID + ["10.0.0.0/8", "2001:db8::/32"])
+def test_observe_counts_changes(prefix):
+    tracker = PrefixTracker()
+    assert not tracker.observe(prefix, "1 2 3", "3")
+    assert tracker.observe(prefix, "1 4 3", "3")
+    assert not tracker.observe(prefix, "1 4 5", "5")
+    assert len(tracker) == 1
+
+
+def test_invalid_prefixes_are_distinct():
+    tracker = PrefixTracker(8)
+    for prefix in INVALID:
+        tracker.observe(prefix, "1 2", "2")
+    assert len(tracker) == len(INVALID)
+    assert not any(tracker.observe(prefix, "1 3", "3") for prefix in INVALID)
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+from typer.testing import CliRunner
+
+from reorder import reorder, ReorderError
+import feature_all
+
+
+def records(*epochs):
+    return [(epoch, number) for number, epoch in enumerate(epochs)]
+
+
+def test_disorder_within_the_tolerance_is_sorted():
+    rows = records(10, 12, 11, 11, 14, 13, 10, 15)
+    assert list(reorder(rows, 4)) == sorted(rows, key=lambda record: record[0])
+
+
+def test_late_record_raises():
+    with pytest.raises(ReorderError):
+        list(reorder(records(10, 12, 14, 11), 2))
+
+
+def test_late_record_goes_to_on_late():
+    late = []
+    rows = records(10, 12, 14, 11, 15)
+    assert list(reorder(rows, 2, late.append)) == [rows[0], rows[1], rows[2], rows[4]]
+    assert late == [rows[3]]
+
+
+def test_stream_falls_back_to_a_sort(tmp_path, write_updates):
+    # Every 100th line is a minute late, beyond a 5s tolerance
+    dump = write_updates(tmp_path / "ordered" / "updates.txt", 3000)
+    with open(dump) as source:
+        lines = source.readlines()
+    for number in range(150, len(lines), 100):
+        fields = lines[number].split("|")
+        fields[2] = f"{int(fields[2].partition('.')[0]) - 60}.000000"
+        lines[number] = "|".join(fields)
+    disordered = tmp_path / "updates.txt"
+    disordered.write_text("".join(lines))
+
+    outputs = {}
+    for name, options in (("sorted", []), ("stream", ["--stream", "--reorder-tolerance", "5"])):
+        result = CliRunner().invoke(feature_all.app, ["--input", str(disordered), "--output-dir", str(tmp_path / name),
+                                                      "--collector", "rrc00", "--window", "30", *options])
+        assert result.exit_code == 0, result.output
+        with open(os.path.join(tmp_path / name, "feature_0_rrc00.csv")) as output:
+            outputs[name] = output.read()
+    assert "falling back to an external sort" in result.output
+    assert outputs["stream"] == outputs["sorted"]
@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+import pytest
+
+from sketches import DistinctCounter, key_of, keys_of, compact_counters, precision_for, exact_limit, \
+    DEFAULT_ERROR
+
+
+def prefixes(count: int, seed: int = 0):
+    generator = random.Random(seed)
+    return [f"{generator.randrange(1, 224)}.{generator.randrange(256)}.{generator.randrange(256)}.0/"
+            f"{generator.randrange(16, 25)}" for _ in range(count)]
+
+def counted(values, precision):
+    counter = DistinctCounter(precision)
+    for value in values:
+        counter.add(value)
+    return counter
+
+
+def test_keys_of_matches_key_of():
+    values = ["", "a", "3333 8 8 7 64503", "2001:db8::/32", "ünï"] + prefixes(500)
+    assert keys_of(values).tolist() == [key_of(value) for value in values]
+    assert keys_of([]).dtype == np.uint64
+
+
+@pytest.mark.parametrize("precision", [None, precision_for(DEFAULT_ERROR)])
+def test_exact_up_to_the_limit(precision):
+    limit = exact_limit(precision) if precision else 5000
+    values = prefixes(3 * limit)
+    distinct = sorted(set(values))[:limit]
+    counter = counted(distinct[:1] * 10 + distinct, precision)
+    assert counter.count() == len(distinct)
+    assert counter.registers is None
+
+
+@pytest.mark.parametrize("error", [0.1, 0.05, DEFAULT_ERROR])
+@pytest.mark.parametrize("size", [2000, 20000, 200000])
+def test_error_bound(error, size):
+    values = prefixes(size, seed=size)
+    exact = len(set(values))
+    estimate = counted(values, precision_for(error)).count()
+    # The keys are fixed, so this is not flaky: 3 standard errors
+    assert abs(estimate - exact) <= 3 * error * exact
+
+
+def test_memory_is_bounded():
+    precision = precision_for(DEFAULT_ERROR)
+    counter = counted(prefixes(100000), precision)
+    counter.compact()
+    assert counter.registers.nbytes == 1 << precision
+    assert not counter.values and not counter.pending and not len(counter.keys)
+
+    counter = counted(prefixes(exact_limit(precision) // 2), precision)
+    counter.compact()
+    assert counter.registers is None and not counter.values
+    assert counter.keys.dtype == np.uint64 and counter.keys.nbytes <= 8 * exact_limit(precision)
+
+
+@pytest.mark.parametrize("precision", [None, precision_for(DEFAULT_ERROR)])
+def test_merge_in_any_order(precision):
+    values = prefixes(30000)
+    whole = counted(values, precision).count()
+    for order in (range(7), reversed(range(7))):
+        merged = DistinctCounter()
+        for i in order:
+            merged.merge(counted(values[i::7], precision))
+        assert merged.count() == whole
+
+
+def test_compact_counters():
+    precision = precision_for(DEFAULT_ERROR)
+    groups = [prefixes(size, seed=size) for size in (0, 1, 10, 500, 5000)]
+    together = [counted(values, precision) for values in groups]
+    compact_counters(together)
+    assert all(not counter.values for counter in together)
+    assert [counter.count() for counter in together] == [counted(values, precision).count() for values in groups]
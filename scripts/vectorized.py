@@ -0,0 +1,886 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import numpy as np
+import typer
+
+from common import TYPE_COL, TIMESTAMP_COL, PEER_ASN_COL, PEER_IP_COL, PREFIX_COL, AS_PATH_COL, ORIGIN_AS_COL, \
+    DISTINCT_FEATURES, DISTINCT_INDEXES, PATH_CHANGE_FEATURE, base_window, selects, STAGES
+from checkpoint import Checkpoint, load_checkpoint, save_checkpoint
+from compression import compression, open_decompressed
+from sketches import HASH_BASE, exact_limit, key_positions, estimate, mix_array
+
+NEWLINE, PIPE, SPACE, DOT = ord('\n'), ord('|'), ord(' '), ord('.')
+ANNOUNCEMENT, WITHDRAWAL = ord('A'), ord('W')
+TIMESTAMP_DIGITS = 12
+POWERS_OF_TEN = 10 ** np.arange(TIMESTAMP_DIGITS, dtype=np.int64)
+
+# Polynomial hash of a byte range: sum(c[i] * BASE^i) over the range, scaled by
+# BASE^-start so that equal strings hash equally wherever they are in the block.
+# All arithmetic wraps modulo 2^64 (sketches.text_hash is the same hash for one string).
+HASH_BASE_INVERSE = pow(HASH_BASE, -1, 2 ** 64)
+PAIR_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# Pending (window, key) pairs of a distinct count before they are deduplicated
+DISTINCT_COMPACT_PAIRS = 1 << 22
+# Per-peer cells are (window << PEER_BITS) | peer; pending cells before they are summed
+PEER_BITS = 24
+PEER_COMPACT_CELLS = 1 << 22
+
+
+def read_blocks(input_file: str, chunk_bytes: int, head: int = None, begin: int = 0, end: int = None,
+                decompress: str = "auto"):
+    """
+    Yields blocks of roughly `chunk_bytes` bytes that end on a line boundary,
+    stopping after `head` lines. `begin` and `end` limit a file to a byte range.
+    Compressed files are decompressed while they are read and cannot be limited.
+    """
+    if input_file == '-':
+        yield from _line_blocks(sys.stdin.buffer, chunk_bytes, head)
+    elif compression(input_file):
+        if begin or end is not None:
+            raise ValueError(f"{input_file} is compressed and cannot be read by byte range")
+        with open_decompressed(input_file, decompress) as source:
+            yield from _line_blocks(source, chunk_bytes, head)
+    else:
+        with open(input_file, 'rb') as source:
+            if begin:
+                source.seek(begin)
+            yield from _line_blocks(source, chunk_bytes, head, None if end is None else end - begin)
+
+def _line_blocks(source, chunk_bytes: int, head: int = None, remaining: int = None):
+    carry = b''
+    lines = 0
+    while True:
+        data = source.read(chunk_bytes if remaining is None else min(chunk_bytes, remaining))
+        if not data:
+            break
+        if remaining is not None:
+            remaining -= len(data)
+        data = carry + data
+        cut = data.rfind(b'\n') + 1
+        block, carry = data[:cut], data[cut:]
+        if head:
+            count = block.count(b'\n')
+            if lines + count >= head:
+                yield _first_lines(block, head - lines)
+                return
+            lines += count
+        if block:
+            yield block
+    if carry:
+        block = carry + b'\n'
+        yield _first_lines(block, head - lines) if head else block
+
+def _first_lines(block: bytes, count: int):
+    end = -1
+    for _ in range(count):
+        end = block.index(b'\n', end + 1)
+    return block[:end + 1]
+
+
+class HashPowers:
+    """
+    Caches BASE^i and BASE^-i for i < size, plus a work array, grown on demand.
+    """
+    def __init__(self):
+        self.forward = np.ones(1, dtype=np.uint64)
+        self.inverse = np.ones(1, dtype=np.uint64)
+        self.work = np.ones(1, dtype=np.uint64)
+
+    def get(self, size: int):
+        if len(self.forward) < size:
+            # Blocks vary by the carried partial line, so leave some headroom
+            self.forward = _power_series(HASH_BASE, size + size // 8)
+            self.inverse = _power_series(HASH_BASE_INVERSE, size + size // 8)
+            self.work = np.empty(size + size // 8, dtype=np.uint64)
+        return self.forward[:size], self.inverse[:size], self.work[:size]
+
+def _power_series(base: int, size: int):
+    series = np.full(size, base, dtype=np.uint64)
+    series[0] = 1
+    return np.cumprod(series, dtype=np.uint64)
+
+
+class Columns:
+    """
+    Column arrays for the lines of one block. Lines without a valid timestamp
+    have epoch -1. Hashes are 0 for empty fields; the peer hash covers 'peer-asn|peer-ip'
+    and is 0 when both are empty, as the petl engine has no peer then.
+    """
+    __slots__ = ("epoch", "elem_type", "path_length", "prefix_hash", "path_hash", "origin_hash", "peer_hash",
+                 "announced")
+
+
+def parse_block(block: bytes, powers: HashPowers):
+    """
+    Splits a block of bgpreader lines into Columns using delimiter offsets only.
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buf == NEWLINE)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lines = len(ends)
+
+    # Position of the pipe closing each of the first ORIGIN_AS_COL fields of every line
+    pipes = np.flatnonzero(buf == PIPE)
+    first = np.searchsorted(pipes, starts)
+    available = np.diff(np.append(first, len(pipes)))
+    offsets = np.arange(ORIGIN_AS_COL + 1)
+    closing = pipes[np.minimum(first[:, None] + offsets, max(len(pipes) - 1, 0))] if len(pipes) else \
+        np.zeros((lines, ORIGIN_AS_COL + 1), dtype=np.int64)
+    closing = np.where(offsets < available[:, None], closing, -1)
+
+    def field(col):
+        opening = closing[:, col - 1]
+        present = opening >= 0
+        begin = np.where(present, opening + 1, ends)
+        end = np.where(closing[:, col] >= 0, closing[:, col], ends)
+        return begin, np.where(present, end, begin)
+
+    def segment_sums(values, segments, dtype=None):
+        # Sums of values[begin:end] for every (begin, end) pair, in one reduceat call
+        bounds = np.stack([bound for pair in segments for bound in pair], axis=1).ravel()
+        sums = np.add.reduceat(values, np.minimum(bounds, len(values) - 1), dtype=dtype)
+        sums = sums[::2].reshape(lines, len(segments))
+        empty = np.stack([end == begin for begin, end in segments], axis=1)
+        return np.where(empty, 0, sums)
+
+    columns = Columns()
+
+    # Integer part of the timestamp, like int(raw.split('.')[0])
+    begin, end = field(TIMESTAMP_COL)
+    offsets = np.arange(TIMESTAMP_DIGITS)
+    chars = buf[np.minimum(begin[:, None] + offsets, len(buf) - 1)]
+    inside = offsets < (end - begin)[:, None]
+    digits = (chars >= ord('0')) & (chars <= ord('9')) & inside
+    count = np.where(digits.all(axis=1), TIMESTAMP_DIGITS, np.argmin(digits, axis=1))
+    terminator = chars[np.arange(lines), np.minimum(count, TIMESTAMP_DIGITS - 1)]
+    valid = (count > 0) & ((count == end - begin) | (terminator == DOT))
+    exponent = count[:, None] - 1 - offsets
+    scale = POWERS_OF_TEN[np.clip(exponent, 0, TIMESTAMP_DIGITS - 1)] * (digits & (exponent >= 0))
+    columns.epoch = np.where(valid, ((chars - ord('0')).astype(np.int64) * scale).sum(axis=1), -1)
+
+    begin, end = field(TYPE_COL)
+    columns.elem_type = np.where(end - begin == 1, buf[np.minimum(begin, len(buf) - 1)], 0)
+
+    prefix, path, origin = field(PREFIX_COL), field(AS_PATH_COL), field(ORIGIN_AS_COL)
+    peer = (field(PEER_ASN_COL)[0], field(PEER_IP_COL)[1])
+    has_prefix, has_path, has_origin = (end > begin for begin, end in (prefix, path, origin))
+
+    # Token count of the AS path, like len(as_path.split())
+    spaces = segment_sums((buf == SPACE).view(np.uint8), [path], dtype=np.int32)[:, 0]
+    columns.path_length = np.where(has_path, spaces + 1, 0)
+
+    forward, inverse, weighted = powers.get(len(buf))
+    np.multiply(buf, forward, out=weighted)
+    sums = segment_sums(weighted, [prefix, path, origin, peer])
+    columns.prefix_hash, columns.path_hash, columns.origin_hash, columns.peer_hash = (
+        sums[:, i] * inverse[np.minimum(begin, len(buf) - 1)]
+        for i, (begin, end) in enumerate((prefix, path, origin, peer))
+    )
+    columns.peer_hash[peer[1] - peer[0] <= 1] = 0
+
+    columns.announced = (columns.elem_type == ANNOUNCEMENT) & has_prefix & has_path & has_origin
+    return columns
+
+
+class PrefixTracker:
+    """
+    feature_5 state as sorted arrays: prefix hash -> (AS path hash, origin AS hash).
+    """
+    def __init__(self):
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.paths = np.zeros(0, dtype=np.uint64)
+        self.origins = np.zeros(0, dtype=np.uint64)
+
+    def lookup(self, keys):
+        """
+        Returns (found, paths, origins) for the given prefix hashes.
+        """
+        position = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=np.uint64), np.zeros(len(keys), dtype=np.uint64)
+        found = self.keys[position] == keys
+        return found, self.paths[position], self.origins[position]
+
+    def update(self, keys, paths, origins):
+        """
+        Stores the state of distinct prefix hashes (keys must be unique).
+        """
+        found, _, _ = self.lookup(keys)
+        position = np.searchsorted(self.keys, keys[found])
+        self.paths[position] = paths[found]
+        self.origins[position] = origins[found]
+
+        new = ~found
+        order = np.argsort(keys[new])
+        position = np.searchsorted(self.keys, keys[new][order])
+        self.keys = np.insert(self.keys, position, keys[new][order])
+        self.paths = np.insert(self.paths, position, paths[new][order])
+        self.origins = np.insert(self.origins, position, origins[new][order])
+
+    def observe(self, keys, paths, origins):
+        """
+        Compares announcements, in file order, with the previous one for the same key,
+        either earlier in the batch or in the state, and stores the last of each key.
+        Returns (order, changed, unseen): the stable order sorting the announcements by
+        key, and masks over the sorted ones of the AS path changes with the same origin
+        (feature_5) and of the keys the state did not have.
+        """
+        order = np.argsort(keys, kind="stable")
+        keys, paths, origins = keys[order], paths[order], origins[order]
+
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        last_paths = np.empty_like(paths)
+        last_origins = np.empty_like(origins)
+        last_paths[1:], last_origins[1:] = paths[:-1], origins[:-1]
+        known = ~first
+        found, last_paths[first], last_origins[first] = self.lookup(keys[first])
+        known[first] = found
+        unseen = first.copy()
+        unseen[first] = ~found
+
+        final = np.ones(len(keys), dtype=bool)
+        final[:-1] = keys[:-1] != keys[1:]
+        self.update(keys[final], paths[final], origins[final])
+        return order, known & (paths != last_paths) & (origins == last_origins), unseen
+
+
+class DistinctArrays:
+    """
+    Distinct keys per window for the numpy engine, counted like one
+    sketches.DistinctCounter per window: (window, key) pairs while a window has at most
+    exact_limit(precision) keys, and a row of registers for each window beyond that
+    (`sketched` holds those windows in order). Without a precision all pairs are kept.
+    """
+    def __init__(self, precision: int = None):
+        self.precision = precision
+        self.pairs = []  # (windows, keys) per block, distinct after compact()
+        self.pending = 0
+        self.compacted = 0
+        self.sketched = np.zeros(0, dtype=np.int64)
+        self.registers = np.zeros((0, 1 << (precision or 0)), dtype=np.uint8)
+
+    def add(self, windows, keys):
+        if len(windows):
+            self.pairs.append((windows, keys))
+            self.pending += len(windows)
+            # Compacting again only once the pairs have doubled keeps exact counting linear
+            if self.pending > max(DISTINCT_COMPACT_PAIRS, 2 * self.compacted):
+                self.compact()
+
+    def compact(self):
+        """
+        Replaces the pairs with their distinct ones and moves the keys of windows over
+        the exact limit into their registers.
+        """
+        if not self.pairs:
+            return
+        windows, keys = unique_pairs(*(np.concatenate(part) for part in zip(*self.pairs)))
+        if self.precision is not None:
+            over = np.flatnonzero(np.bincount(windows) > exact_limit(self.precision))
+            self._sketch(over, np.zeros((0, 1 << self.precision), dtype=np.uint8))
+            into = np.isin(windows, self.sketched)
+            if into.any():
+                registers, ranks = key_positions(keys[into], self.precision)
+                np.maximum.at(self.registers, (np.searchsorted(self.sketched, windows[into]), registers), ranks)
+                windows, keys = windows[~into], keys[~into]
+        self.pairs = [(windows, keys)]
+        self.pending = self.compacted = len(windows)
+
+    def _sketch(self, windows, registers):
+        """
+        Merges rows of registers into those of `windows`, adding rows for windows that
+        have none (all of them when `registers` is empty).
+        """
+        new = np.setdiff1d(windows, self.sketched)
+        if len(new):
+            position = np.searchsorted(self.sketched, new)
+            self.sketched = np.insert(self.sketched, position, new)
+            self.registers = np.insert(self.registers, position, 0, axis=0)
+        if len(registers):
+            order = np.argsort(windows, kind="stable")
+            windows, registers = windows[order], registers[order]
+            heads = np.flatnonzero(np.concatenate(([True], windows[1:] != windows[:-1])))
+            rows = np.searchsorted(self.sketched, windows[heads])
+            self.registers[rows] = np.maximum(self.registers[rows], np.maximum.reduceat(registers, heads, axis=0))
+
+    def _adopt(self, other):
+        if self.precision is None and other.precision is not None:
+            self.precision = other.precision
+            self.registers = np.zeros((0, 1 << self.precision), dtype=np.uint8)
+        elif other.precision not in (None, self.precision):
+            raise ValueError(f"cannot merge sketches of precision {other.precision} into {self.precision}")
+
+    def merge(self, other, index):
+        """
+        Adds the keys of another DistinctArrays whose window i is window index[i] here.
+        """
+        self._adopt(other)
+        for windows, keys in other.pairs:
+            target = index[windows]
+            self.add(target[target >= 0], keys[target >= 0])
+        target = index[other.sketched]
+        self._sketch(target[target >= 0], other.registers[target >= 0])
+        self.compact()
+
+    def hop(self, size: int, step: int):
+        """
+        Returns the distinct keys of windows `size` windows long starting every `step`.
+        """
+        self.compact()
+        hopped = DistinctArrays(self.precision)
+        if self.pairs:
+            hopped.add(*hop_pairs(*self.pairs[0], size, step))
+        if len(self.sketched):
+            windows, rows = hop_pairs(self.sketched, np.arange(len(self.sketched)), size, step)
+            hopped._sketch(windows, self.registers[rows])
+        hopped.compact()
+        return hopped
+
+    def counts(self, count: int):
+        """
+        Returns the distinct count of windows 0 .. count - 1.
+        """
+        self.compact()
+        result = np.zeros(count, dtype=np.int64)
+        if self.pairs:
+            result += np.bincount(self.pairs[0][0], minlength=count)[:count]
+        shown = self.sketched < count
+        if shown.any():
+            result[self.sketched[shown]] = estimate(self.registers[shown])
+        return result
+
+
+class WindowArrays:
+    """
+    Per-window aggregates for the features, grown as windows appear.
+
+    With `record_unseen`, announcements of prefixes the tracker has not seen yet are
+    kept as (window indexes, prefix, path and origin hashes) so that a parallel run can
+    compare them with the state left by the preceding byte ranges.
+
+    With `features`, only feature_5 and the distinct counts among those feature
+    indexes are kept; the counts and path lengths are cheap and always are.
+    """
+    def __init__(self, record_unseen: bool = False, precision: int = None, features=None):
+        self.updates = np.zeros(0, dtype=np.int64)
+        self.announcements = np.zeros(0, dtype=np.int64)
+        self.withdrawals = np.zeros(0, dtype=np.int64)
+        self.path_sum = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros((0, 1), dtype=np.int64)  # window x AS path length histogram
+        self.changes = []  # distinct (window indexes, prefix hashes) per block
+        self.distinct = [DistinctArrays(precision) for _ in range(DISTINCT_FEATURES)]
+        self.tracker = PrefixTracker()
+        self.unseen = [] if record_unseen else None
+        self.features = features
+
+    def compact(self):
+        """
+        Replaces the per-block feature_5 changes with their distinct pairs.
+        """
+        if len(self.changes) > 1:
+            self.changes = [unique_pairs(*(np.concatenate(part) for part in zip(*self.changes)))]
+        for distinct in self.distinct:
+            distinct.compact()
+
+    def _grow(self, windows: int, lengths: int):
+        extra = windows - len(self.updates)
+        if extra > 0:
+            for name in ("updates", "announcements", "withdrawals", "path_sum"):
+                setattr(self, name, np.concatenate((getattr(self, name), np.zeros(extra, dtype=np.int64))))
+        if extra > 0 or lengths > self.lengths.shape[1]:
+            self.lengths = np.pad(self.lengths, ((0, max(extra, 0)), (0, max(lengths - self.lengths.shape[1], 0))))
+
+    def add(self, index, columns: Columns):
+        """
+        Adds the rows of a block; `index` is the window index of every row (-1 to skip).
+        """
+        counted = index >= 0
+        windows = int(index.max()) + 1 if counted.any() else 0
+        with_path = counted & (columns.path_length > 0)
+        lengths = int(columns.path_length[with_path].max()) + 1 if with_path.any() else 1
+        self._grow(windows, lengths)
+
+        self.updates[:windows] += np.bincount(index[counted], minlength=windows)
+        self.announcements[:windows] += np.bincount(index[counted & (columns.elem_type == ANNOUNCEMENT)], minlength=windows)
+        self.withdrawals[:windows] += np.bincount(index[counted & (columns.elem_type == WITHDRAWAL)], minlength=windows)
+        path_index, path_length = index[with_path], columns.path_length[with_path]
+        self.path_sum[:windows] += np.bincount(path_index, weights=path_length, minlength=windows).astype(np.int64)
+        width = self.lengths.shape[1]
+        self.lengths[:windows] += np.bincount(path_index * width + path_length,
+                                              minlength=windows * width).reshape(windows, width)
+
+        if selects(self.features, PATH_CHANGE_FEATURE):
+            self._add_changes(index, columns)
+        for feature, distinct, (rows, hashes) in zip(DISTINCT_INDEXES, self.distinct, distinct_keys(columns, counted)):
+            if selects(self.features, feature):
+                distinct.add(index[rows], mix_array(hashes[rows]))
+
+    def _add_changes(self, index, columns: Columns):
+        # feature_5: compare every announcement with the previous one for the same prefix,
+        # either earlier in this block or in the tracker, in file order.
+        rows = np.flatnonzero(columns.announced)
+        order, changed, unseen = self.tracker.observe(columns.prefix_hash[rows], columns.path_hash[rows],
+                                                      columns.origin_hash[rows])
+        rows = rows[order]
+        if self.unseen is not None:
+            first = rows[unseen]
+            self.unseen.append((index[first], columns.prefix_hash[first], columns.path_hash[first],
+                                columns.origin_hash[first]))
+        if changed.any():
+            rows = rows[changed]
+            self.changes.append(unique_pairs(index[rows], columns.prefix_hash[rows]))
+
+    def merge(self, other, index):
+        """
+        Adds the counts of another WindowArrays whose window i is window index[i] here.
+        Its feature_5 changes are added as they are; reconciling prefixes across the
+        two is left to the caller.
+        """
+        keep = index >= 0
+        windows = int(index[keep].max()) + 1 if keep.any() else 0
+        width = other.lengths.shape[1]
+        self._grow(windows, width)
+        for name in ("updates", "announcements", "withdrawals", "path_sum"):
+            np.add.at(getattr(self, name), index[keep], getattr(other, name)[keep])
+        np.add.at(self.lengths[:, :width], index[keep], other.lengths[keep])
+        self.changes.extend((index[positions], keys) for positions, keys in other.changes)
+        for distinct, part in zip(self.distinct, other.distinct):
+            distinct.merge(part, index)
+
+    def rollup(self, factor: int):
+        """
+        Returns the aggregates of windows `factor` times longer.
+        """
+        if factor == 1:
+            return self
+        coarse = WindowArrays()
+        coarse.merge(self, np.arange(len(self.updates)) // factor)
+        return coarse
+
+    def hop(self, size: int, step: int):
+        """
+        Returns the aggregates of windows `size` windows long starting every `step`
+        windows. Counts and histograms are differences of running sums, so every window
+        costs the same however long it is. A feature_5 prefix counts in the windows
+        covering one of its changes, less those its previous change already covers.
+        """
+        count = len(self.updates)
+        first = np.arange(0, count, step)
+        last = np.minimum(first + size, count)
+        hopped = WindowArrays()
+        for name in ("updates", "announcements", "withdrawals", "path_sum"):
+            running = np.concatenate(([0], np.cumsum(getattr(self, name))))
+            setattr(hopped, name, running[last] - running[first])
+        running = np.concatenate((np.zeros((1, self.lengths.shape[1]), dtype=np.int64), np.cumsum(self.lengths, axis=0)))
+        hopped.lengths = running[last] - running[first]
+
+        if self.changes:
+            hopped.changes = [hop_pairs(*unique_pairs(*(np.concatenate(part) for part in zip(*self.changes))),
+                                        size, step)]
+        hopped.distinct = [distinct.hop(size, step) for distinct in self.distinct]
+        return hopped
+
+    def window_sets(self, start: int, base: int, windows, hop: int = None):
+        """
+        Returns {window: windows(start, window)} for sizes that are multiples of
+        `base`, the window size of these aggregates. With `hop`, a multiple of `base`
+        too, windows start every `hop` seconds.
+        """
+        if hop:
+            return {window: self.hop(window // base, hop // base).windows(start, hop) for window in windows}
+        return {window: self.rollup(window // base).windows(start, window) for window in windows}
+
+    def windows(self, start: int, window: int):
+        """
+        Returns (window_start, (f0, ..., f13)) tuples up to the last window with traffic.
+        """
+        used = np.flatnonzero(self.updates)
+        count = int(used[-1]) + 1 if len(used) else 0
+
+        changes = np.zeros(count, dtype=np.int64)
+        if self.changes:
+            windows, _ = unique_pairs(*(np.concatenate(part) for part in zip(*self.changes)))
+            changes += np.bincount(windows, minlength=count)[:count]
+
+        lengths = self.lengths[:count]
+        total = lengths.sum(axis=1)
+        cumulative = np.cumsum(lengths, axis=1)
+
+        def value_at(rank):
+            # Length of the rank-th (0-based) smallest path of every window
+            return np.argmax(cumulative > rank[:, None], axis=1).tolist()
+
+        lower, upper = value_at((total - 1) // 2), value_at(total // 2)
+        p90 = value_at(np.maximum(-(-90 * total // 100), 1) - 1)
+        p99 = value_at(np.maximum(-(-99 * total // 100), 1) - 1)
+        longest = value_at(total - 1)
+        distinct = zip(*(part.counts(count).tolist() for part in self.distinct))
+
+        result = []
+        for i, (updates, announcements, withdrawals, path_sum, n, changed, counts) in enumerate(zip(
+                self.updates[:count].tolist(), self.announcements[:count].tolist(), self.withdrawals[:count].tolist(),
+                self.path_sum[:count].tolist(), total.tolist(), changes.tolist(), distinct)):
+            if n:
+                # Same types as statistics.median: the middle value, or the mean of the two middle values
+                values = (path_sum / n, lower[i] if n % 2 else (lower[i] + upper[i]) / 2, changed,
+                          p90[i], p99[i], longest[i])
+            else:
+                values = (0, 0, changed, 0, 0, 0)
+            result.append((start + i * window, (updates, announcements, withdrawals) + values + counts))
+        return result
+
+
+class PeerArrays:
+    """
+    Aggregates for f0 .. f8 per window and peer, kept sparse: one cell per window and
+    peer with traffic, so memory follows the traffic instead of windows x peers.
+
+    Peers are numbered in order of appearance and named 'peer-asn|peer-ip' from the
+    block text (see name_peers). feature_5 tracks every prefix per peer, so a change is
+    one peer's route to the prefix changing. The distinct counts are left out: a window
+    over all peers cannot be put together from per-peer counts anyway.
+    """
+    def __init__(self):
+        self.peer_hashes = np.zeros(0, dtype=np.uint64)  # sorted
+        self.peer_ids = np.zeros(0, dtype=np.int64)  # id of each sorted hash
+        self.peers = []
+        self.unnamed = []  # (row in the current block, peer id)
+        # (cells, [updates, announcements, withdrawals, path sum] per cell, and the
+        # (cell, length, count) AS path length histograms) per block, one after compact()
+        self.parts = []
+        self.changes = []  # distinct (cells, per-peer prefix keys) per block
+        self.pending = 0
+        self.compacted = 0
+        self.tracker = PrefixTracker()
+
+    def add(self, index, columns: Columns):
+        """
+        Adds the rows of a block; `index` is the window index of every row (-1 to skip).
+        """
+        counted = index >= 0
+        cells = (index << PEER_BITS) | self._peer_ids(columns.peer_hash, counted)
+        cells[~counted] = -1
+        self.parts.append(row_cells(cells[counted], columns.elem_type[counted], columns.path_length[counted]))
+        self.pending += len(self.parts[-1][0])
+
+        rows = np.flatnonzero(columns.announced)
+        keys = columns.prefix_hash[rows] ^ mix_array(columns.peer_hash[rows])
+        order, changed, _ = self.tracker.observe(keys, columns.path_hash[rows], columns.origin_hash[rows])
+        if changed.any():
+            self.changes.append(unique_pairs(cells[rows[order][changed]], keys[order][changed]))
+        # Compacting again only once the cells have doubled keeps the sums linear
+        if self.pending > max(PEER_COMPACT_CELLS, 2 * self.compacted):
+            self.compact()
+
+    def _peer_ids(self, hashes, rows):
+        seen, first = np.unique(hashes[rows], return_index=True)
+        new = ~np.isin(seen, self.peer_hashes)
+        if new.any():
+            ids = np.arange(len(self.peers), len(self.peers) + np.count_nonzero(new))
+            if ids[-1] >= 1 << PEER_BITS:
+                raise ValueError(f"more than {1 << PEER_BITS} peers")
+            self.unnamed.extend(zip(np.flatnonzero(rows)[first[new]].tolist(), ids.tolist()))
+            self.peers.extend([''] * len(ids))
+            position = np.searchsorted(self.peer_hashes, seen[new])
+            self.peer_hashes = np.insert(self.peer_hashes, position, seen[new])
+            self.peer_ids = np.insert(self.peer_ids, position, ids)
+        position = np.minimum(np.searchsorted(self.peer_hashes, hashes), max(len(self.peer_hashes) - 1, 0))
+        return self.peer_ids[position] if len(self.peer_ids) else np.zeros(len(hashes), dtype=np.int64)
+
+    def name_peers(self, block: bytes, _start=None):
+        """
+        Names the peers that first appeared in the block just added, from its text
+        (the after_block hook of the block pass).
+        """
+        if not self.unnamed:
+            return
+        lines = block.split(b'\n')
+        for row, peer in self.unnamed:
+            fields = lines[row].split(b'|')
+            self.peers[peer] = b'|'.join(fields[PEER_ASN_COL:PEER_IP_COL + 1]).decode(errors="replace")
+        self.unnamed = []
+
+    def compact(self):
+        """
+        Sums the per-block cells and replaces the feature_5 changes with their distinct pairs.
+        """
+        if len(self.parts) > 1:
+            self.parts = [cell_sums(*merge_cells(self.parts))]
+        if len(self.changes) > 1:
+            self.changes = [unique_pairs(*(np.concatenate(part) for part in zip(*self.changes)))]
+        self.pending = self.compacted = len(self.parts[0][0]) if self.parts else 0
+
+    def features(self, factor: int = 1):
+        """
+        Returns (window indexes, peer ids, f0 .. f8 float64 matrix) of the cells of windows
+        `factor` times longer, sorted by window and then peer.
+        """
+        self.compact()
+        if not self.parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros((0, 9))
+        cells, counts, lengths = self.parts[0]
+        if factor > 1:
+            cells, counts, lengths = cell_sums(rollup_cells(cells, factor), counts,
+                                               (rollup_cells(lengths[0], factor),) + lengths[1:])
+        changed = np.zeros(len(cells), dtype=np.int64)
+        if self.changes:
+            changed_cells, _ = unique_pairs(rollup_cells(self.changes[0][0], factor), self.changes[0][1])
+            changed += np.bincount(np.searchsorted(cells, changed_cells), minlength=len(cells))
+
+        # Ranks in the histograms: the (cell, length) entries are sorted, so a running
+        # count over all of them locates the rank-th path of every cell
+        length_cells, length_values, length_counts = lengths
+        running = np.concatenate(([0], np.cumsum(length_counts)))
+        offset = running[np.searchsorted(length_cells, cells)]
+        total = running[np.searchsorted(length_cells, cells, side='right')] - offset
+
+        def value_at(rank):
+            position = np.searchsorted(running, offset + rank, side='right') - 1
+            return np.where(total > 0, length_values[np.minimum(position, max(len(length_values) - 1, 0))]
+                            if len(length_values) else 0, 0).astype(np.float64)
+
+        lower, upper = value_at((total - 1) // 2), value_at(total // 2)
+        values = np.column_stack((
+            counts[:, 0], counts[:, 1], counts[:, 2],
+            np.divide(counts[:, 3], total, out=np.zeros(len(cells)), where=total > 0),
+            np.where(total % 2, lower, (lower + upper) / 2), changed,
+            value_at(np.maximum(-(-90 * total // 100), 1) - 1), value_at(np.maximum(-(-99 * total // 100), 1) - 1),
+            value_at(total - 1),
+        )).astype(np.float64)
+        return cells >> PEER_BITS, cells & ((1 << PEER_BITS) - 1), values
+
+
+def row_cells(cells, elem_type, path_length):
+    """
+    Sums the rows of a block into their cells (see cell_sums).
+    """
+    counts = np.column_stack((np.ones(len(cells), dtype=np.int64), elem_type == ANNOUNCEMENT,
+                              elem_type == WITHDRAWAL, path_length)).astype(np.int64)
+    with_path = path_length > 0
+    return cell_sums(cells, counts, (cells[with_path], path_length[with_path],
+                                     np.ones(np.count_nonzero(with_path), dtype=np.int64)))
+
+def cell_sums(cells, counts, lengths):
+    """
+    Sums [updates, announcements, withdrawals, path sum] counts and (cell, length, count)
+    AS path length histogram entries per cell. Returns the same for the sorted distinct
+    cells, with the histogram entries sorted by cell and length.
+    """
+    distinct, inverse = np.unique(cells, return_inverse=True)
+    # Float sums are exact far beyond any count of a cell
+    sums = np.column_stack([np.bincount(inverse, weights=counts[:, column], minlength=len(distinct))
+                            for column in range(counts.shape[1])]).astype(np.int64)
+    length_cells, values, weights = lengths
+    width = int(values.max()) + 1 if len(values) else 1
+    keys, inverse = np.unique(np.searchsorted(distinct, length_cells) * width + values, return_inverse=True)
+    return distinct, sums, (distinct[keys // width], keys % width, np.bincount(inverse, weights=weights).astype(np.int64))
+
+def merge_cells(parts):
+    """
+    Concatenates (cells, counts, histogram entries) parts into the arguments of cell_sums.
+    """
+    cells, counts, lengths = zip(*parts)
+    return (np.concatenate(cells), np.concatenate(counts),
+            tuple(np.concatenate(column) for column in zip(*lengths)))
+
+def rollup_cells(cells, factor: int):
+    """
+    Cells of the windows `factor` times longer containing `cells`.
+    """
+    if factor == 1:
+        return cells
+    return ((cells >> PEER_BITS) // factor << PEER_BITS) | (cells & ((1 << PEER_BITS) - 1))
+
+
+def distinct_keys(columns: Columns, rows):
+    """
+    Returns the (rows, hashes) of the keys of f9 .. f13 among `rows` of a block:
+    announced prefixes, withdrawn prefixes, origin ASes, peers and AS paths.
+    """
+    announced = rows & (columns.elem_type == ANNOUNCEMENT)
+    withdrawn = rows & (columns.elem_type == WITHDRAWAL)
+    return ((announced & (columns.prefix_hash != 0), columns.prefix_hash),
+            (withdrawn & (columns.prefix_hash != 0), columns.prefix_hash),
+            (announced & (columns.origin_hash != 0), columns.origin_hash),
+            (rows & (columns.peer_hash != 0), columns.peer_hash),
+            (announced & (columns.path_hash != 0), columns.path_hash))
+
+def hop_pairs(windows, keys, size: int, step: int):
+    """
+    Maps distinct (window, key) pairs to the windows `size` windows long starting every
+    `step` windows that cover them, once per key and covering window.
+    """
+    order = np.lexsort((windows, keys))
+    windows, keys = windows[order], keys[order]
+    # Window i (starting at window i * step) covers window w for (w - size) / step < i <= w / step
+    low = np.maximum(-((size - 1 - windows) // step), 0)
+    high = windows // step
+    # A key counts once per covering window: skip those its previous window already covers
+    repeated = np.zeros(len(keys), dtype=bool)
+    repeated[1:] = keys[1:] == keys[:-1]
+    low[repeated] = np.maximum(low[repeated], high[:-1][repeated[1:]] + 1)
+    spans = np.maximum(high - low + 1, 0)
+    offsets = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+    return np.repeat(low, spans) + offsets, np.repeat(keys, spans)
+
+def unique_pairs(windows, keys):
+    """
+    Returns the distinct (window, key) pairs as two arrays, in no particular order.
+    """
+    # One sort of the keys mixed with their windows is several times faster than a
+    # two-column lexsort. Equal pairs mix equally; two different pairs mixing equally
+    # (a 2^-64 chance) can at worst keep a duplicate apart.
+    order = np.argsort(keys ^ (windows.astype(np.uint64) * PAIR_MULTIPLIER))
+    windows, keys = windows[order], keys[order]
+    distinct = np.ones(len(keys), dtype=bool)
+    distinct[1:] = (windows[1:] != windows[:-1]) | (keys[1:] != keys[:-1])
+    return windows[distinct], keys[distinct]
+
+
+class _EarlierRecord(Exception):
+    def __init__(self, epoch):
+        self.epoch = epoch
+
+
+def vectorized_windows(input_file: str, head: int = None, windows=(300,), start: int = None,
+                       chunk_bytes: int = 8 * 1024 * 1024, decompress: str = "auto", hop: int = None,
+                       precision: int = None, features=None):
+    """
+    Computes the same {window: [(window_start, (f0, ..., f13)), ...]} as
+    common.extract_window_sets with NumPy over blocks of `chunk_bytes`, without sorting.
+    Window counts do not depend on row order; feature_5 follows the file order, as
+    bgpreader writes it.
+    """
+    explicit = start is not None
+    base = base_window(windows, hop)
+    while True:
+        try:
+            blocks = read_blocks(input_file, chunk_bytes, head, decompress=decompress)
+            aggregates, start = _vectorized_pass(blocks, base, start, explicit, WindowArrays(precision=precision, features=features))
+            if start is None:
+                return {window: [] for window in windows}
+            return aggregates.window_sets(start, base, windows, hop)
+        except _EarlierRecord as earlier:
+            # Without --start-time the first window starts at the earliest record,
+            # so a record older than the provisional start means starting over.
+            if input_file == '-':
+                raise ValueError("stdin is not ordered enough for the numpy engine; pass --start-time")
+            start = earlier.epoch
+
+def checkpointed_windows(input_file: str, head: int = None, windows=(300,), start: int = None,
+                         chunk_bytes: int = 8 * 1024 * 1024, checkpoint_file: str = None,
+                         resume: bool = False, interval: float = 60, hop: int = None, precision: int = None,
+                         features=None):
+    """
+    vectorized_windows that saves its state to `checkpoint_file` every `interval`
+    seconds and once more at the end of the input.
+
+    With `resume`, reading continues after the bytes covered by the checkpoint, which
+    picks up an interrupted run or processes only the lines appended to the input since
+    the last run. The file order of the numpy engine makes the result identical to a
+    full run either way.
+    """
+    explicit = start is not None
+    base = base_window(windows, hop)
+    state = load_checkpoint(checkpoint_file, input_file, base, start, precision, features) if resume else None
+    if state is not None:
+        typer.echo(f"Resuming from {checkpoint_file} after {state.lines} lines ({state.offset} bytes)")
+    while True:
+        if state is None:
+            state = Checkpoint(input_file, base, start, precision, features,
+                               WindowArrays(precision=precision, features=features))
+        saved = time.monotonic()
+
+        def after_block(block, current_start):
+            nonlocal saved
+            state.offset += len(block)
+            state.lines += block.count(b'\n')
+            state.start = current_start
+            if time.monotonic() - saved >= interval:
+                save_checkpoint(checkpoint_file, state)
+                saved = time.monotonic()
+
+        remaining = head - state.lines if head else None
+        try:
+            if remaining is None or remaining > 0:
+                _vectorized_pass(read_blocks(input_file, chunk_bytes, remaining, begin=state.offset), base,
+                                 state.start, explicit, state.aggregates, after_block=after_block)
+            break
+        except _EarlierRecord as earlier:
+            typer.echo("Found a record older than the first window; starting from the beginning.")
+            state, start = None, earlier.epoch
+
+    # read_blocks ends a last line without a newline with one that is not in the file
+    size = os.path.getsize(input_file)
+    state.partial_line = state.offset > size
+    state.offset = min(state.offset, size)
+    save_checkpoint(checkpoint_file, state)
+    if state.start is None:
+        return {window: [] for window in windows}
+    return state.aggregates.window_sets(state.start, base, windows, hop)
+
+def peer_windows(input_file: str, head: int = None, windows=(300,), start: int = None,
+                 chunk_bytes: int = 8 * 1024 * 1024, decompress: str = "auto"):
+    """
+    Aggregates f0 .. f8 per peer over blocks of `chunk_bytes`, for several window sizes
+    in one pass like vectorized_windows. Returns (start, peer names, {window: (window
+    indexes, peer ids, values)}) with the cells of PeerArrays.features, or a start of
+    None when there are no records.
+    """
+    explicit = start is not None
+    base = base_window(windows)
+    while True:
+        try:
+            aggregates = PeerArrays()
+            blocks = read_blocks(input_file, chunk_bytes, head, decompress=decompress)
+            aggregates, start = _vectorized_pass(blocks, base, start, explicit, aggregates,
+                                                 after_block=aggregates.name_peers)
+            return start, aggregates.peers, {window: aggregates.features(window // base) for window in windows}
+        except _EarlierRecord as earlier:
+            if input_file == '-':
+                raise ValueError("stdin is not ordered enough for the numpy engine; pass --start-time")
+            start = earlier.epoch
+
+def range_seconds(input_file: str, begin: int, end: int, floor: int = None,
+                  chunk_bytes: int = 8 * 1024 * 1024, precision: int = None, features=None):
+    """
+    Aggregates the lines in bytes [begin, end) of a file per second, ignoring records
+    before `floor`. Returns (WindowArrays recording unseen prefixes, first second), with
+    a first second of None when the range has no records.
+    """
+    first = None
+    while True:
+        try:
+            return _vectorized_pass(read_blocks(input_file, chunk_bytes, begin=begin, end=end), 1, first,
+                                    False, WindowArrays(record_unseen=True, precision=precision, features=features), floor)
+        except _EarlierRecord as earlier:
+            first = earlier.epoch
+
+def _vectorized_pass(blocks, window, start, explicit, aggregates, floor=None, after_block=None):
+    powers = HashPowers()
+    for block in STAGES.timed("read", blocks, rows=lambda block: block.count(b'\n'), size=len):
+        with STAGES.stage("parse"):
+            columns = parse_block(block, powers)
+        STAGES.count("parse", rows=len(columns.epoch))
+        with STAGES.stage("filter"):
+            valid = columns.epoch >= 0
+            if floor is not None:
+                valid &= columns.epoch >= floor
+        STAGES.count("filter", rows=int(np.count_nonzero(valid)))
+        if valid.any():
+            earliest = int(columns.epoch[valid].min())
+            if start is None:
+                start = earliest
+            elif earliest < start and not explicit:
+                raise _EarlierRecord(earliest)
+            index = np.where(valid, (columns.epoch - start) // window, -1)
+            index[index < 0] = -1
+            columns.announced &= index >= 0
+            aggregates.add(index, columns)
+        if after_block is not None:
+            after_block(block, start)
+    return aggregates, start